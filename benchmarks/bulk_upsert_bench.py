@@ -0,0 +1,145 @@
+# benchmarks/bulk_upsert_bench.py
+
+"""
+Throughput of pr_summary writes: `bulk_upsert_pr_summaries` (COPY into a
+staging table, one merge per batch) against row-by-row `upsert_pr_summary`.
+
+    python -m benchmarks.bulk_upsert_bench --rows 50000 --batch-size 5000 --output bulk.json
+
+Needs the PostgreSQL configured by the PG_* variables, with migrations
+applied. Rows are written under a throwaway repo name and deleted
+afterwards. Each batch is written twice, so both the insert and the
+update (ON CONFLICT) path are timed. Exits 1 if bulk inserts are slower
+than --min-rows-per-sec.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+from benchmarks.synthetic import make_files
+from db.connection import get_db_pool, init_db_pool
+from db.crud import bulk_upsert_pr_summaries, upsert_pr_summary
+
+
+def make_rows(repo_full_name: str, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`count` pr_summary rows shaped like real backfill output"""
+    rng = random.Random(seed)
+    created = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for number in range(1, count + 1):
+        files = make_files(rng.randint(1, 40), seed=seed + number)
+        violations = [
+            {"rule_id": f"rule_{rng.randint(1, 20)}", "status": "fail", "reason": "synthetic violation"}
+            for _ in range(rng.randint(0, 3))
+        ]
+        merged = rng.random() < 0.7
+        created += timedelta(minutes=rng.randint(1, 600))
+        rows.append({
+            "repo_full_name": repo_full_name,
+            "pr_number": number,
+            "pr_url": f"https://github.com/{repo_full_name}/pull/{number}",
+            "title": f"Synthetic PR {number}",
+            "author_login": f"user{rng.randint(1, 50)}",
+            "created_at": created,
+            "closed_at": created + timedelta(hours=5) if merged else None,
+            "merged_at": created + timedelta(hours=5) if merged else None,
+            "is_merged": merged,
+            "commits_count": rng.randint(1, 20),
+            "additions": sum(f["additions"] for f in files),
+            "deletions": sum(f["deletions"] for f in files),
+            "changed_files": len(files),
+            "comments_count": rng.randint(0, 10),
+            "review_comments_count": 0,
+            "approvals_count": rng.randint(0, 3),
+            "violation_count": len(violations),
+            "violations": violations,
+            "summary_text": "Synthetic summary. " * rng.randint(5, 30),
+            "summary_generated_at": created,
+            "base_sha": uuid.uuid4().hex + "00000000",
+            "head_sha": uuid.uuid4().hex + "00000000",
+            "file_paths": [f["filename"] for f in files],
+        })
+    return rows
+
+
+async def time_bulk(rows: List[Dict[str, Any]], batch_size: int) -> float:
+    """Seconds to write `rows` in batches, as reported by bulk_upsert_pr_summaries"""
+    total = 0.0
+    for i in range(0, len(rows), batch_size):
+        written, elapsed = await bulk_upsert_pr_summaries(rows[i:i + batch_size])
+        print(f"[INFO] {written} rows in {elapsed * 1000:.0f} ms ({written / elapsed if elapsed else 0:.0f} rows/s)")
+        total += elapsed
+    return total
+
+
+async def time_single(rows: List[Dict[str, Any]]) -> float:
+    started = time.perf_counter()
+    for row in rows:
+        await upsert_pr_summary(**row)
+    return time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    repo_full_name = f"bench/bulk-upsert-{uuid.uuid4().hex[:8]}"
+    rows = make_rows(repo_full_name, args.rows)
+    single_rows = make_rows(repo_full_name + "-single", args.single_rows)
+    await init_db_pool()
+    pool = get_db_pool()
+    try:
+        insert_s = await time_bulk(rows, args.batch_size)
+        update_s = await time_bulk(rows, args.batch_size)
+        single_s = await time_single(single_rows)
+    finally:
+        await pool.execute(
+            "DELETE FROM pr_summary WHERE repo_full_name = ANY($1::text[])",
+            [repo_full_name, repo_full_name + "-single"]
+        )
+        await pool.close()
+
+    return {
+        "bulk_insert": {"total_ms": insert_s * 1000, "rows_per_sec": len(rows) / insert_s},
+        "bulk_update": {"total_ms": update_s * 1000, "rows_per_sec": len(rows) / update_s},
+        "single_upsert": {"total_ms": single_s * 1000, "rows_per_sec": len(single_rows) / single_s},
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000, help="rows written by the bulk path")
+    parser.add_argument("--batch-size", type=int, default=5_000, help="rows per bulk_upsert_pr_summaries call")
+    parser.add_argument("--single-rows", type=int, default=1_000, help="rows written one by one for comparison")
+    parser.add_argument("--min-rows-per-sec", type=float, default=10_000)
+    parser.add_argument("--output", help="also write results to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2, default=str))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+    rate = results["bulk_insert"]["rows_per_sec"]
+    if rate < args.min_rows_per_sec:
+        print(f"[ERROR] Bulk insert ran at {rate:.0f} rows/s, below {args.min_rows_per_sec:.0f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
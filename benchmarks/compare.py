@@ -0,0 +1,86 @@
+# benchmarks/compare.py
+
+"""
+Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 10
+
+Any numeric leaf ending in `_ms` or `_bytes` is treated as lower-is-better,
+any leaf ending in `_rps` or `_per_sec` as higher-is-better. Everything
+else (counts, metadata) is ignored. Exits with status 1 on regression.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+LOWER_IS_BETTER = ("_ms", "_bytes")
+HIGHER_IS_BETTER = ("_rps", "_per_sec")
+
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == "meta":
+                continue
+            flat.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix.rstrip(".")] = float(data)
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold_pct: float) -> Tuple[List[dict], List[dict]]:
+    """Return (rows, regressions) for every comparable metric present in both runs."""
+    base_flat = flatten(baseline)
+    curr_flat = flatten(current)
+    rows, regressions = [], []
+
+    for key in sorted(base_flat.keys() & curr_flat.keys()):
+        if key.endswith(LOWER_IS_BETTER):
+            direction = 1
+        elif key.endswith(HIGHER_IS_BETTER):
+            direction = -1
+        else:
+            continue
+        before, after = base_flat[key], curr_flat[key]
+        if before == 0:
+            continue
+        change_pct = (after - before) / before * 100
+        row = {"metric": key, "baseline": before, "current": after, "change_pct": round(change_pct, 2)}
+        rows.append(row)
+        if change_pct * direction > threshold_pct:
+            regressions.append(row)
+
+    return rows, regressions
+
+
+def print_report(rows: List[dict], regressions: List[dict]):
+    flagged = {r["metric"] for r in regressions}
+    width = max((len(r["metric"]) for r in rows), default=10)
+    for r in rows:
+        marker = "REGRESSION" if r["metric"] in flagged else ""
+        print(f"{r['metric']:<{width}}  {r['baseline']:>12.3f} -> {r['current']:>12.3f}  {r['change_pct']:>+8.2f}%  {marker}")
+    print(f"\n{len(regressions)} regression(s) across {len(rows)} metric(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed change in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_report(rows, regressions)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
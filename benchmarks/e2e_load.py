@@ -0,0 +1,345 @@
+# benchmarks/e2e_load.py
+
+"""
+End-to-end load benchmark for github_bot and mcp_server.
+
+Starts both services plus local GitHub and OpenAI stand-ins, replays signed
+`pull_request` webhooks of several PR sizes at a fixed rate while a pool of
+chat users talks to `/chat`, then writes per-stage latency percentiles,
+throughput and event-loop lag as JSON.
+
+The bot answers webhooks with 202 and analyses them in the background, so
+the `webhook` stage runs from sending the webhook until the fake GitHub
+receives the PR comment (fetch, analysis and comment included);
+`webhook_ack` is the time to the 202 alone.
+
+    python -m benchmarks.e2e_load --duration 60 --webhook-rate 2 \\
+        --pr-sizes 5,50,500 --chat-concurrency 8 --output bench.json
+
+Both services still need a PostgreSQL database with `db/migrations.sql`
+applied; the usual PG_* variables are passed through unchanged.
+Compare two runs with `python -m benchmarks.compare old.json new.json`.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.compare import compare, print_report
+from benchmarks.fake_github import BENCH_OWNER, COMMENTS_PATH, PR_SIZE_STRIDE
+from benchmarks.instrument import RESET_PATH, STATS_PATH, StageRecorder
+
+WEBHOOK_SECRET = "bench-webhook-secret"
+BENCH_REPO = "bench-repo"
+
+CHAT_PROMPTS = [
+    "What rules are currently configured?",
+    "Why are .sql files not allowed?",
+    "Explain the max_file_limit rule.",
+    "What should reviewers look for in a database migration?",
+]
+
+
+def git_sha() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def write_private_key(directory: str) -> str:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = os.path.join(directory, "bench-app.pem")
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption(),
+        ))
+    return path
+
+
+def build_webhook(pr_number: int, github_url: str) -> bytes:
+    full_name = f"{BENCH_OWNER}/{BENCH_REPO}"
+    payload = {
+        "action": "opened",
+        "number": pr_number,
+        "pull_request": {
+            "number": pr_number,
+            "url": f"{github_url}/repos/{full_name}/pulls/{pr_number}",
+            "html_url": f"https://github.com/{full_name}/pull/{pr_number}",
+            "title": f"Synthetic PR {pr_number}",
+            "body": "Generated by the benchmark harness.",
+            "user": {"login": "bench-user", "id": 1, "html_url": "https://github.com/bench-user"},
+            "created_at": "2024-01-01T00:00:00Z",
+            "updated_at": "2024-01-01T00:00:00Z",
+            "closed_at": None,
+            "merged_at": None,
+            "merged": False,
+            "base": {"sha": "0" * 40, "ref": "main"},
+            "head": {"sha": f"{pr_number:040x}", "ref": f"bench-{pr_number}"},
+        },
+        "repository": {
+            "name": BENCH_REPO,
+            "full_name": full_name,
+            "owner": {"login": BENCH_OWNER},
+        },
+        "installation": {"id": 1},
+    }
+    return json.dumps(payload).encode()
+
+
+def sign(body: bytes) -> str:
+    return "sha256=" + hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+class Services:
+    """Launches the four processes and tears them down again."""
+
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.procs: Dict[str, subprocess.Popen] = {}
+        self.urls = {
+            "github": f"http://127.0.0.1:{args.github_port}",
+            "llm": f"http://127.0.0.1:{args.llm_port}",
+            "mcp_server": f"http://127.0.0.1:{args.mcp_port}",
+            "github_bot": f"http://127.0.0.1:{args.bot_port}",
+        }
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            "GITHUB_API_URL": self.urls["github"],
+            "OPENAI_BASE_URL": f"{self.urls['llm']}/v1",
+            "OPENAI_API_KEY": "bench",
+            "WEBHOOK_SECRET": WEBHOOK_SECRET,
+            "APP_ID": "1",
+            "PRIVATE_KEY_PATH": write_private_key(self.workdir),
+            "MCP_URL": f"{self.urls['mcp_server']}/analyze_pr",
+            "MCP_SERVER_URL": self.urls["mcp_server"],
+            "FAKE_GITHUB_LATENCY_MS": str(self.args.github_latency_ms),
+            "FAKE_LLM_BASE_MS": str(self.args.llm_latency_ms),
+            # All benchmark webhooks come from one installation; its per-installation
+            # rate cap would otherwise dominate the measurement
+            "WEBHOOK_INSTALLATION_RATE_PER_MINUTE": "0",
+        })
+        return env
+
+    def start(self):
+        env = self.env()
+        targets = {
+            "github": ("benchmarks.fake_github:app", self.args.github_port),
+            "llm": ("benchmarks.fake_llm:app", self.args.llm_port),
+            "mcp_server": ("mcp_server.main:app", self.args.mcp_port),
+            "github_bot": ("github_bot.main:app", self.args.bot_port),
+        }
+        for name, (target, port) in targets.items():
+            self.procs[name] = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.serve", target, "--port", str(port)],
+                env=env,
+            )
+
+    async def wait_ready(self, client: httpx.AsyncClient, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        for name, url in self.urls.items():
+            while True:
+                if self.procs[name].poll() is not None:
+                    raise RuntimeError(f"{name} exited during startup")
+                try:
+                    if (await client.get(url + STATS_PATH)).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{name} did not become ready")
+                await asyncio.sleep(0.2)
+
+    async def reset(self, client: httpx.AsyncClient):
+        for url in self.urls.values():
+            await client.post(url + RESET_PATH)
+
+    async def collect(self, client: httpx.AsyncClient) -> dict:
+        return {name: (await client.get(url + STATS_PATH)).json() for name, url in self.urls.items()}
+
+    def stop(self):
+        for proc in self.procs.values():
+            proc.terminate()
+        for proc in self.procs.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+async def webhook_load(client, services, args, recorder: StageRecorder, stop_at: float):
+    """Open-loop webhook replay: requests go out on schedule regardless of backlog."""
+    sizes: List[int] = [int(s) for s in args.pr_sizes.split(",")]
+    interval = 1.0 / args.webhook_rate
+    pending = set()
+    seq = 0
+
+    async def send(size: int, pr_number: int):
+        body = build_webhook(pr_number, services.urls["github"])
+        headers = {
+            "Content-Type": "application/json",
+            "X-GitHub-Event": "pull_request",
+            "X-Hub-Signature-256": sign(body),
+        }
+        sent_at = time.time()  # Wall clock: compared with the fake GitHub's comment time
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = await client.post(services.urls["github_bot"] + "/webhook", content=body, headers=headers)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            pass
+        recorder.record("webhook_ack", time.perf_counter() - start, ok)
+
+        if ok:
+            # The analysis is done when its comment reaches GitHub
+            ok = False
+            try:
+                resp = await client.get(
+                    f"{services.urls['github']}{COMMENTS_PATH}/{BENCH_OWNER}/{BENCH_REPO}/{pr_number}",
+                    params={"timeout": args.drain_timeout},
+                    timeout=args.drain_timeout + 5,
+                )
+                ok = resp.status_code == 200
+            except httpx.HTTPError:
+                pass
+        elapsed = (resp.json()["posted_at"] if ok else time.time()) - sent_at
+        recorder.record("webhook", elapsed, ok)
+        recorder.record(f"webhook[{size}_files]", elapsed, ok)
+
+    next_send = time.perf_counter()
+    while time.perf_counter() < stop_at:
+        size = sizes[seq % len(sizes)]
+        seq += 1
+        # Run id keeps PR numbers unique across runs so upserts don't collide.
+        pr_number = size * PR_SIZE_STRIDE + (args.run_id * 1000 + seq) % PR_SIZE_STRIDE
+        task = asyncio.create_task(send(size, pr_number))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        next_send += interval
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    if pending:
+        await asyncio.wait(pending, timeout=args.drain_timeout)
+
+
+async def chat_user(client, services, worker: int, recorder: StageRecorder, stop_at: float):
+    """Closed-loop chat user: one request in flight, reusing its session."""
+    session_id = None
+    turn = 0
+    while time.perf_counter() < stop_at:
+        body = {
+            "message": CHAT_PROMPTS[turn % len(CHAT_PROMPTS)],
+            "session_id": session_id,
+            "user_id": f"bench-user-{worker}",
+        }
+        turn += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            resp = await client.post(services.urls["mcp_server"] + "/chat", json=body)
+            ok = resp.status_code == 200
+            if ok:
+                session_id = resp.json()["session_id"]
+        except httpx.HTTPError:
+            pass
+        recorder.record("chat", time.perf_counter() - start, ok)
+
+
+async def run(args) -> dict:
+    recorder = StageRecorder()
+    with tempfile.TemporaryDirectory() as workdir:
+        services = Services(args, workdir)
+        services.start()
+        try:
+            limits = httpx.Limits(max_connections=args.max_connections)
+            async with httpx.AsyncClient(timeout=args.request_timeout, limits=limits) as client:
+                await services.wait_ready(client)
+                await services.reset(client)
+                recorder.reset()
+
+                stop_at = time.perf_counter() + args.duration
+                tasks = [webhook_load(client, services, args, recorder, stop_at)]
+                tasks += [
+                    chat_user(client, services, worker, recorder, stop_at)
+                    for worker in range(args.chat_concurrency)
+                ]
+                await asyncio.gather(*tasks)
+
+                servers = await services.collect(client)
+        finally:
+            services.stop()
+
+    return {
+        "meta": {
+            "git_sha": git_sha(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": vars(args),
+        },
+        "client": recorder.snapshot(),
+        "servers": servers,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--webhook-rate", type=float, default=1.0, help="webhooks per second")
+    parser.add_argument("--pr-sizes", default="5,50,500", help="comma-separated file counts")
+    parser.add_argument("--chat-concurrency", type=int, default=4, help="concurrent chat users")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--github-latency-ms", type=float, default=20.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--run-id", type=int, default=int(time.time()) % 100)
+    parser.add_argument("--github-port", type=int, default=9101)
+    parser.add_argument("--llm-port", type=int, default=9102)
+    parser.add_argument("--mcp-port", type=int, default=9103)
+    parser.add_argument("--bot-port", type=int, default=9104)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="baseline result file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"[INFO] Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, results, args.threshold)
+        print_report(rows, regressions)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# benchmarks/fake_github.py
+
+"""
+Local stand-in for the subset of the GitHub REST API the bot uses.
+
+PR size is encoded in the PR number: `pr_number // PR_SIZE_STRIDE` is the
+number of changed files, so the driver can ask for any size without the
+fake holding state. Responses are generated deterministically and cached.
+
+The bot acknowledges webhooks before analysing them, so the driver learns
+when an analysis finished from the PR comment instead: comment arrival
+times are recorded and `GET /_bench/comments/{owner}/{repo}/{pr_number}`
+long-polls for one.
+"""
+
+import asyncio
+import os
+import time
+from functools import lru_cache
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from benchmarks.synthetic import make_diff, make_files
+
+PR_SIZE_STRIDE = 100_000
+LATENCY_MS = float(os.getenv("FAKE_GITHUB_LATENCY_MS", "20"))
+BENCH_OWNER = "bench-org"
+COMMENTS_PATH = "/_bench/comments"
+
+# "owner/repo#number" -> wall-clock time the bot's comment arrived, and its waiters
+_comment_times: Dict[str, float] = {}
+_comment_events: Dict[str, asyncio.Event] = {}
+
+app = FastAPI(title="Fake GitHub API")
+
+
+def files_in_pr(pr_number: int) -> int:
+    return max(1, pr_number // PR_SIZE_STRIDE)
+
+
+@lru_cache(maxsize=64)
+def pr_files(pr_number: int):
+    return make_files(files_in_pr(pr_number), seed=files_in_pr(pr_number))
+
+
+@lru_cache(maxsize=64)
+def pr_diff(pr_number: int) -> str:
+    return make_diff(pr_files(pr_number), seed=files_in_pr(pr_number))
+
+
+def pr_json(owner: str, repo: str, pr_number: int, base_url: str) -> dict:
+    files = pr_files(pr_number)
+    return {
+        "number": pr_number,
+        "url": f"{base_url}/repos/{owner}/{repo}/pulls/{pr_number}",
+        "html_url": f"https://github.com/{owner}/{repo}/pull/{pr_number}",
+        "title": f"Synthetic PR with {len(files)} files",
+        "body": "Generated by the benchmark harness.",
+        "state": "open",
+        "user": {"login": "bench-user", "id": 1, "html_url": "https://github.com/bench-user"},
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": "2024-01-01T00:00:00Z",
+        "closed_at": None,
+        "merged_at": None,
+        "merged": False,
+        "commits": 1,
+        "additions": sum(f["additions"] for f in files),
+        "deletions": sum(f["deletions"] for f in files),
+        "changed_files": len(files),
+        "comments": 0,
+        "review_comments": 0,
+        "base": {"sha": "0" * 40, "ref": "main"},
+        "head": {"sha": f"{pr_number:040x}", "ref": f"bench-{pr_number}"},
+    }
+
+
+async def simulated_latency():
+    if LATENCY_MS > 0:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+
+@app.post("/app/installations/{installation_id}/access_tokens")
+async def access_token(installation_id: int):
+    await simulated_latency()
+    return JSONResponse(
+        status_code=201,
+        content={"token": f"fake-installation-token-{installation_id}", "expires_at": "2099-01-01T00:00:00Z"},
+    )
+
+
+@app.get("/app/installations")
+async def installations():
+    await simulated_latency()
+    return [{"id": 1, "account": {"login": BENCH_OWNER, "type": "Organization"}}]
+
+
+@app.get("/repos/{owner}/{repo}/pulls/{pr_number}/files")
+async def pull_files(owner: str, repo: str, pr_number: int):
+    await simulated_latency()
+    return pr_files(pr_number)
+
+
+@app.get("/repos/{owner}/{repo}/pulls/{pr_number}")
+async def pull(owner: str, repo: str, pr_number: int, request: Request):
+    await simulated_latency()
+    if "diff" in request.headers.get("accept", ""):
+        return PlainTextResponse(pr_diff(pr_number))
+    return pr_json(owner, repo, pr_number, str(request.base_url).rstrip("/"))
+
+
+@app.get("/repos/{owner}/{repo}/pulls")
+async def pulls(owner: str, repo: str, request: Request):
+    await simulated_latency()
+    base_url = str(request.base_url).rstrip("/")
+    return [pr_json(owner, repo, PR_SIZE_STRIDE * size + 1, base_url) for size in (1, 5, 20)]
+
+
+def _comment_event(key: str) -> asyncio.Event:
+    return _comment_events.setdefault(key, asyncio.Event())
+
+
+@app.post("/repos/{owner}/{repo}/issues/{pr_number}/comments")
+async def comment(owner: str, repo: str, pr_number: int):
+    key = f"{owner}/{repo}#{pr_number}"
+    _comment_times[key] = time.time()
+    _comment_event(key).set()
+    await simulated_latency()
+    return JSONResponse(status_code=201, content={"id": pr_number, "body": "ok"})
+
+
+@app.get(COMMENTS_PATH + "/{owner}/{repo}/{pr_number}")
+async def comment_posted(owner: str, repo: str, pr_number: int, timeout: float = 120.0):
+    """Wait for the bot to comment on a PR; returns the wall-clock arrival time, 404 on timeout"""
+    key = f"{owner}/{repo}#{pr_number}"
+    try:
+        await asyncio.wait_for(_comment_event(key).wait(), timeout)
+    except asyncio.TimeoutError:
+        return JSONResponse(status_code=404, content={"error": "no comment yet"})
+    _comment_events.pop(key, None)
+    return {"posted_at": _comment_times.pop(key)}
+
+
+@app.get("/user")
+async def user():
+    await simulated_latency()
+    return {"login": "bench-user", "id": 1}
+
+
+@app.get("/user/repos")
+async def user_repos():
+    await simulated_latency()
+    return [{
+        "name": "bench-repo",
+        "full_name": f"{BENCH_OWNER}/bench-repo",
+        "open_issues_count": 3,
+        "updated_at": "2024-01-01T00:00:00Z",
+        "description": "Synthetic repository",
+        "private": False,
+    }]
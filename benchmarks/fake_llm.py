@@ -0,0 +1,61 @@
+# benchmarks/fake_llm.py
+
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Latency is `FAKE_LLM_BASE_MS + FAKE_LLM_MS_PER_1K_TOKENS * prompt_tokens/1000`
+so larger diffs cost more, like the real thing. Token counts are estimated
+at four characters per token.
+"""
+
+import asyncio
+import os
+import time
+
+from fastapi import FastAPI, Request
+
+BASE_MS = float(os.getenv("FAKE_LLM_BASE_MS", "300"))
+MS_PER_1K_TOKENS = float(os.getenv("FAKE_LLM_MS_PER_1K_TOKENS", "40"))
+
+app = FastAPI(title="Fake OpenAI API")
+
+SUMMARY_REPLY = (
+    "- **Goal:** Synthetic change\n"
+    "- **Key Changes:** Several files updated\n"
+    "- **Impact:** None\n"
+    "- **Risks/Edge Cases:** None\n"
+    "- **Testing:** Benchmark only"
+)
+
+
+@app.post("/v1/chat/completions")
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    prompt_chars = sum(len(m.get("content") or "") for m in messages)
+    prompt_tokens = prompt_chars // 4 + 1
+
+    await asyncio.sleep((BASE_MS + MS_PER_1K_TOKENS * prompt_tokens / 1000) / 1000)
+
+    # interpret_rule_request expects a bare JSON array of actions.
+    wants_json = any("Return only valid JSON array" in (m.get("content") or "") for m in messages)
+    content = "[]" if wants_json else SUMMARY_REPLY
+    completion_tokens = len(content) // 4 + 1
+
+    return {
+        "id": f"chatcmpl-bench-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
@@ -0,0 +1,150 @@
+# benchmarks/instrument.py
+
+"""
+Per-route latency and event-loop lag recording for benchmarked servers.
+
+`instrument(app)` wraps any FastAPI app without touching its code: it adds
+a timing middleware, a loop-lag sampler tied to the app lifespan, and
+`GET /_bench/stats` / `POST /_bench/reset` endpoints the driver scrapes.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+STATS_PATH = "/_bench/stats"
+RESET_PATH = "/_bench/reset"
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as millisecond percentiles."""
+    ordered = sorted(values)
+    count = len(ordered)
+    return {
+        "count": count,
+        "mean_ms": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+class StageRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, ok: bool = True):
+        self.samples[stage].append(seconds)
+        if not ok:
+            self.errors[stage] += 1
+
+    def reset(self):
+        self.samples.clear()
+        self.errors.clear()
+        self.started = time.perf_counter()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        result = {}
+        for stage, values in self.samples.items():
+            stats = summarize(values)
+            stats["errors"] = self.errors.get(stage, 0)
+            stats["throughput_rps"] = round(len(values) / elapsed, 3)
+            result[stage] = stats
+        return result
+
+
+class TimingMiddleware:
+    """ASGI middleware recording latency per route template (e.g. `POST /chat`)."""
+
+    def __init__(self, app, recorder: StageRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/_bench/"):
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            self.recorder.record(
+                f"{scope['method']} {path}",
+                time.perf_counter() - start,
+                ok=status["code"] < 500,
+            )
+
+
+class LoopLagMonitor:
+    """Samples how late `asyncio.sleep(interval)` wakes up on the server loop."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def reset(self):
+        self.samples.clear()
+
+    def snapshot(self) -> Dict[str, float]:
+        return summarize(self.samples)
+
+
+def instrument(app, lag_interval: float = 0.05):
+    recorder = StageRecorder()
+    monitor = LoopLagMonitor(lag_interval)
+
+    app.add_middleware(TimingMiddleware, recorder=recorder)
+
+    async def stats():
+        return {"stages": recorder.snapshot(), "event_loop_lag": monitor.snapshot()}
+
+    async def reset():
+        recorder.reset()
+        monitor.reset()
+        return {"status": "reset"}
+
+    app.add_api_route(STATS_PATH, stats, methods=["GET"], include_in_schema=False)
+    app.add_api_route(RESET_PATH, reset, methods=["POST"], include_in_schema=False)
+
+    original_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(a):
+        task = asyncio.create_task(monitor.run())
+        try:
+            async with original_lifespan(a) as state:
+                yield state
+        finally:
+            task.cancel()
+
+    app.router.lifespan_context = lifespan
+    return app
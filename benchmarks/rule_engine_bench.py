@@ -0,0 +1,198 @@
+# benchmarks/rule_engine_bench.py
+
+"""
+Microbenchmarks for the `/analyze_pr` rule-engine hot path.
+
+Times YAML rule loading, `run_static_checks` over synthetic file lists and
+serialization of the resulting `RuleViolation`s, and records peak memory
+for each. Results can be stored as a baseline and later runs flagged
+against it:
+
+    python -m benchmarks.rule_engine_bench --update-baseline
+    python -m benchmarks.rule_engine_bench            # exits 1 on regression
+
+Absolute timings are machine-specific; keep baselines per machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+import yaml  # type: ignore
+
+from benchmarks.compare import compare, print_report
+from benchmarks.synthetic import make_files, WORDS
+from mcp_server import rule_engine
+from mcp_server.models import AnalyzeResponse, FileEntry
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "rule_engine.json")
+
+# Endings and names that actually occur in `synthetic.make_files` output,
+# so a realistic share of rules fire.
+ENDSWITH_MATCHES = [".sql", ".env", ".png", ".sh", ".json", ".yaml", ".md", ".lock", ".pem", ".key"]
+EQUALS_MATCHES = [".env", "package-lock.json", "Makefile", "setup.py", "Dockerfile"]
+
+
+def make_rules(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Return `count` rules, roughly 45% endswith, 45% equals, 10% global."""
+    rng = random.Random(seed)
+    rules = [{
+        "rule_id": "max_file_limit",
+        "type": "global",
+        "threshold": 40,
+        "reason": "PR should not modify more than 40 files",
+    }]
+    while len(rules) < count:
+        roll = rng.random()
+        n = len(rules)
+        if roll < 0.10:
+            rules.append({
+                "rule_id": f"global_rule_{n}",
+                "type": "global",
+                "threshold": rng.randint(10, 500),
+                "reason": "Synthetic global threshold",
+            })
+        elif roll < 0.55:
+            match = rng.choice(ENDSWITH_MATCHES) if rng.random() < 0.3 else f"_{rng.choice(WORDS)}.{n}"
+            rules.append({
+                "rule_id": f"endswith_rule_{n}",
+                "type": "endswith",
+                "match": match,
+                "reason": f"Files ending in {match} are not allowed",
+            })
+        else:
+            match = rng.choice(EQUALS_MATCHES) if rng.random() < 0.3 else f"{rng.choice(WORDS)}/{n}.txt"
+            rules.append({
+                "rule_id": f"equals_rule_{n}",
+                "type": "equals",
+                "match": match,
+                "reason": f"{match} must not be modified",
+            })
+    return rules
+
+
+def time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Time `fn` `repeat` times and measure its peak allocation once."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "min_ms": round(min(samples) * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "peak_bytes": peak,
+    }
+
+
+def serialize(violations) -> str:
+    response = AnalyzeResponse(summary="", rule_violations=violations)
+    if hasattr(response, "model_dump_json"):
+        return response.model_dump_json()
+    return response.json()
+
+
+def run(args) -> dict:
+    file_sizes = [int(x) for x in args.files.split(",")]
+    rule_sizes = [int(x) for x in args.rules.split(",")]
+    results: Dict[str, Dict[str, Any]] = {"load": {}, "evaluation": {}, "serialization": {}}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rule_paths = {}
+        for n_rules in rule_sizes:
+            path = os.path.join(workdir, f"rules_{n_rules}.yaml")
+            with open(path, "w") as f:
+                yaml.dump(make_rules(n_rules, seed=n_rules), f, default_flow_style=False, indent=2)
+            rule_paths[n_rules] = path
+
+        original_rules_file = rule_engine.RULES_FILE
+        try:
+            for n_rules, path in rule_paths.items():
+                rule_engine.RULES_FILE = path
+                results["load"][f"rules={n_rules}"] = time_call(rule_engine.load_rules, args.repeat)
+
+            for n_files in file_sizes:
+                files = [FileEntry(**f) for f in make_files(n_files, seed=n_files)]
+                for n_rules, path in rule_paths.items():
+                    key = f"files={n_files},rules={n_rules}"
+                    if n_files * n_rules > args.max_work:
+                        print(f"[INFO] Skipping {key}: exceeds --max-work")
+                        continue
+                    rule_engine.RULES_FILE = path
+                    stats = time_call(lambda: rule_engine.run_static_checks(files), args.repeat)
+                    violations = rule_engine.run_static_checks(files)
+                    stats["violations"] = len(violations)
+                    results["evaluation"][key] = stats
+                    results["serialization"][key] = time_call(lambda: serialize(violations), args.repeat)
+                    print(f"[INFO] {key}: {stats['median_ms']} ms, {len(violations)} violations")
+        finally:
+            rule_engine.RULES_FILE = original_rules_file
+
+    results["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+    }
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", default="10,1000,10000,50000", help="comma-separated file counts")
+    parser.add_argument("--rules", default="5,100,2000", help="comma-separated rule counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-work", type=int, default=20_000_000,
+                        help="skip combinations where files x rules exceeds this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=15.0, help="regression threshold in percent")
+    parser.add_argument("--output", help="also write results to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"[INFO] Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"[INFO] No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(baseline, results, args.threshold)
+    print_report(rows, regressions)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
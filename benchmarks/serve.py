@@ -0,0 +1,36 @@
+# benchmarks/serve.py
+
+"""
+Run an ASGI app with benchmark instrumentation attached.
+
+    python -m benchmarks.serve mcp_server.main:app --port 8000
+"""
+
+import argparse
+import importlib
+
+import uvicorn
+
+from benchmarks.instrument import instrument
+
+
+def load_app(target: str):
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr or "app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("target", help="module:attribute of the FastAPI app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--lag-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    app = instrument(load_app(args.target), lag_interval=args.lag_interval)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/synthetic.py
+
+"""
+Deterministic generators for synthetic pull requests.
+
+The same seed always produces the same file list and diff, so runs on
+different commits exercise identical inputs.
+"""
+
+import random
+from typing import List, Dict, Any
+
+# Rough shape of a real monorepo: most changes land in source trees,
+# a long tail touches docs, config, migrations and lockfiles.
+PATH_DISTRIBUTION = [
+    (0.45, "src/{pkg}/{mod}/{name}.py"),
+    (0.15, "tests/{pkg}/test_{name}.py"),
+    (0.10, "web/src/components/{Name}.tsx"),
+    (0.08, "docs/{pkg}/{name}.md"),
+    (0.06, "config/{pkg}/{name}.yaml"),
+    (0.05, "db/migrations/{num}_{name}.sql"),
+    (0.04, "scripts/{name}.sh"),
+    (0.03, "{pkg}/package-lock.json"),
+    (0.02, "services/{pkg}/.env"),
+    (0.02, "assets/{pkg}/{name}.png"),
+]
+
+PACKAGES = ["auth", "billing", "core", "search", "api", "worker", "ui", "infra"]
+MODULES = ["handlers", "models", "utils", "services", "adapters", "schemas"]
+WORDS = [
+    "user", "token", "session", "invoice", "query", "index", "cache", "event",
+    "report", "client", "payload", "config", "router", "job", "metric", "lock",
+]
+STATUSES = [(0.70, "modified"), (0.22, "added"), (0.06, "removed"), (0.02, "renamed")]
+
+
+def _weighted(rng: random.Random, table):
+    roll = rng.random()
+    acc = 0.0
+    for weight, value in table:
+        acc += weight
+        if roll <= acc:
+            return value
+    return table[-1][1]
+
+
+def make_path(rng: random.Random) -> str:
+    template = _weighted(rng, PATH_DISTRIBUTION)
+    name = "_".join(rng.sample(WORDS, 2))
+    return template.format(
+        pkg=rng.choice(PACKAGES),
+        mod=rng.choice(MODULES),
+        name=name,
+        Name="".join(part.title() for part in name.split("_")),
+        num=f"{rng.randint(1, 9999):04d}",
+    )
+
+
+def make_files(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Return `count` GitHub-style file entries with realistic paths and churn."""
+    rng = random.Random(seed)
+    files = []
+    seen = set()
+    while len(files) < count:
+        path = make_path(rng)
+        if path in seen:
+            path = f"{path.rsplit('.', 1)[0]}_{len(files)}.{path.rsplit('.', 1)[-1]}"
+        seen.add(path)
+        status = _weighted(rng, STATUSES)
+        # Churn is heavy-tailed: most files change a handful of lines.
+        additions = int(rng.paretovariate(1.2) * 4)
+        deletions = 0 if status == "added" else int(rng.paretovariate(1.4) * 2)
+        files.append({
+            "filename": path,
+            "status": status,
+            "additions": min(additions, 2000),
+            "deletions": min(deletions, 2000),
+        })
+    return files
+
+
+def make_diff(files: List[Dict[str, Any]], seed: int = 0, max_lines_per_file: int = 200) -> str:
+    """Render a unified diff whose hunks match the additions/deletions of `files`."""
+    rng = random.Random(seed)
+    chunks = []
+    for f in files:
+        name = f["filename"]
+        adds = min(f.get("additions", 0), max_lines_per_file)
+        dels = min(f.get("deletions", 0), max_lines_per_file)
+        start = rng.randint(1, 400)
+        chunks.append(f"diff --git a/{name} b/{name}\n")
+        chunks.append(f"--- a/{name}\n+++ b/{name}\n")
+        chunks.append(f"@@ -{start},{dels + 3} +{start},{adds + 3} @@\n")
+        chunks.append(" context line\n")
+        for _ in range(dels):
+            chunks.append(f"-    {rng.choice(WORDS)} = {rng.choice(WORDS)}({rng.randint(0, 99)})\n")
+        for _ in range(adds):
+            chunks.append(f"+    {rng.choice(WORDS)} = {rng.choice(WORDS)}({rng.randint(0, 99)})\n")
+        chunks.append(" context line\n context line\n")
+    return "".join(chunks)
@@ -0,0 +1,113 @@
+# common/metrics.py
+
+"""
+Minimal in-process metrics: counters, gauges and rolling latency summaries.
+
+Shared by mcp_server and github_bot. Metric names take optional labels,
+rendered Prometheus-style into the key (`llm_queue_wait_ms{lane="interactive"}`).
+`snapshot()` backs each service's `GET /metrics` endpoint. Values are per
+worker process.
+"""
+
+import math
+import os
+import resource
+from collections import deque
+from typing import Any, Callable, Dict
+
+SUMMARY_WINDOW = 1024
+
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_gauge_fns: Dict[str, Callable[[], float]] = {}
+_summaries: Dict[str, "Summary"] = {}
+
+
+class Summary:
+    """Count and sum of all observations plus percentiles over the last SUMMARY_WINDOW"""
+
+    def __init__(self, window: int = SUMMARY_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.recent.append(value)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": round(self.percentile(50), 3),
+            "p95": round(self.percentile(95), 3),
+            "p99": round(self.percentile(99), 3),
+        }
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    rendered = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{rendered}}}"
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    _gauges[_key(name, labels)] = value
+
+
+def gauge_fn(name: str, fn: Callable[[], float], **labels):
+    """Register a gauge computed when metrics are read"""
+    _gauge_fns[_key(name, labels)] = fn
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = _summaries[key] = Summary()
+    summary.observe(value)
+
+
+def get_summary(name: str, **labels) -> Summary:
+    key = _key(name, labels)
+    summary = _summaries.get(key)
+    if summary is None:
+        summary = _summaries[key] = Summary()
+    return summary
+
+
+def snapshot() -> Dict[str, Any]:
+    gauges = dict(_gauges)
+    for key, fn in _gauge_fns.items():
+        try:
+            gauges[key] = fn()
+        except Exception as e:
+            print(f"[ERROR] Gauge {key} failed: {e}")
+    return {
+        "counters": dict(_counters),
+        "gauges": gauges,
+        "summaries": {key: s.snapshot() for key, s in _summaries.items()},
+    }
+
+
+def process_rss_bytes() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
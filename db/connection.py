@@ -1,20 +1,39 @@
+import asyncio
+import inspect
+import json
 import os
+from contextlib import asynccontextmanager
 import asyncpg
 
 
 _pool: asyncpg.Pool = None
 
 
-async def init_db_pool():
-    global _pool
-    _pool = await asyncpg.create_pool(
+def _connect_kwargs() -> dict:
+    return dict(
         host=os.getenv("PG_HOST", ""),
         port=int(os.getenv("PG_PORT", 0)),
         user=os.getenv("PG_USER", "siddhant"),
         password=os.getenv("PG_PASSWORD", ""),
         database=os.getenv("PG_DATABASE", ""),
+    )
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Decode json/jsonb columns to Python objects and encode parameters from them"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+async def init_db_pool():
+    global _pool
+    _pool = await asyncpg.create_pool(
+        **_connect_kwargs(),
         min_size=1,
         max_size=10,
+        init=_init_connection,
     )
 
 
@@ -22,3 +41,114 @@ def get_db_pool() -> asyncpg.Pool:
     if not _pool:
         raise RuntimeError("DB pool not initialized")
     return _pool
+
+
+@asynccontextmanager
+async def try_advisory_lock(key: int):
+    """Hold a session advisory lock for the block if it is free; yields whether it was taken"""
+    async with get_db_pool().acquire() as conn:
+        locked = await conn.fetchval("SELECT pg_try_advisory_lock($1)", key)
+        try:
+            yield locked
+        finally:
+            if locked:
+                await conn.execute("SELECT pg_advisory_unlock($1)", key)
+
+
+def is_permanent_error(e: Exception) -> bool:
+    """Errors that retrying the same statement cannot fix: constraint violations and bad data"""
+    return isinstance(e, (
+        asyncpg.exceptions.IntegrityConstraintViolationError,
+        asyncpg.exceptions.DataError,
+    ))
+
+
+async def create_listener(channel: str, callback) -> asyncpg.Connection:
+    """Open a dedicated connection that LISTENs on `channel`; caller closes it"""
+    conn = await asyncpg.connect(**_connect_kwargs())
+    await _init_connection(conn)
+    await conn.add_listener(channel, callback)
+    return conn
+
+
+class Listener:
+    """A LISTEN connection that reconnects when the database goes away.
+
+    Notifications sent while disconnected are lost, so `on_disconnect`
+    lets the owner stop trusting its cached state and `on_connect` (called
+    after every successful connect, the first included) lets it resync.
+    Callbacks may be plain functions or coroutine functions.
+    """
+
+    def __init__(self, channel: str, callback, on_connect=None, on_disconnect=None,
+                 check_interval: float = float(os.getenv("PG_LISTEN_CHECK_SECONDS", "5")),
+                 max_backoff: float = float(os.getenv("PG_LISTEN_MAX_BACKOFF_SECONDS", "60"))):
+        self.channel = channel
+        self.callback = callback
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self._conn = None
+        self._task = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    async def _call(self, hook):
+        if hook is not None:
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
+
+    async def _connect(self):
+        self._conn = await create_listener(self.channel, self.callback)
+        try:
+            await self._call(self.on_connect)
+        except Exception as e:
+            print(f"[ERROR] LISTEN {self.channel} connect hook failed: {e}")
+
+    async def start(self):
+        """Connect and keep the connection alive; a failed first connect is retried in the background"""
+        try:
+            await self._connect()
+        except Exception as e:
+            print(f"[ERROR] LISTEN {self.channel} unavailable, retrying: {e}")
+            self._conn = None
+        self._task = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        delay = self.check_interval
+        while True:
+            await asyncio.sleep(delay)
+            if self.connected:
+                delay = self.check_interval
+                continue
+            if self._conn is not None:
+                print(f"[ERROR] LISTEN {self.channel} connection lost, reconnecting")
+                self._conn.terminate()
+                self._conn = None
+                try:
+                    await self._call(self.on_disconnect)
+                except Exception as e:
+                    print(f"[ERROR] LISTEN {self.channel} disconnect hook failed: {e}")
+            try:
+                await self._connect()
+                print(f"[INFO] LISTEN {self.channel} reconnected")
+                delay = self.check_interval
+            except Exception as e:
+                print(f"[ERROR] LISTEN {self.channel} reconnect failed: {e}")
+                delay = min(delay * 2, self.max_backoff)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -1,7 +1,47 @@
+import base64
 import json
+import time
 from db.connection import get_db_pool as _get_db_pool
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+
+# pr_summary columns and types written by the upserts below
+_PR_SUMMARY_COLUMNS = (
+    ("repo_full_name", "text"), ("pr_number", "int"), ("pr_url", "text"), ("title", "text"),
+    ("author_login", "text"), ("created_at", "timestamptz"), ("closed_at", "timestamptz"),
+    ("merged_at", "timestamptz"), ("is_merged", "bool"), ("commits_count", "int"),
+    ("additions", "int"), ("deletions", "int"), ("changed_files", "int"),
+    ("comments_count", "int"), ("review_comments_count", "int"), ("approvals_count", "int"),
+    ("violation_count", "int"), ("violations", "jsonb"), ("summary_text", "text"),
+    ("summary_generated_at", "timestamptz"), ("base_sha", "text"), ("head_sha", "text"),
+    ("file_paths", "text"),
+)
+
+# Columns whose stored value a NULL write keeps instead of clearing; a
+# webhook whose analysis failed writes no summary
+_PR_SUMMARY_KEEP_STORED = frozenset({
+    "summary_text", "summary_generated_at", "base_sha", "head_sha", "file_paths"
+})
+# Bulk writes (backfills, imports) may not know a PR's review comment
+# count either; NULL there keeps what a webhook stored earlier
+_PR_SUMMARY_BULK_KEEP_STORED = _PR_SUMMARY_KEEP_STORED | {"review_comments_count"}
+
+
+def _pr_summary_upsert_set(keep_stored: frozenset) -> str:
+    """ON CONFLICT clause updating every pr_summary column, COALESCE-ing those in `keep_stored`"""
+    assignments = []
+    for name, _ in _PR_SUMMARY_COLUMNS:
+        if name in ("repo_full_name", "pr_number"):
+            continue
+        value = f"COALESCE(EXCLUDED.{name}, pr_summary.{name})" if name in keep_stored else f"EXCLUDED.{name}"
+        assignments.append(f"      {name:<21} = {value},")
+    assignments.append("      metrics_updated_at    = now()")
+    return "\n    ON CONFLICT (repo_full_name, pr_number) DO UPDATE SET\n" + "\n".join(assignments) + "\n"
+
+
+_PR_SUMMARY_UPSERT_SET = _pr_summary_upsert_set(_PR_SUMMARY_KEEP_STORED)
+_PR_SUMMARY_BULK_UPSERT_SET = _pr_summary_upsert_set(_PR_SUMMARY_BULK_KEEP_STORED)
 
 
 async def upsert_pr_summary(
@@ -23,8 +63,11 @@ async def upsert_pr_summary(
     approvals_count: int,
     violation_count: int,
     violations: list,
-    summary_text: str,
+    summary_text: Optional[str],
     summary_generated_at,
+    base_sha: Optional[str] = None,
+    head_sha: Optional[str] = None,
+    file_paths: Optional[List[str]] = None,
 ) -> int:
     pool = _get_db_pool()
     sql = """
@@ -34,35 +77,16 @@ async def upsert_pr_summary(
       commits_count, additions, deletions, changed_files,
       comments_count, review_comments_count, approvals_count,
       violation_count, violations, summary_text, summary_generated_at,
-      metrics_updated_at
+      base_sha, head_sha, file_paths, metrics_updated_at
     ) VALUES (
       $1, $2, $3, $4, $5,
       $6, $7, $8, $9,
       $10, $11, $12, $13,
       $14, $15, $16,
       $17, $18::jsonb, $19, $20,
-      now()
+      $21, $22, $23, now()
     )
-    ON CONFLICT (repo_full_name, pr_number) DO UPDATE SET
-      pr_url                = EXCLUDED.pr_url,
-      title                 = EXCLUDED.title,
-      author_login          = EXCLUDED.author_login,
-      created_at            = EXCLUDED.created_at,
-      closed_at             = EXCLUDED.closed_at,
-      merged_at             = EXCLUDED.merged_at,
-      is_merged             = EXCLUDED.is_merged,
-      commits_count         = EXCLUDED.commits_count,
-      additions             = EXCLUDED.additions,
-      deletions             = EXCLUDED.deletions,
-      changed_files         = EXCLUDED.changed_files,
-      comments_count        = EXCLUDED.comments_count,
-      review_comments_count = EXCLUDED.review_comments_count,
-      approvals_count       = EXCLUDED.approvals_count,
-      violation_count       = EXCLUDED.violation_count,
-      violations            = EXCLUDED.violations,
-      summary_text          = EXCLUDED.summary_text,
-      summary_generated_at  = EXCLUDED.summary_generated_at,
-      metrics_updated_at    = now()
+    """ + _PR_SUMMARY_UPSERT_SET + """
     RETURNING id;
     """
     row = await pool.fetchrow(
@@ -71,18 +95,162 @@ async def upsert_pr_summary(
         created_at, closed_at, merged_at, is_merged,
         commits_count, additions, deletions, changed_files,
         comments_count, review_comments_count, approvals_count,
-        violation_count, json.dumps(violations), summary_text, summary_generated_at
+        violation_count, violations, summary_text, summary_generated_at,
+        base_sha, head_sha, "\n".join(file_paths) if file_paths is not None else None
     )
     return row["id"]
 
 
+def _staging_records(rows: Iterable[Dict[str, Any]]) -> Iterator[tuple]:
+    """pr_summary rows as COPY records for the staging table, numbered in input order"""
+    for seq, row in enumerate(rows):
+        record = [seq]
+        for name, _ in _PR_SUMMARY_COLUMNS:
+            value = row.get(name)
+            if value is not None and name == "violations":
+                value = json.dumps(value)
+            elif value is not None and name == "file_paths":
+                value = "\n".join(value)
+            record.append(value)
+        yield tuple(record)
+
+
+async def bulk_upsert_pr_summaries(rows: Iterable[Dict[str, Any]], conn=None) -> Tuple[int, float]:
+    """Upsert many pr_summary rows; returns (rows written, seconds taken).
+
+    Each row has the keyword arguments of upsert_pr_summary; unlike there,
+    a missing or None summary_text, summary_generated_at or
+    review_comments_count keeps the stored value. Rows are
+    streamed with COPY into a temporary staging table and merged into
+    pr_summary with one INSERT ... ON CONFLICT; when a PR appears more than
+    once the last row wins. `rows` may be any iterable, e.g. a generator.
+    `conn` runs everything inside the caller's transaction.
+    """
+    if conn is None:
+        async with _get_db_pool().acquire() as conn:
+            return await bulk_upsert_pr_summaries(rows, conn)
+
+    columns = [name for name, _ in _PR_SUMMARY_COLUMNS]
+    # jsonb is staged as text: COPY is binary and the json codec is text-only
+    staging_columns = ", ".join(
+        f"{name} {'text' if pg_type == 'jsonb' else pg_type}" for name, pg_type in _PR_SUMMARY_COLUMNS
+    )
+    select_columns = ", ".join(
+        f"{name}::{pg_type}" if pg_type == "jsonb" else name for name, pg_type in _PR_SUMMARY_COLUMNS
+    )
+    started = time.perf_counter()
+    async with conn.transaction():
+        await conn.execute(f"CREATE TEMP TABLE _pr_summary_staging (seq int, {staging_columns})")
+        await conn.copy_records_to_table(
+            "_pr_summary_staging", records=_staging_records(rows), columns=["seq"] + columns
+        )
+        status = await conn.execute(
+            f"""
+            INSERT INTO pr_summary ({", ".join(columns)}, metrics_updated_at)
+            SELECT DISTINCT ON (repo_full_name, pr_number) {select_columns}, now()
+            FROM _pr_summary_staging
+            ORDER BY repo_full_name, pr_number, seq DESC
+            """ + _PR_SUMMARY_BULK_UPSERT_SET
+        )
+        await conn.execute("DROP TABLE _pr_summary_staging")
+    return int(status.split()[-1]), time.perf_counter() - started
+
+
+async def get_backfill_checkpoint(repo_full_name: str) -> Optional[Dict[str, Any]]:
+    pool = _get_db_pool()
+    row = await pool.fetchrow(
+        "SELECT cursor, prs_done, failed_prs, started_at, finished_at "
+        "FROM backfill_checkpoints WHERE repo_full_name = $1",
+        repo_full_name
+    )
+    return dict(row) if row else None
+
+
+async def reset_backfill_checkpoint(repo_full_name: str):
+    pool = _get_db_pool()
+    await pool.execute(
+        """
+        INSERT INTO backfill_checkpoints (repo_full_name) VALUES ($1)
+        ON CONFLICT (repo_full_name) DO UPDATE SET
+          cursor = NULL, prs_done = 0, failed_prs = '{}', started_at = NOW(),
+          updated_at = NOW(), finished_at = NULL
+        """,
+        repo_full_name
+    )
+
+
+async def save_backfill_page(
+    repo_full_name: str,
+    rows: List[Dict[str, Any]],
+    cursor: Optional[str],
+    failed_prs: List[int],
+    finished: bool,
+) -> Tuple[int, float]:
+    """Write one page of backfilled PRs and advance the checkpoint past it, atomically.
+
+    Returns (rows written, seconds the bulk upsert took).
+    """
+    pool = _get_db_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            written, elapsed = await bulk_upsert_pr_summaries(rows, conn)
+            await conn.execute(
+                """
+                INSERT INTO backfill_checkpoints (repo_full_name, cursor, prs_done, failed_prs, finished_at)
+                VALUES ($1, $2, $3, $4::int[], CASE WHEN $5 THEN NOW() END)
+                ON CONFLICT (repo_full_name) DO UPDATE SET
+                  cursor      = EXCLUDED.cursor,
+                  prs_done    = backfill_checkpoints.prs_done + EXCLUDED.prs_done,
+                  failed_prs  = backfill_checkpoints.failed_prs || EXCLUDED.failed_prs,
+                  updated_at  = NOW(),
+                  finished_at = EXCLUDED.finished_at
+                """,
+                repo_full_name, cursor, written, failed_prs, finished
+            )
+    return written, elapsed
+
+
+async def get_pr_summary(repo_full_name: str, pr_number: int) -> Optional[Dict[str, Any]]:
+    """Stored summary and commit SHAs for one PR, or None if it hasn't been analyzed"""
+    pool = _get_db_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT title, pr_url, author_login, summary_text, violations, base_sha, head_sha, summary_generated_at
+        FROM pr_summary
+        WHERE repo_full_name = $1 AND pr_number = $2
+        """,
+        repo_full_name, pr_number
+    )
+    return dict(row) if row else None
+
+
+async def get_pr_summaries(repo_full_name: str, pr_numbers: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Stored summaries and violations for several PRs in one query, keyed by PR number"""
+    if not pr_numbers:
+        return {}
+    pool = _get_db_pool()
+    rows = await pool.fetch(
+        """
+        SELECT pr_number, summary_text, violations, violation_count, summary_generated_at, head_sha
+        FROM pr_summary
+        WHERE repo_full_name = $1 AND pr_number = ANY($2::int[])
+        """,
+        repo_full_name, list(pr_numbers)
+    )
+    summaries = {}
+    for row in rows:
+        summary = dict(row)
+        summaries[summary.pop("pr_number")] = summary
+    return summaries
+
+
 async def insert_pr_event(
     pr_summary_id: int, event_type: str, payload: dict
 ):
     pool = get_db_pool()
     await pool.execute(
         "INSERT INTO pr_events(pr_summary_id, event_type, payload) VALUES($1,$2,$3::jsonb)",
-        pr_summary_id, event_type, json.dumps(payload),
+        pr_summary_id, event_type, payload,
     )
 
 
@@ -92,28 +260,24 @@ async def insert_assistant_interaction(
     pool = get_db_pool()
     await pool.execute(
         "INSERT INTO pr_assistant_interactions(pr_summary_id, user_query, assistant_resp) VALUES($1,$2,$3::jsonb)",
-        pr_summary_id, user_query, json.dumps(assistant_resp),
+        pr_summary_id, user_query, assistant_resp,
     )
 
 
 # Chat conversation functions
 async def create_chat_session(user_id: str, session_name: str | None = None) -> int:
     """Create a new chat session and return its ID"""
-    print(f"[DEBUG] Creating chat session for user: {user_id}")
     try:
         pool = get_db_pool()
         if not session_name:
             session_name = f"Chat {datetime.now().strftime('%Y-%m-%d %H:%M')}"
         
-        print(f"[DEBUG] Session name: {session_name}")
         row = await pool.fetchrow(
             "INSERT INTO chat_sessions (user_id, session_name, created_at) "
             "VALUES ($1, $2, now()) RETURNING id",
             user_id, session_name
         )
-        session_id = row["id"]
-        print(f"[DEBUG] Successfully created session with ID: {session_id}")
-        return session_id
+        return row["id"]
     except Exception as e:
         print(f"[ERROR] Failed to create chat session: {str(e)}")
         import traceback
@@ -124,74 +288,441 @@ async def create_chat_session(user_id: str, session_name: str | None = None) ->
 async def add_chat_message(
     session_id: int, role: str, content: str, metadata: dict | None = None
 ) -> int:
-    """Add a message to a chat session"""
+    """Add a message to a chat session and bump the session's counters"""
     pool = get_db_pool()
-    row = await pool.fetchrow(
-        "INSERT INTO chat_messages (session_id, role, content, metadata, created_at) "
-        "VALUES ($1, $2, $3, $4::jsonb, now()) RETURNING id",
-        session_id, role, content, json.dumps(metadata) if metadata else None
-    )
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            row = await conn.fetchrow(
+                "INSERT INTO chat_messages (session_id, role, content, metadata, created_at) "
+                "VALUES ($1, $2, $3, $4::jsonb, now()) RETURNING id, created_at",
+                session_id, role, content, metadata or None
+            )
+            await conn.execute(
+                "UPDATE chat_sessions SET message_count = message_count + 1, "
+                "last_message_at = GREATEST(last_message_at, $2) WHERE id = $1",
+                session_id, row["created_at"]
+            )
     return row["id"]
 
 
-async def get_chat_sessions(user_id: str) -> List[Dict[str, Any]]:
-    """Get all chat sessions for a user"""
-    print(f"[DEBUG] get_chat_sessions called with user_id: {user_id}")
+async def add_chat_messages_bulk(records: List[Dict[str, Any]]) -> set:
+    """Insert many chat messages in one statement and bump session counters.
+
+    Each record has session_id, role, content, metadata and created_at.
+    Returns the set of affected session ids.
+    """
+    if not records:
+        return set()
+    session_ids = [r["session_id"] for r in records]
+    created_ats = [r["created_at"] for r in records]
+    pool = get_db_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                "INSERT INTO chat_messages (session_id, role, content, metadata, created_at) "
+                "SELECT * FROM unnest($1::int[], $2::text[], $3::text[], $4::jsonb[], $5::timestamptz[])",
+                session_ids,
+                [r["role"] for r in records],
+                [r["content"] for r in records],
+                [r["metadata"] or None for r in records],
+                created_ats,
+            )
+            await conn.execute(
+                "UPDATE chat_sessions cs SET message_count = cs.message_count + b.n, "
+                "last_message_at = GREATEST(cs.last_message_at, b.last_at) "
+                "FROM (SELECT session_id, COUNT(*) AS n, MAX(created_at) AS last_at "
+                "      FROM unnest($1::int[], $2::timestamptz[]) AS t(session_id, created_at) "
+                "      GROUP BY session_id) b "
+                "WHERE cs.id = b.session_id",
+                session_ids, created_ats,
+            )
+    return set(session_ids)
+
+
+async def notify_channel(channel: str, payloads: List[str]):
+    """Send one NOTIFY per payload on `channel`"""
+    pool = get_db_pool()
+    await pool.execute(
+        "SELECT pg_notify($1, p) FROM unnest($2::text[]) AS p",
+        channel, payloads
+    )
+
+
+# GitHub installation functions
+_INSTALLATION_COLUMNS = "installation_id, account_login, account_type, repository_selection, repositories, suspended"
+
+
+async def get_installations(installation_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """All known GitHub App installations, or just one"""
+    pool = get_db_pool()
+    if installation_id is None:
+        rows = await pool.fetch(f"SELECT {_INSTALLATION_COLUMNS} FROM github_installations")
+    else:
+        rows = await pool.fetch(
+            f"SELECT {_INSTALLATION_COLUMNS} FROM github_installations WHERE installation_id = $1",
+            installation_id
+        )
+    return [dict(row) for row in rows]
+
+
+async def upsert_installation(
+    installation_id: int,
+    account_login: str,
+    account_type: Optional[str] = None,
+    repository_selection: Optional[str] = None,
+    repositories: Optional[List[str]] = None,
+    suspended: Optional[bool] = None,
+):
+    """Insert or update an installation; None leaves a stored column unchanged"""
+    pool = get_db_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            # An account has one installation per app; a reinstall replaces it
+            await conn.execute(
+                "DELETE FROM github_installations WHERE lower(account_login) = lower($1) AND installation_id <> $2",
+                account_login, installation_id
+            )
+            await conn.execute(
+                """
+                INSERT INTO github_installations (
+                  installation_id, account_login, account_type, repository_selection, repositories, suspended
+                ) VALUES ($1, $2, $3, COALESCE($4, 'all'), COALESCE($5, '{}'::text[]), COALESCE($6, FALSE))
+                ON CONFLICT (installation_id) DO UPDATE SET
+                  account_login        = EXCLUDED.account_login,
+                  account_type         = COALESCE($3, github_installations.account_type),
+                  repository_selection = COALESCE($4, github_installations.repository_selection),
+                  repositories         = COALESCE($5, github_installations.repositories),
+                  suspended            = COALESCE($6, github_installations.suspended),
+                  updated_at           = NOW()
+                """,
+                installation_id, account_login, account_type, repository_selection, repositories, suspended
+            )
+
+
+async def update_installation_repositories(
+    installation_id: int, repository_selection: str, added: List[str], removed: List[str]
+):
+    """Apply an installation_repositories event to the selected repo list"""
+    pool = get_db_pool()
+    await pool.execute(
+        """
+        UPDATE github_installations SET
+          repository_selection = $2,
+          repositories = ARRAY(
+            SELECT unnest(repositories || $3::text[])
+            EXCEPT SELECT unnest($4::text[])
+          ),
+          updated_at = NOW()
+        WHERE installation_id = $1
+        """,
+        installation_id, repository_selection, added, removed
+    )
+
+
+async def delete_installation(installation_id: int):
+    pool = get_db_pool()
+    await pool.execute("DELETE FROM github_installations WHERE installation_id = $1", installation_id)
+
+
+_CHAT_SESSION_COLUMNS = "id, session_name, created_at, message_count, last_message_at"
+
+
+async def get_chat_sessions_page(
+    user_id: str, limit: int, before: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get one page of a user's chat sessions, newest first.
+
+    Message counts come from the denormalized columns on chat_sessions, so
+    the cost depends only on the number of sessions returned. The second
+    value is the cursor for the next page, or None on the last page.
+    """
     try:
         pool = get_db_pool()
-        print(f"[DEBUG] Got database pool")
-        
-        query = """
-        SELECT cs.id, cs.session_name, cs.created_at, 
-               COUNT(cm.id) as message_count,
-               MAX(cm.created_at) as last_message_at
-        FROM chat_sessions cs
-        LEFT JOIN chat_messages cm ON cs.id = cm.session_id
-        WHERE cs.user_id = $1
-        GROUP BY cs.id, cs.session_name, cs.created_at
-        ORDER BY cs.created_at DESC
-        """
-        print(f"[DEBUG] Executing query: {query}")
-        print(f"[DEBUG] With user_id parameter: {user_id}")
-        
-        rows = await pool.fetch(query, user_id)
-        print(f"[DEBUG] Query executed, got {len(rows)} rows")
-        
-        result = [dict(row) for row in rows]
-        print(f"[DEBUG] Converted to dict, returning {len(result)} sessions")
-        return result
+        if before:
+            created_at, session_id = _decode_cursor(before)
+            rows = await pool.fetch(
+                f"SELECT {_CHAT_SESSION_COLUMNS} FROM chat_sessions "
+                "WHERE user_id = $1 AND (created_at, id) < ($2, $3) "
+                "ORDER BY created_at DESC, id DESC LIMIT $4",
+                user_id, created_at, session_id, limit + 1
+            )
+        else:
+            rows = await pool.fetch(
+                f"SELECT {_CHAT_SESSION_COLUMNS} FROM chat_sessions "
+                "WHERE user_id = $1 ORDER BY created_at DESC, id DESC LIMIT $2",
+                user_id, limit + 1
+            )
+    except ValueError:
+        raise
     except Exception as e:
-        print(f"[ERROR] Error in get_chat_sessions: {str(e)}")
-        print(f"[ERROR] Error type: {type(e)}")
+        print(f"[ERROR] Error in get_chat_sessions_page: {str(e)}")
         import traceback
         print(f"[ERROR] Full traceback: {traceback.format_exc()}")
         raise
 
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
 
-async def get_chat_messages(session_id: int) -> List[Dict[str, Any]]:
-    """Get all messages in a chat session"""
+async def get_recent_chat_messages(session_id: int, limit: int) -> List[Dict[str, Any]]:
+    """Get the last `limit` messages of a chat session, oldest first.
+
+    Only role and content are selected; the LIMIT is applied in SQL against
+    the (session_id, created_at, id) index, so cost does not grow with
+    session length.
+    """
     pool = get_db_pool()
     rows = await pool.fetch(
-        "SELECT id, role, content, metadata, created_at "
-        "FROM chat_messages WHERE session_id = $1 ORDER BY created_at ASC",
+        "SELECT role, content "
+        "FROM chat_messages WHERE session_id = $1 "
+        "ORDER BY created_at DESC, id DESC LIMIT $2",
+        session_id, limit
+    )
+    return [dict(row) for row in reversed(rows)]
+
+
+async def get_chat_messages_page(
+    session_id: int, limit: int, before: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Get one page of a chat session using keyset pagination.
+
+    Pages walk backwards from the newest message. Messages within a page are
+    returned oldest first. The second value is the cursor for the next
+    (older) page, or None when there is nothing older.
+    """
+    pool = get_db_pool()
+    if before:
+        created_at, message_id = _decode_cursor(before)
+        rows = await pool.fetch(
+            "SELECT id, role, content, metadata, created_at "
+            "FROM chat_messages WHERE session_id = $1 AND (created_at, id) < ($2, $3) "
+            "ORDER BY created_at DESC, id DESC LIMIT $4",
+            session_id, created_at, message_id, limit + 1
+        )
+    else:
+        rows = await pool.fetch(
+            "SELECT id, role, content, metadata, created_at "
+            "FROM chat_messages WHERE session_id = $1 "
+            "ORDER BY created_at DESC, id DESC LIMIT $2",
+            session_id, limit + 1
+        )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [dict(row) for row in reversed(rows)], next_cursor
+
+
+async def get_chat_session_summary(session_id: int) -> Optional[Dict[str, Any]]:
+    """Get the rolling summary of a chat session, or None if it does not exist"""
+    pool = get_db_pool()
+    row = await pool.fetchrow(
+        "SELECT summary, summary_message_id FROM chat_sessions WHERE id = $1",
         session_id
     )
+    return dict(row) if row else None
+
+
+async def get_unsummarized_chat_messages(
+    session_id: int, after_id: int, keep_recent: int, limit: int
+) -> List[Dict[str, Any]]:
+    """Get messages newer than `after_id` that are outside the newest `keep_recent`, oldest first"""
+    pool = get_db_pool()
+    rows = await pool.fetch(
+        "SELECT id, role, content FROM chat_messages "
+        "WHERE session_id = $1 AND id > $2 AND (created_at, id) <= ("
+        "  SELECT created_at, id FROM chat_messages WHERE session_id = $1 "
+        "  ORDER BY created_at DESC, id DESC OFFSET $3 LIMIT 1"
+        ") ORDER BY created_at, id LIMIT $4",
+        session_id, after_id, keep_recent, limit
+    )
     return [dict(row) for row in rows]
 
 
+async def update_chat_session_summary(
+    session_id: int, summary: str, summary_message_id: int, expected_message_id: int
+) -> bool:
+    """Store a new rolling summary unless another writer advanced it first"""
+    pool = get_db_pool()
+    result = await pool.execute(
+        "UPDATE chat_sessions SET summary = $2, summary_message_id = $3, summary_updated_at = now() "
+        "WHERE id = $1 AND summary_message_id = $4",
+        session_id, summary, summary_message_id, expected_message_id
+    )
+    return result == "UPDATE 1"
+
+
+def _encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a keyset cursor; raises ValueError if it is malformed"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _encode_rank_cursor(rank: float, row_id: int) -> str:
+    raw = json.dumps([rank, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a search cursor; raises ValueError if it is malformed"""
+    try:
+        rank, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(rank), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _like_pattern(text: str) -> str:
+    """Substring ILIKE pattern with the user's % and _ taken literally"""
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+async def search_pr_summaries(
+    query: Optional[str] = None,
+    rule_id: Optional[str] = None,
+    path: Optional[str] = None,
+    repo_full_name: Optional[str] = None,
+    limit: int = 20,
+    before: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Ranked search over PR titles, summaries and violations.
+
+    `query` is web-search syntax against the weighted search_vector (title
+    > summary > violation text). `rule_id` matches PRs that violated exactly
+    that rule (jsonb containment on violations); `path` and
+    `repo_full_name` are substring filters served by trigram indexes. Results are ordered by
+    rank, or newest first without a query, and keyset-paginated on
+    (rank, id). The second value is the cursor for the next page.
+    """
+    conditions, params = [], []
+
+    def param(value) -> str:
+        params.append(value)
+        return f"${len(params)}"
+
+    if query:
+        rank = f"ts_rank_cd(search_vector, websearch_to_tsquery('english', {param(query)}))"
+        conditions.append(f"search_vector @@ websearch_to_tsquery('english', ${len(params)})")
+    else:
+        rank = "0::real"
+    if rule_id:
+        conditions.append(f"violations @> jsonb_build_array(jsonb_build_object('rule_id', {param(rule_id)}::text))")
+    if path:
+        conditions.append(f"file_paths ILIKE {param(_like_pattern(path))}")
+    if repo_full_name:
+        conditions.append(f"repo_full_name ILIKE {param(_like_pattern(repo_full_name))}")
+    if before:
+        after_rank, after_id = _decode_rank_cursor(before)
+        conditions.append(f"({rank}, id) < ({param(after_rank)}::real, {param(after_id)})")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    headline = (
+        f"ts_headline('english', coalesce(summary_text, ''), websearch_to_tsquery('english', $1), "
+        "'MaxFragments=2, MaxWords=25, MinWords=8')"
+        if query else "left(coalesce(summary_text, ''), 300)"
+    )
+    pool = _get_db_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT id, repo_full_name, pr_number, pr_url, title, author_login, created_at,
+               violation_count, violations, rank, {headline} AS snippet
+        FROM (
+            SELECT id, repo_full_name, pr_number, pr_url, title, author_login, created_at,
+                   violation_count, violations, summary_text, {rank} AS rank
+            FROM pr_summary
+            {where}
+            ORDER BY rank DESC, id DESC
+            LIMIT {param(limit + 1)}
+        ) page
+        ORDER BY rank DESC, id DESC
+        """,
+        *params
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_rank_cursor(rows[-1]["rank"], rows[-1]["id"])
+    results = []
+    for row in rows:
+        result = dict(row)
+        violations = result.pop("violations")
+        result["rule_ids"] = [v.get("rule_id") for v in violations or []]
+        results.append(result)
+    return results, next_cursor
+
+
+async def search_chat_messages(
+    user_id: str,
+    query: str,
+    session_id: Optional[int] = None,
+    limit: int = 20,
+    before: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Ranked full-text search over one user's chat messages, keyset-paginated on (rank, id)"""
+    params: List[Any] = [query, user_id]
+    conditions = [
+        "m.search_vector @@ websearch_to_tsquery('english', $1)",
+        "s.user_id = $2",
+    ]
+    rank = "ts_rank_cd(m.search_vector, websearch_to_tsquery('english', $1))"
+    if session_id is not None:
+        params.append(session_id)
+        conditions.append(f"m.session_id = ${len(params)}")
+    if before:
+        after_rank, after_id = _decode_rank_cursor(before)
+        params.extend([after_rank, after_id])
+        conditions.append(f"({rank}, m.id) < (${len(params) - 1}::real, ${len(params)})")
+    params.append(limit + 1)
+
+    pool = _get_db_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT id, session_id, session_name, role, created_at, rank,
+               ts_headline('english', content, websearch_to_tsquery('english', $1),
+                           'MaxFragments=2, MaxWords=25, MinWords=8') AS snippet
+        FROM (
+            SELECT m.id, m.session_id, s.session_name, m.role, m.content, m.created_at, {rank} AS rank
+            FROM chat_messages m
+            JOIN chat_sessions s ON s.id = m.session_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY rank DESC, m.id DESC
+            LIMIT ${len(params)}
+        ) page
+        ORDER BY rank DESC, id DESC
+        """,
+        *params
+    )
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_rank_cursor(rows[-1]["rank"], rows[-1]["id"])
+    return [dict(row) for row in rows], next_cursor
+
+
 async def delete_chat_session(session_id: int, user_id: str) -> bool:
     """Delete a chat session and all its messages"""
-    print(f"[DEBUG] delete_chat_session called: session_id={session_id}, user_id={user_id}")
     try:
         pool = get_db_pool()
         result = await pool.execute(
             "DELETE FROM chat_sessions WHERE id = $1 AND user_id = $2",
             session_id, user_id
         )
-        print(f"[DEBUG] Delete result: {result}")
-        success = result == "DELETE 1"
-        print(f"[DEBUG] Delete success: {success}")
-        return success
+        return result == "DELETE 1"
     except Exception as e:
         print(f"[ERROR] Error in delete_chat_session: {str(e)}")
         return False
@@ -272,13 +803,8 @@ async def delete_rule(rule_id: str) -> bool:
 
 def get_db_pool():
     """Get the database connection pool"""
-    print("[DEBUG] Getting database pool")
     try:
-        pool = _get_db_pool()
-        print("[DEBUG] Database pool retrieved successfully")
-        return pool
+        return _get_db_pool()
     except Exception as e:
         print(f"[ERROR] Failed to get database pool: {str(e)}")
-        import traceback
-        print(f"[ERROR] Full traceback: {traceback.format_exc()}")
         raise
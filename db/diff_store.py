@@ -0,0 +1,293 @@
+# db/diff_store.py
+
+"""
+Content-addressed store for PR diffs, shared by github_bot and mcp_server.
+
+A diff is addressed by sha256(repo_full_name, base_sha, head_sha). Those
+three pin its content, so entries never go stale and need no invalidation.
+Blobs are zstd-compressed, or zlib when zstandard isn't installed; the
+codec is stored with each blob. Decompression streams in
+DIFF_STORE_CHUNK_BYTES pieces, so a reader never holds a full decompressed
+diff unless it asks for one. The compressed blob, however, is held in full:
+save() compresses into memory before writing, and load() fetches the whole
+blob (bytea row or file) before decompressing it.
+
+Backends (DIFF_STORE_BACKEND):
+  - postgres: pr_diff_blobs table, shared by every worker and service
+  - disk:     files under DIFF_STORE_PATH, for single-host deployments
+  - none:     disabled; every lookup misses
+Both backends track total stored (compressed) bytes and evict the least
+recently read diffs once DIFF_STORE_MAX_BYTES is exceeded.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Optional
+
+from db.connection import get_db_pool
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+CHUNK_BYTES = int(os.getenv("DIFF_STORE_CHUNK_BYTES", str(64 * 1024)))
+MAX_BYTES = int(os.getenv("DIFF_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+ZSTD_LEVEL = int(os.getenv("DIFF_STORE_ZSTD_LEVEL", "6"))
+
+# `write(chunk)` receives decompressed data; returning False stops the read early
+ChunkWriter = Callable[[bytes], Optional[bool]]
+
+
+def diff_key(repo_full_name: str, base_sha: str, head_sha: str) -> str:
+    return hashlib.sha256(f"{repo_full_name}\0{base_sha}\0{head_sha}".encode()).hexdigest()
+
+
+def hunk_boundary(data, limit: int) -> int:
+    """Offset of the last complete hunk before `limit`, else the last newline"""
+    file_start = data.rfind(b"\ndiff --git ", 0, limit)
+    hunk_start = data.rfind(b"\n@@ ", 0, limit)
+    boundary = max(file_start, hunk_start)
+    if hunk_start > file_start and data.find(b"\n@@ ", file_start + 1, hunk_start) == -1:
+        # First hunk of its file: don't leave a file header with no hunks
+        boundary = file_start
+    if boundary <= 0:
+        boundary = data.rfind(b"\n", 0, limit)
+    return boundary + 1 if boundary > 0 else limit
+
+
+# --- Codecs ------------------------------------------------------------
+
+def _default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def _compress(chunks: Iterable[bytes], codec: str) -> bytes:
+    out = io.BytesIO()
+    if codec == "zstd":
+        with zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(out, closefd=False) as writer:
+            for chunk in chunks:
+                writer.write(chunk)
+    else:
+        compressor = zlib.compressobj(6)
+        for chunk in chunks:
+            out.write(compressor.compress(chunk))
+        out.write(compressor.flush())
+    return out.getvalue()
+
+
+def _decompress(blob: bytes, codec: str, write: ChunkWriter) -> bool:
+    """Feed decompressed chunks to `write`; False if the codec isn't available here"""
+    if codec == "zstd":
+        if zstandard is None:
+            return False
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(blob)) as reader:
+            while True:
+                chunk = reader.read(CHUNK_BYTES)
+                if not chunk or write(chunk) is False:
+                    break
+        return True
+    if codec == "zlib":
+        decompressor = zlib.decompressobj()
+        data = blob
+        while data:
+            chunk = decompressor.decompress(data, CHUNK_BYTES)
+            data = decompressor.unconsumed_tail
+            if chunk and write(chunk) is False:
+                return True
+        tail = decompressor.flush()
+        if tail:
+            write(tail)
+        return True
+    return False
+
+
+# --- Backends ----------------------------------------------------------
+
+class NullDiffStore:
+    backend = "none"
+
+    async def load(self, repo_full_name: str, base_sha: str, head_sha: str, write: ChunkWriter) -> bool:
+        return False
+
+    async def save(self, repo_full_name: str, base_sha: str, head_sha: str, chunks: Iterable[bytes]):
+        return None
+
+    async def stats(self) -> Dict[str, int]:
+        return {"entries": 0, "stored_bytes": 0, "max_bytes": 0}
+
+
+class PostgresDiffStore(NullDiffStore):
+    backend = "postgres"
+
+    async def load(self, repo_full_name: str, base_sha: str, head_sha: str, write: ChunkWriter) -> bool:
+        pool = get_db_pool()
+        row = await pool.fetchrow(
+            """
+            UPDATE pr_diff_blobs SET last_accessed_at = NOW()
+            WHERE key = $1
+            RETURNING codec, blob
+            """,
+            diff_key(repo_full_name, base_sha, head_sha)
+        )
+        if row is None:
+            return False
+        return await asyncio.to_thread(_decompress, row["blob"], row["codec"], write)
+
+    async def save(self, repo_full_name: str, base_sha: str, head_sha: str, chunks: Iterable[bytes]):
+        codec = _default_codec()
+        raw_size = 0
+
+        def counted():
+            nonlocal raw_size
+            for chunk in chunks:
+                raw_size += len(chunk)
+                yield chunk
+
+        blob = await asyncio.to_thread(_compress, counted(), codec)
+        pool = get_db_pool()
+        async with pool.acquire() as conn:
+            inserted = await conn.fetchval(
+                """
+                INSERT INTO pr_diff_blobs (key, repo_full_name, base_sha, head_sha, codec, raw_size, stored_size, blob)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (key) DO NOTHING
+                RETURNING stored_size
+                """,
+                diff_key(repo_full_name, base_sha, head_sha),
+                repo_full_name, base_sha, head_sha, codec, raw_size, len(blob), blob
+            )
+            if inserted is not None:
+                # Keep the most recently read diffs that fit in MAX_BYTES
+                await conn.execute(
+                    """
+                    DELETE FROM pr_diff_blobs WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(stored_size) OVER (
+                                ORDER BY last_accessed_at DESC, key
+                            ) AS running_size
+                            FROM pr_diff_blobs
+                        ) ranked
+                        WHERE running_size > $1
+                    )
+                    """,
+                    MAX_BYTES
+                )
+
+    async def stats(self) -> Dict[str, int]:
+        pool = get_db_pool()
+        row = await pool.fetchrow(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(stored_size), 0) AS stored_bytes FROM pr_diff_blobs"
+        )
+        return {"entries": row["entries"], "stored_bytes": row["stored_bytes"], "max_bytes": MAX_BYTES}
+
+
+class DiskDiffStore(NullDiffStore):
+    """Blobs as <root>/<key[:2]>/<key>.<codec>; file mtime records the last read"""
+    backend = "disk"
+
+    def __init__(self, root: str):
+        self.root = root
+        self._sizes: Optional[Dict[str, int]] = None  # path -> stored bytes
+        self._lock = asyncio.Lock()
+
+    def _path(self, key: str, codec: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.{codec}")
+
+    def _scan(self) -> Dict[str, int]:
+        sizes = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    sizes[path] = os.path.getsize(path)
+                except OSError:
+                    pass
+        return sizes
+
+    async def _ensure_scanned(self):
+        if self._sizes is None:
+            self._sizes = await asyncio.to_thread(self._scan)
+
+    def _read(self, key: str, write: ChunkWriter) -> bool:
+        for codec in ("zstd", "zlib"):
+            path = self._path(key, codec)
+            try:
+                with open(path, "rb") as f:
+                    blob = f.read()
+            except FileNotFoundError:
+                continue
+            now = time.time()
+            os.utime(path, (now, now))
+            return _decompress(blob, codec, write)
+        return False
+
+    async def load(self, repo_full_name: str, base_sha: str, head_sha: str, write: ChunkWriter) -> bool:
+        return await asyncio.to_thread(self._read, diff_key(repo_full_name, base_sha, head_sha), write)
+
+    def _write(self, key: str, chunks: Iterable[bytes]) -> Optional[tuple]:
+        codec = _default_codec()
+        path = self._path(key, codec)
+        if os.path.exists(path):
+            return None
+        blob = _compress(chunks, codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        return path, len(blob)
+
+    def _evict(self, sizes: Dict[str, int]):
+        total = sum(sizes.values())
+        if total <= MAX_BYTES:
+            return
+        by_age = []
+        for path in sizes:
+            try:
+                by_age.append((os.path.getmtime(path), path))
+            except OSError:
+                by_age.append((0, path))
+        for _, path in sorted(by_age):
+            if total <= MAX_BYTES:
+                break
+            total -= sizes.pop(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def save(self, repo_full_name: str, base_sha: str, head_sha: str, chunks: Iterable[bytes]):
+        written = await asyncio.to_thread(self._write, diff_key(repo_full_name, base_sha, head_sha), chunks)
+        if written is None:
+            return
+        async with self._lock:
+            await self._ensure_scanned()
+            path, size = written
+            self._sizes[path] = size
+            await asyncio.to_thread(self._evict, self._sizes)
+
+    async def stats(self) -> Dict[str, int]:
+        async with self._lock:
+            await self._ensure_scanned()
+            return {"entries": len(self._sizes), "stored_bytes": sum(self._sizes.values()), "max_bytes": MAX_BYTES}
+
+
+_store: Optional[NullDiffStore] = None
+
+
+def get_diff_store() -> NullDiffStore:
+    global _store
+    if _store is None:
+        backend = os.getenv("DIFF_STORE_BACKEND", "postgres").lower()
+        if backend == "disk":
+            _store = DiskDiffStore(os.getenv("DIFF_STORE_PATH", "/var/cache/codepulse/diffs"))
+        elif backend == "postgres":
+            _store = PostgresDiffStore()
+        else:
+            _store = NullDiffStore()
+    return _store
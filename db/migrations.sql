@@ -63,13 +63,16 @@ CREATE TABLE IF NOT EXISTS pr_assistant_interactions (
 );
 
 -- Indexes for better performance
-CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_id ON chat_sessions(user_id);
-CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON chat_messages(session_id);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created_id ON chat_messages(session_id, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_created_at ON chat_messages(created_at);
 CREATE INDEX IF NOT EXISTS idx_pr_summary_repo_pr ON pr_summary(repo_full_name, pr_number);
 CREATE INDEX IF NOT EXISTS idx_pr_events_summary_id ON pr_events(pr_summary_id);
 CREATE INDEX IF NOT EXISTS idx_pr_assistant_interactions_summary_id ON pr_assistant_interactions(pr_summary_id);
 
+-- Superseded by idx_chat_messages_session_created_id, which serves both
+-- session lookups and newest-N / keyset scans of a session's history
+DROP INDEX IF EXISTS idx_chat_messages_session_id;
+
 -- Update trigger for chat_sessions
 CREATE OR REPLACE FUNCTION update_chat_sessions_updated_at()
 RETURNS TRIGGER AS $$
@@ -82,4 +85,107 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER trigger_update_chat_sessions_updated_at
     BEFORE UPDATE ON chat_sessions
     FOR EACH ROW
-    EXECUTE FUNCTION update_chat_sessions_updated_at(); 
\ No newline at end of file
+    EXECUTE FUNCTION update_chat_sessions_updated_at(); 
+
+-- Denormalized chat session counters, kept current by add_chat_message in
+-- the same transaction as the message insert
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;
+
+-- Backfill counters for sessions that predate the columns (leaves updated_at alone)
+ALTER TABLE chat_sessions DISABLE TRIGGER trigger_update_chat_sessions_updated_at;
+UPDATE chat_sessions cs
+SET message_count = agg.message_count,
+    last_message_at = agg.last_message_at
+FROM (
+    SELECT session_id, COUNT(*) AS message_count, MAX(created_at) AS last_message_at
+    FROM chat_messages
+    GROUP BY session_id
+) agg
+WHERE cs.id = agg.session_id
+  AND (cs.message_count <> agg.message_count
+       OR cs.last_message_at IS DISTINCT FROM agg.last_message_at);
+ALTER TABLE chat_sessions ENABLE TRIGGER trigger_update_chat_sessions_updated_at;
+
+-- Keyset pagination of a user's sessions
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_created_id ON chat_sessions(user_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS idx_chat_sessions_user_id;
+
+-- Rolling conversation summary; summary_message_id is the newest message
+-- already folded into it
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_message_id INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary_updated_at TIMESTAMP WITH TIME ZONE;
+
+-- Content-addressed PR diff store (db/diff_store.py). key is
+-- sha256(repo_full_name, base_sha, head_sha); blob is zstd or zlib
+-- compressed per codec. last_accessed_at drives LRU eviction.
+CREATE TABLE IF NOT EXISTS pr_diff_blobs (
+    key CHAR(64) PRIMARY KEY,
+    repo_full_name VARCHAR(255) NOT NULL,
+    base_sha VARCHAR(64) NOT NULL,
+    head_sha VARCHAR(64) NOT NULL,
+    codec VARCHAR(16) NOT NULL,
+    raw_size BIGINT NOT NULL,
+    stored_size BIGINT NOT NULL,
+    blob BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    last_accessed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+ALTER TABLE pr_diff_blobs ALTER COLUMN blob SET STORAGE EXTERNAL;  -- already compressed
+CREATE INDEX IF NOT EXISTS idx_pr_diff_blobs_last_accessed ON pr_diff_blobs(last_accessed_at);
+
+-- Commits a PR summary was generated from, to find its diff in pr_diff_blobs
+ALTER TABLE pr_summary ADD COLUMN IF NOT EXISTS base_sha VARCHAR(64);
+ALTER TABLE pr_summary ADD COLUMN IF NOT EXISTS head_sha VARCHAR(64);
+
+-- Full-text and trigram search (GET /search/prs, GET /search/chat)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Changed file paths, one per line, for path lookups
+ALTER TABLE pr_summary ADD COLUMN IF NOT EXISTS file_paths TEXT;
+
+ALTER TABLE pr_summary ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', left(coalesce(summary_text, ''), 100000)), 'B') ||
+    setweight(jsonb_to_tsvector('english', coalesce(violations, '[]'::jsonb), '["string"]'), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_pr_summary_search ON pr_summary USING GIN (search_vector);
+-- Exact violated-rule lookups: violations @> '[{"rule_id": "..."}]'
+CREATE INDEX IF NOT EXISTS idx_pr_summary_violations ON pr_summary USING GIN (violations jsonb_path_ops);
+-- Replaced by idx_pr_summary_violations (substring matches on rule ids were too loose)
+DROP INDEX IF EXISTS idx_pr_summary_rule_ids_trgm;
+ALTER TABLE pr_summary DROP COLUMN IF EXISTS violation_rule_ids;
+CREATE INDEX IF NOT EXISTS idx_pr_summary_file_paths_trgm ON pr_summary USING GIN (file_paths gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_pr_summary_repo_trgm ON pr_summary USING GIN (repo_full_name gin_trgm_ops);
+
+-- Very long messages are indexed by their first 100k characters (tsvector caps at 1MB)
+ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    to_tsvector('english', left(content, 100000))
+) STORED;
+CREATE INDEX IF NOT EXISTS idx_chat_messages_search ON chat_messages USING GIN (search_vector);
+
+-- GitHub App installations, maintained from installation webhooks.
+-- repositories lists the selected repos when repository_selection = 'selected'.
+CREATE TABLE IF NOT EXISTS github_installations (
+    installation_id BIGINT PRIMARY KEY,
+    account_login VARCHAR(255) NOT NULL,
+    account_type VARCHAR(50),
+    repository_selection VARCHAR(20) NOT NULL DEFAULT 'all',
+    repositories TEXT[] NOT NULL DEFAULT '{}',
+    suspended BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_github_installations_account ON github_installations(lower(account_login));
+
+-- Progress of `python -m github_bot.backfill` per repo; `cursor` is the
+-- GraphQL end cursor of the last page whose rows were saved
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    repo_full_name VARCHAR(255) PRIMARY KEY,
+    cursor TEXT,
+    prs_done INTEGER NOT NULL DEFAULT 0,
+    failed_prs INTEGER[] NOT NULL DEFAULT '{}',
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    finished_at TIMESTAMP WITH TIME ZONE
+);
@@ -0,0 +1,308 @@
+# github_bot/backfill.py
+
+"""
+Backfill pr_summary for a repository's existing pull requests.
+
+    python -m github_bot.backfill owner/repo [--concurrency 4] [--page-size 50]
+                                             [--no-summaries] [--restart] [--force]
+
+Lists every PR of the repo (open and closed, oldest first) through GraphQL
+and sends each one to MCP's analyze endpoint, which runs the static rule
+checks and, unless --no-summaries is given, an LLM summary in its
+"backfill" lane so live webhooks keep their LLM capacity. With
+--no-summaries the diff is not downloaded at all.
+
+GitHub calls use the BACKFILL priority of github_client: they wait behind
+webhooks and dashboard reads and never dip into the webhook reserve.
+
+Each page of PRs is written with one bulk upsert, in the same transaction
+that moves the page cursor in backfill_checkpoints, so an interrupted run
+resumes after the last completed page. PRs whose stored head_sha is
+unchanged are skipped unless --force is given. PRs that fail are recorded
+in the checkpoint's failed_prs and left for a later --force run. Rows
+already stored keep their summary when no new one is generated (e.g. with
+--no-summaries) and their review comment count, which GraphQL can't
+provide.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from github_bot.config import settings
+from github_bot import github_client
+from github_bot.github_auth import get_installation_token
+from github_bot.github_graphql import graphql
+from github_bot.installations import installation_index
+from github_bot.mcp_client import FAILED_SUMMARIES, close_client, get_summary
+from github_bot.utils import diff_for_mcp, fetch_pr_diff_and_files
+from db.connection import get_db_pool, init_db_pool
+from db.crud import (
+    get_backfill_checkpoint, get_installations, get_pr_summaries,
+    reset_backfill_checkpoint, save_backfill_page
+)
+
+LANE = "backfill"
+
+_PRS_QUERY = """
+query($owner: String!, $name: String!, $cursor: String, $pageSize: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $pageSize, after: $cursor, orderBy: {field: CREATED_AT, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        body
+        url
+        merged
+        createdAt
+        updatedAt
+        closedAt
+        mergedAt
+        additions
+        deletions
+        changedFiles
+        baseRefOid
+        headRefOid
+        author { login url ... on User { databaseId } }
+        commits { totalCount }
+        comments { totalCount }
+        approvals: reviews(states: APPROVED) { totalCount }
+      }
+    }
+  }
+}
+"""
+
+
+def parse_date(date_str: Optional[str]) -> Optional[datetime]:
+    if not date_str:
+        return None
+    return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+
+
+class Backfill:
+    def __init__(self, repo_full_name: str, concurrency: int, page_size: int, summarize: bool, force: bool):
+        self.repo_full_name = repo_full_name
+        self.owner, self.name = repo_full_name.split("/", 1)
+        self.page_size = page_size
+        self.summarize = summarize
+        self.force = force
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.installation_id: Optional[int] = None
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def token(self) -> str:
+        """Installation token for the repo (refreshed as it expires), or GITHUB_TOKEN"""
+        if self.installation_id is not None:
+            return await get_installation_token(
+                settings.APP_ID, settings.PRIVATE_KEY_PATH, self.installation_id,
+                priority=github_client.BACKFILL
+            )
+        token = os.getenv("GITHUB_TOKEN", "")
+        if not token:
+            raise RuntimeError(f"No installation can access {self.repo_full_name} and GITHUB_TOKEN is not set")
+        return token
+
+    async def analyze(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """Rule checks (and summary) for one PR; returns its pr_summary row"""
+        number = node["number"]
+        token = await self.token()
+        base_sha, head_sha = node["baseRefOid"], node["headRefOid"]
+        pulls_url = f"{settings.GITHUB_API_URL}/repos/{self.repo_full_name}/pulls/{number}"
+        diff_text, diff_truncated, diff_size = "", False, None
+        if not self.summarize:
+            # Rule checks only look at the file list
+            files = await self._list_files(pulls_url + "/files", token)
+        else:
+            files, diff = await fetch_pr_diff_and_files(
+                pulls_url, pulls_url + "/files", token,
+                diff_ref=(self.repo_full_name, base_sha, head_sha),
+                priority=github_client.BACKFILL
+            )
+            try:
+                diff_text, diff_truncated = diff_for_mcp(diff)
+                diff_size = None if diff.truncated else diff.size
+            finally:
+                diff.close()
+
+        author = node.get("author") or {}
+        pr_data = {
+            "pr_number": number,
+            "title": node["title"],
+            "description": node.get("body") or "",
+            "repo_full_name": self.repo_full_name,
+            "diff": diff_text,
+            "diff_truncated": diff_truncated,
+            "diff_size": diff_size,
+            "base_sha": base_sha,
+            "head_sha": head_sha,
+            "summarize": self.summarize,
+            "files": [
+                {
+                    "filename": f["filename"],
+                    "status": f["status"],
+                    "additions": f.get("additions", 0),
+                    "deletions": f.get("deletions", 0)
+                }
+                for f in files
+            ],
+            "user": {
+                "login": author.get("login", "ghost"),
+                "id": author.get("databaseId") or 0,
+                "url": author.get("url", "")
+            }
+        }
+        del diff_text
+
+        deadline = time.monotonic() + settings.BACKFILL_MCP_TIMEOUT_SECONDS
+        mcp_response = await get_summary(pr_data, deadline, lane=LANE)
+        if mcp_response["summary"] in FAILED_SUMMARIES:
+            raise RuntimeError(mcp_response["summary"])
+
+        return {
+            "repo_full_name": self.repo_full_name,
+            "pr_number": number,
+            "pr_url": node["url"],
+            "title": node["title"],
+            "author_login": author.get("login", "ghost"),
+            "created_at": parse_date(node["createdAt"]),
+            "closed_at": parse_date(node.get("closedAt")),
+            "merged_at": parse_date(node.get("mergedAt")),
+            "is_merged": node.get("merged", False),
+            "commits_count": node["commits"]["totalCount"],
+            "additions": node.get("additions", 0),
+            "deletions": node.get("deletions", 0),
+            "changed_files": node.get("changedFiles", 0),
+            "comments_count": node["comments"]["totalCount"],
+            # GraphQL has no review comment count (reviewThreads counts threads);
+            # left out so a count stored from the webhook is kept
+            "approvals_count": node["approvals"]["totalCount"],
+            "violation_count": len(mcp_response["rule_violations"]),
+            "violations": mcp_response["rule_violations"],
+            "summary_text": mcp_response["summary"] or None,
+            "summary_generated_at": datetime.now(timezone.utc) if mcp_response["summary"] else None,
+            "base_sha": base_sha,
+            "head_sha": head_sha,
+            "file_paths": [f["filename"] for f in files],
+        }
+
+    async def _list_files(self, files_url: str, token: str) -> List[Dict[str, Any]]:
+        response = await github_client.request("GET", files_url, token, priority=github_client.BACKFILL)
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch files: {response.status_code}, {response.text}")
+        return response.json()
+
+    async def _analyze_bounded(self, node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with self.semaphore:
+            try:
+                return await self.analyze(node)
+            except Exception as e:
+                print(f"[ERROR] Backfill of {self.repo_full_name}#{node['number']} failed: {e}")
+                return None
+
+    async def _pending(self, nodes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """PRs of a page that are not already stored at their current head commit"""
+        if self.force:
+            return nodes
+        stored = await get_pr_summaries(self.repo_full_name, [node["number"] for node in nodes])
+        pending = []
+        for node in nodes:
+            summary = stored.get(node["number"])
+            # Older rows may hold a failure placeholder instead of a summary
+            unsummarized = summary is not None and (
+                not summary["summary_text"] or summary["summary_text"] in FAILED_SUMMARIES
+            )
+            if (
+                summary is None
+                or summary["head_sha"] != node["headRefOid"]
+                or (self.summarize and unsummarized)
+            ):
+                pending.append(node)
+        return pending
+
+    async def run(self, restart: bool):
+        self.installation_id = installation_index.resolve(self.repo_full_name)
+        checkpoint = None if restart else await get_backfill_checkpoint(self.repo_full_name)
+        if checkpoint is None or checkpoint["finished_at"] is not None:
+            await reset_backfill_checkpoint(self.repo_full_name)
+            cursor = None
+        else:
+            cursor = checkpoint["cursor"]
+            print(f"[INFO] Resuming {self.repo_full_name} after {checkpoint['prs_done']} PRs")
+
+        started = time.monotonic()
+        while True:
+            data = await graphql(
+                _PRS_QUERY,
+                {"owner": self.owner, "name": self.name, "cursor": cursor, "pageSize": self.page_size},
+                await self.token(),
+                priority=github_client.BACKFILL
+            )
+            if data.get("repository") is None:
+                raise RuntimeError(f"Repository {self.repo_full_name} not found")
+            page = data["repository"]["pullRequests"]
+            nodes = [node for node in page["nodes"] or [] if node]
+
+            pending = await self._pending(nodes)
+            results = await asyncio.gather(*(self._analyze_bounded(node) for node in pending))
+            rows = [row for row in results if row is not None]
+            failed_prs = [node["number"] for node, row in zip(pending, results) if row is None]
+
+            finished = not page["pageInfo"]["hasNextPage"]
+            cursor = page["pageInfo"]["endCursor"] or cursor
+            written, write_seconds = await save_backfill_page(
+                self.repo_full_name, rows, cursor, failed_prs, finished
+            )
+
+            self.done += len(rows)
+            self.skipped += len(nodes) - len(pending)
+            self.failed += len(failed_prs)
+            elapsed = time.monotonic() - started
+            print(f"[INFO] {self.repo_full_name}: {self.done} analysed, {self.skipped} unchanged, "
+                  f"{self.failed} failed ({self.done / elapsed if elapsed else 0:.2f} PRs/s); "
+                  f"page of {written} rows saved in {write_seconds * 1000:.0f} ms")
+            if finished:
+                return
+
+
+async def main_async(args: argparse.Namespace):
+    await init_db_pool()
+    try:
+        installation_index.replace_all(await get_installations())
+        backfill = Backfill(args.repo, args.concurrency, args.page_size, not args.no_summaries, args.force)
+        await backfill.run(args.restart)
+    finally:
+        await close_client()
+        await github_client.close_client()
+        await get_db_pool().close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo", help="owner/name")
+    parser.add_argument("--concurrency", type=int, default=settings.BACKFILL_CONCURRENCY,
+                        help="PRs analysed at once")
+    parser.add_argument("--page-size", type=int, default=settings.BACKFILL_PAGE_SIZE,
+                        help="PRs per GraphQL page and per checkpoint (max 100)")
+    parser.add_argument("--no-summaries", action="store_true", help="rule checks only, no LLM summaries")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the oldest PR")
+    parser.add_argument("--force", action="store_true", help="re-analyse PRs whose head commit is already stored")
+    args = parser.parse_args()
+    if "/" not in args.repo:
+        parser.error("repo must be owner/name")
+    args.page_size = max(1, min(args.page_size, 100))
+    return args
+
+
+def main():
+    asyncio.run(main_async(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,73 @@ class Settings:
     GITHUB_REDIRECT_URI: str = os.getenv("GITHUB_REDIRECT_URI", "")
     GITHUB_CLIENT_ID: str = os.getenv("GITHUB_CLIENT_ID", "")
     GITHUB_CLIENT_SECRET: str = os.getenv("GITHUB_CLIENT_SECRET", "")
+    GITHUB_API_URL: str = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+    # Time budget for analysing a PR, from webhook receipt to the MCP reply.
+    # MCP is told the remaining budget minus the margin so its fallback
+    # summary arrives before our own timeout.
+    WEBHOOK_DEADLINE_SECONDS: float = float(os.getenv("WEBHOOK_DEADLINE_SECONDS", "30"))
+    MCP_DEADLINE_MARGIN_MS: int = int(os.getenv("MCP_DEADLINE_MARGIN_MS", "500"))
+    # Attempts per PR when MCP answers 429/503 with Retry-After
+    MCP_MAX_ATTEMPTS: int = int(os.getenv("MCP_MAX_ATTEMPTS", "3"))
+    # MCP transport. MCP_ENCODING is json or msgpack, MCP_COMPRESSION is none,
+    # gzip or zstd; anything but json/none uses the /analyze_pr/packed endpoint.
+    # MCP_UDS_PATH connects over a Unix socket when both services share a host.
+    MCP_ENCODING: str = os.getenv("MCP_ENCODING", "json").lower()
+    MCP_COMPRESSION: str = os.getenv("MCP_COMPRESSION", "none").lower()
+    MCP_COMPRESS_MIN_BYTES: int = int(os.getenv("MCP_COMPRESS_MIN_BYTES", "1024"))
+    MCP_ZSTD_LEVEL: int = int(os.getenv("MCP_ZSTD_LEVEL", "3"))
+    MCP_GZIP_LEVEL: int = int(os.getenv("MCP_GZIP_LEVEL", "5"))
+    MCP_UDS_PATH: str = os.getenv("MCP_UDS_PATH", "")
+    MCP_MAX_CONNECTIONS: int = int(os.getenv("MCP_MAX_CONNECTIONS", "20"))
+    # PR diffs: kept in memory up to the spool threshold, then spilled to a
+    # temp file. Downloads stop at DIFF_MAX_BYTES; at most DIFF_MAX_SEND_BYTES
+    # (cut at a hunk boundary) is sent to MCP for summarization.
+    DIFF_SPOOL_THRESHOLD_BYTES: int = int(os.getenv("DIFF_SPOOL_THRESHOLD_BYTES", str(1024 * 1024)))
+    DIFF_MAX_BYTES: int = int(os.getenv("DIFF_MAX_BYTES", str(50 * 1024 * 1024)))
+    DIFF_MAX_SEND_BYTES: int = int(os.getenv("DIFF_MAX_SEND_BYTES", str(400 * 1024)))
+    # MCP uses the same DIFF_STORE_BACKEND (and DIFF_STORE_PATH for disk): stored
+    # diffs are then sent as base_sha/head_sha only and MCP reads them itself
+    MCP_READS_DIFF_STORE: bool = os.getenv("MCP_READS_DIFF_STORE", "true").lower() == "true"
+    # Batch PR lookups for the dashboard: PRs per GitHub GraphQL query
+    PR_BATCH_MAX: int = int(os.getenv("PR_BATCH_MAX", "50"))
+    # Repository overview: GraphQL page size and per-user cache
+    REPOS_PAGE_SIZE: int = int(os.getenv("REPOS_PAGE_SIZE", "100"))
+    REPOS_CACHE_TTL_SECONDS: float = float(os.getenv("REPOS_CACHE_TTL_SECONDS", "60"))
+    REPOS_CACHE_MAX_USERS: int = int(os.getenv("REPOS_CACHE_MAX_USERS", "1000"))
+    # Installation index: installations are re-listed from GitHub in the
+    # background shortly after startup and then every resync interval, to
+    # catch changes made while the bot was down or webhooks that were missed
+    # (0 disables the periodic resync). With RESYNC_ON_STARTUP the startup
+    # resync finishes before the bot serves requests.
+    INSTALLATIONS_RESYNC_ON_STARTUP: bool = os.getenv("INSTALLATIONS_RESYNC_ON_STARTUP", "false").lower() == "true"
+    INSTALLATIONS_RESYNC_INTERVAL_SECONDS: float = float(os.getenv("INSTALLATIONS_RESYNC_INTERVAL_SECONDS", "3600"))
+    # GitHub API pacing (see github_client). Quotas are learned from
+    # X-RateLimit-* headers; the default rate applies until the first response.
+    GITHUB_DEFAULT_RATE_PER_HOUR: int = int(os.getenv("GITHUB_DEFAULT_RATE_PER_HOUR", "5000"))
+    GITHUB_BURST: int = int(os.getenv("GITHUB_BURST", "20"))
+    GITHUB_MAX_CONCURRENCY: int = int(os.getenv("GITHUB_MAX_CONCURRENCY", "10"))
+    GITHUB_WEBHOOK_RESERVE_FRACTION: float = float(os.getenv("GITHUB_WEBHOOK_RESERVE_FRACTION", "0.2"))
+    GITHUB_DASHBOARD_MAX_WAIT_SECONDS: float = float(os.getenv("GITHUB_DASHBOARD_MAX_WAIT_SECONDS", "5"))
+    GITHUB_SECONDARY_BACKOFF_SECONDS: float = float(os.getenv("GITHUB_SECONDARY_BACKOFF_SECONDS", "60"))
+    GITHUB_SECONDARY_BACKOFF_MAX_SECONDS: float = float(os.getenv("GITHUB_SECONDARY_BACKOFF_MAX_SECONDS", "900"))
+    GITHUB_MAX_RETRIES: int = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+    GITHUB_MAX_BUCKETS: int = int(os.getenv("GITHUB_MAX_BUCKETS", "1000"))
+    GITHUB_TIMEOUT_SECONDS: float = float(os.getenv("GITHUB_TIMEOUT_SECONDS", "30"))
+    # Webhook processing: analyses are queued per installation and share
+    # WEBHOOK_MAX_CONCURRENCY slots by weighted fair queuing.
+    # INSTALLATION_WEIGHTS is "installation_id_or_login:weight,..." (default weight 1).
+    WEBHOOK_MAX_CONCURRENCY: int = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "8"))
+    WEBHOOK_INSTALLATION_MAX_CONCURRENCY: int = int(os.getenv("WEBHOOK_INSTALLATION_MAX_CONCURRENCY", "3"))
+    WEBHOOK_INSTALLATION_RATE_PER_MINUTE: float = float(os.getenv("WEBHOOK_INSTALLATION_RATE_PER_MINUTE", "30"))
+    WEBHOOK_INSTALLATION_BURST: int = int(os.getenv("WEBHOOK_INSTALLATION_BURST", "10"))
+    WEBHOOK_INSTALLATION_MAX_QUEUE: int = int(os.getenv("WEBHOOK_INSTALLATION_MAX_QUEUE", "200"))
+    WEBHOOK_DRAIN_SECONDS: float = float(os.getenv("WEBHOOK_DRAIN_SECONDS", "25"))
+    INSTALLATION_WEIGHTS: str = os.getenv("INSTALLATION_WEIGHTS", "")
+    # Backfill CLI (python -m github_bot.backfill): PRs analysed at once, PRs
+    # per page/checkpoint, and how long one PR may wait for MCP
+    BACKFILL_CONCURRENCY: int = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+    BACKFILL_PAGE_SIZE: int = int(os.getenv("BACKFILL_PAGE_SIZE", "50"))
+    BACKFILL_MCP_TIMEOUT_SECONDS: float = float(os.getenv("BACKFILL_MCP_TIMEOUT_SECONDS", "300"))
     # Add more configs as needed (e.g. DEBUG, LOG_LEVEL, etc.)
 
 
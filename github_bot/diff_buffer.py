@@ -0,0 +1,87 @@
+# github_bot/diff_buffer.py
+
+"""
+Bounded storage for PR diffs.
+
+The diff is streamed into a SpooledTemporaryFile. It stays in memory up to
+DIFF_SPOOL_THRESHOLD_BYTES and then rolls over to a temp file, which is read
+through mmap, so a huge PR costs disk rather than worker memory. Writes
+stop at DIFF_MAX_BYTES and the buffer is marked truncated.
+
+Only a bounded prefix is ever turned into a str (see `read_text`). It is
+cut at a hunk boundary so the model never sees half a hunk.
+"""
+
+import mmap
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Tuple, Union
+
+from db.diff_store import hunk_boundary
+
+
+class DiffBuffer:
+    def __init__(self, spool_threshold: int, max_bytes: int):
+        self.spool_threshold = spool_threshold
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.truncated = False  # True if the download stopped at max_bytes
+        self.stored = False  # True once the full diff is in the shared diff store
+        self._file = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+
+    @property
+    def spilled(self) -> bool:
+        """Whether the diff rolled over from memory to a temp file"""
+        return self.size > self.spool_threshold
+
+    @property
+    def memory_bytes(self) -> int:
+        return 0 if self.spilled else self.size
+
+    def write(self, chunk: bytes) -> bool:
+        """Append a chunk; returns False once max_bytes is reached"""
+        room = self.max_bytes - self.size
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            self.truncated = True
+        self._file.write(chunk)
+        self.size += len(chunk)
+        return not self.truncated
+
+    @contextmanager
+    def view(self) -> Iterator[Union[bytes, mmap.mmap]]:
+        """Read-only bytes-like access: an mmap once spilled, else the in-memory bytes"""
+        self._file.flush()
+        if self.size == 0:
+            yield b""
+        elif self.spilled:
+            with mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+        else:
+            self._file.seek(0)
+            yield self._file.read()
+
+    def read_text(self, max_bytes: int) -> Tuple[str, bool]:
+        """Decode at most `max_bytes`, cut at a hunk boundary; returns (text, truncated)"""
+        with self.view() as data:
+            if self.size <= max_bytes:
+                end = self.size
+            else:
+                end = hunk_boundary(data, max_bytes)
+            text = data[:end].decode("utf-8", errors="replace")
+        return text, self.truncated or end < self.size
+
+    def iter_chunks(self, size: int = 64 * 1024) -> Iterator[bytes]:
+        with self.view() as data:
+            for start in range(0, self.size, size):
+                yield data[start:start + size]
+
+    def reset(self):
+        self._file.close()
+        self._file = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
+        self.size = 0
+        self.truncated = False
+
+    def close(self):
+        self._file.close()
+
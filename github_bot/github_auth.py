@@ -1,9 +1,16 @@
 # github_bot/github_auth.py
 
 import time
-import httpx
+from datetime import datetime
+from typing import Dict, Tuple
+
 import jwt  # PyJWT
 from github_bot.config import settings
+from github_bot import github_client
+
+# installation_id -> (token, expires_at); tokens live an hour
+_installation_tokens: Dict[int, Tuple[str, float]] = {}
+TOKEN_REFRESH_MARGIN_SECONDS = 300
 
 
 def generate_jwt(app_id: str, private_key_path: str) -> str:
@@ -17,22 +24,28 @@ def generate_jwt(app_id: str, private_key_path: str) -> str:
     return token
 
 
-def get_installation_token(
-    app_id: str, private_key_path: str, installation_id: int
+async def get_installation_token(
+    app_id: str, private_key_path: str, installation_id: int,
+    priority: str = github_client.WEBHOOK
 ) -> str:
-    jwt_token = generate_jwt(app_id, private_key_path)
+    cached = _installation_tokens.get(installation_id)
+    if cached and cached[1] - TOKEN_REFRESH_MARGIN_SECONDS > time.time():
+        return cached[0]
 
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json",
-    }
-
-    url = f"https://api.github.com/app/installations/{installation_id}/access_tokens"
-    response = httpx.post(url, headers=headers)
+    jwt_token = generate_jwt(app_id, private_key_path)
+    url = f"{settings.GITHUB_API_URL}/app/installations/{installation_id}/access_tokens"
+    response = await github_client.request("POST", url, jwt_token, priority=priority, bucket="app")
 
     if response.status_code != 201:
         raise Exception(
             f"Failed to get installation token: {response.status_code} {response.text}"
         )
 
-    return response.json()["token"]
+    data = response.json()
+    expires_at = datetime.fromisoformat(data["expires_at"].replace("Z", "+00:00")).timestamp()
+    if cached:
+        github_client.forget_token(cached[0])
+    # Installation tokens share the installation's quota
+    github_client.name_token(data["token"], f"installation:{installation_id}")
+    _installation_tokens[installation_id] = (data["token"], expires_at)
+    return data["token"]
@@ -0,0 +1,352 @@
+# github_bot/github_client.py
+
+"""
+Rate-limit-aware access to the GitHub API.
+
+Every GitHub call goes through `request` or `stream`. Calls are grouped
+into buckets, one per quota: an installation, the app's JWT, or a user's
+OAuth token, each split by rate-limit resource (core, graphql). Each
+bucket learns its quota from X-RateLimit-Limit/Remaining/Reset and paces
+requests with a token bucket that spreads the remaining quota until the
+reset, so a busy installation slows down instead of running dry.
+
+Within a bucket, webhook calls are served before dashboard calls, and
+those before backfill calls; neither of the latter may spend the last
+GITHUB_WEBHOOK_RESERVE_FRACTION of the quota. Primary (quota exhausted) and secondary (abuse detection) rate
+limits block the bucket until Retry-After / X-RateLimit-Reset, or for an
+exponential backoff when GitHub gives neither, and the call is retried.
+Dashboard calls that would wait longer than GITHUB_DASHBOARD_MAX_WAIT_SECONDS
+fail fast with GitHubRateLimited instead.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+import httpx
+from github_bot.config import settings
+from common import metrics
+
+WEBHOOK = "webhook"
+DASHBOARD = "dashboard"
+BACKFILL = "backfill"
+PRIORITIES = (WEBHOOK, DASHBOARD, BACKFILL)  # highest priority first
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class GitHubRateLimited(Exception):
+    """A dashboard call would have to wait too long for GitHub quota"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit reached; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    def __init__(self, name: str):
+        self.name = name
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # wall clock, from X-RateLimit-Reset
+        self.rate = settings.GITHUB_DEFAULT_RATE_PER_HOUR / 3600
+        self.tokens = float(settings.GITHUB_BURST)
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0  # monotonic
+        self.failures = 0  # consecutive rate-limited responses
+        self.active = 0
+        self.queues: Dict[str, Deque[asyncio.Future]] = {p: deque() for p in PRIORITIES}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def idle(self) -> bool:
+        return self.active == 0 and not any(self.queues.values())
+
+    def _reserve(self) -> float:
+        return (self.limit or 0) * settings.GITHUB_WEBHOOK_RESERVE_FRACTION
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(settings.GITHUB_BURST, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def update(self, headers: httpx.Headers):
+        """Re-derive the pace from GitHub's view of this quota"""
+        if "x-ratelimit-remaining" not in headers:
+            return
+        try:
+            self.limit = int(headers["x-ratelimit-limit"])
+            self.remaining = int(headers["x-ratelimit-remaining"])
+            self.reset_at = float(headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        self._refill()
+        seconds_left = max(1.0, self.reset_at - time.time())
+        self.rate = self.remaining / seconds_left
+        self.tokens = min(self.tokens, float(self.remaining))
+        if self.remaining == 0:
+            self.block(seconds_left)
+        if not self.name.startswith("user:"):
+            # Per-user tokens are unbounded in number; keep them out of the gauges
+            metrics.set_gauge("github_ratelimit_remaining", self.remaining, bucket=self.name)
+            metrics.set_gauge("github_ratelimit_limit", self.limit, bucket=self.name)
+
+    def seconds_until_reset(self) -> float:
+        return max(0.0, (self.reset_at or 0) - time.time())
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def wait_estimate(self, priority: str) -> float:
+        """Rough seconds until a call at `priority` could be sent"""
+        wait = max(0.0, self.blocked_until - time.monotonic())
+        if priority != WEBHOOK and self.remaining is not None and self.remaining <= self._reserve():
+            wait = max(wait, self.seconds_until_reset())
+        return wait
+
+    def _schedule(self, delay: float):
+        if self._timer is not None:
+            return
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.01), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.dispatch()
+
+    def _next(self) -> Optional[Tuple[str, asyncio.Future]]:
+        for priority in PRIORITIES:
+            queue = self.queues[priority]
+            while queue and queue[0].done():
+                queue.popleft()  # Cancelled while waiting
+            if not queue:
+                continue
+            if priority != WEBHOOK and self.remaining is not None and self.remaining <= self._reserve():
+                # The rest of this window's quota is kept for webhooks
+                self._schedule(self.seconds_until_reset())
+                return None
+            return priority, queue[0]
+        return None
+
+    def dispatch(self):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            self._schedule(self.blocked_until - now)
+            return
+        self._refill()
+        while self.active < settings.GITHUB_MAX_CONCURRENCY:
+            head = self._next()
+            if head is None:
+                return
+            if self.tokens < 1:
+                if self.rate > 0:
+                    self._schedule((1 - self.tokens) / self.rate)
+                else:
+                    self._schedule(self.seconds_until_reset() or 1.0)
+                return
+            priority, future = head
+            self.queues[priority].popleft()
+            self.tokens -= 1
+            if self.remaining is not None:
+                self.remaining -= 1  # Until the response tells us otherwise
+            self.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority: str) -> AsyncIterator[None]:
+        future = asyncio.get_running_loop().create_future()
+        self.queues[priority].append(future)
+        enqueued_at = time.monotonic()
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.active -= 1
+                self.dispatch()
+            raise
+        metrics.observe("github_queue_wait_ms", (time.monotonic() - enqueued_at) * 1000, priority=priority)
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.dispatch()
+
+
+# (bucket name, resource) -> bucket, least recently used first
+_buckets: "OrderedDict[Tuple[str, str], _Bucket]" = OrderedDict()
+# token digest -> bucket name, for tokens whose quota we know (installations)
+_token_names: Dict[str, str] = {}
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def name_token(token: str, name: str):
+    """Charge calls made with `token` to the bucket `name`, e.g. installation:42"""
+    _token_names[_digest(token)] = name
+
+
+def forget_token(token: str):
+    _token_names.pop(_digest(token), None)
+
+
+def _bucket(name: Optional[str], token: Optional[str], resource: str) -> _Bucket:
+    if name is None and token:
+        digest = _digest(token)
+        name = _token_names.get(digest) or f"user:{digest}"
+    elif name is None:
+        name = "anonymous"
+    key = (name, resource)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = _Bucket(f"{name}:{resource}")
+        # Never the new bucket itself: if every older one is busy the map
+        # goes over the cap until they finish
+        for old_key in list(_buckets)[:-1]:
+            if len(_buckets) <= settings.GITHUB_MAX_BUCKETS:
+                break
+            if _buckets[old_key].idle:
+                del _buckets[old_key]
+    _buckets.move_to_end(key)
+    return bucket
+
+
+def _rate_limit_delay(response: httpx.Response, bucket: _Bucket) -> Optional[Tuple[str, float]]:
+    """(kind, seconds to wait) if the response is a rate limit, else None"""
+    if response.status_code not in (403, 429):
+        return None
+    retry_after = response.headers.get("retry-after")
+    if response.headers.get("x-ratelimit-remaining") == "0":
+        return "primary", float(retry_after) if retry_after else max(1.0, bucket.seconds_until_reset())
+    if retry_after or response.status_code == 429 or "secondary rate limit" in response.text.lower():
+        if retry_after:
+            return "secondary", float(retry_after)
+        # No hint: GitHub asks for at least a minute, doubling on repeats
+        backoff = settings.GITHUB_SECONDARY_BACKOFF_SECONDS * (2 ** bucket.failures)
+        return "secondary", min(backoff, settings.GITHUB_SECONDARY_BACKOFF_MAX_SECONDS)
+    return None  # An ordinary permission error
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=settings.GITHUB_TIMEOUT_SECONDS)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _headers(token: Optional[str], scheme: str, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    merged = {"Accept": "application/vnd.github+json"}
+    if token:
+        merged["Authorization"] = f"{scheme} {token}"
+    merged.update(headers or {})
+    return merged
+
+
+async def _after_rate_limit(response: httpx.Response, bucket: _Bucket, priority: str, attempt: int) -> bool:
+    """Record the response; True if it was rate limited and should be retried"""
+    bucket.update(response.headers)
+    metrics.inc("github_requests", priority=priority, status=response.status_code)
+    limited = _rate_limit_delay(response, bucket)
+    if limited is None:
+        bucket.failures = 0
+        return False
+    kind, delay = limited
+    bucket.failures += 1
+    bucket.block(delay)
+    metrics.inc("github_rate_limited", kind=kind, priority=priority)
+    print(f"[INFO] GitHub {kind} rate limit on {bucket.name}; blocked for {delay:.0f}s")
+    if attempt >= settings.GITHUB_MAX_RETRIES:
+        return False
+    if priority == DASHBOARD and delay > settings.GITHUB_DASHBOARD_MAX_WAIT_SECONDS:
+        raise GitHubRateLimited(delay)
+    return True
+
+
+async def _wait_turn(bucket: _Bucket, priority: str):
+    """Fail fast if a dashboard call couldn't start within its wait limit"""
+    if priority == DASHBOARD:
+        wait = bucket.wait_estimate(priority)
+        if wait > settings.GITHUB_DASHBOARD_MAX_WAIT_SECONDS:
+            raise GitHubRateLimited(wait)
+
+
+async def request(
+    method: str,
+    url: str,
+    token: Optional[str] = None,
+    priority: str = DASHBOARD,
+    bucket: Optional[str] = None,
+    resource: str = "core",
+    scheme: str = "Bearer",
+    headers: Optional[Dict[str, str]] = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """Send one GitHub API request under its bucket's pacing and rate limits.
+
+    `bucket` names the quota (e.g. "app"); by default it is the name given
+    to `token` with `name_token`, else a hash of the token. `resource` is GitHub's rate-limit
+    resource, "graphql" for the GraphQL API.
+    """
+    limiter = _bucket(bucket, token, resource)
+    attempt = 0
+    while True:
+        await _wait_turn(limiter, priority)
+        async with limiter.slot(priority):
+            response = await get_client().request(method, url, headers=_headers(token, scheme, headers), **kwargs)
+        if not await _after_rate_limit(response, limiter, priority, attempt):
+            return response
+        attempt += 1
+
+
+@asynccontextmanager
+async def stream(
+    method: str,
+    url: str,
+    token: Optional[str] = None,
+    priority: str = DASHBOARD,
+    bucket: Optional[str] = None,
+    resource: str = "core",
+    scheme: str = "Bearer",
+    headers: Optional[Dict[str, str]] = None,
+    **kwargs: Any,
+) -> AsyncIterator[httpx.Response]:
+    """Like `request`, for a streamed response; the bucket slot is held while it is read"""
+    limiter = _bucket(bucket, token, resource)
+    attempt = 0
+    while True:
+        await _wait_turn(limiter, priority)
+        async with limiter.slot(priority):
+            async with get_client().stream(
+                method, url, headers=_headers(token, scheme, headers), **kwargs
+            ) as response:
+                if response.status_code in (403, 429):
+                    await response.aread()
+                if not await _after_rate_limit(response, limiter, priority, attempt):
+                    yield response
+                    return
+        attempt += 1
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        f"{name}:{resource}": {
+            "remaining": bucket.remaining,
+            "limit": bucket.limit,
+            "reset_in_s": round(bucket.seconds_until_reset(), 1),
+            "active": bucket.active,
+            "queued": {p: len(q) for p, q in bucket.queues.items()},
+        }
+        for (name, resource), bucket in _buckets.items()
+        if not name.startswith("user:")
+    }
@@ -0,0 +1,161 @@
+# github_bot/github_graphql.py
+
+"""
+GitHub GraphQL helpers for dashboard reads.
+
+One GraphQL query can fetch many pull requests by aliasing
+`pullRequest(number: N)` once per PR, so a dashboard page costs one GitHub
+round trip instead of one per PR. Results are returned in the same shape
+as the REST pulls API fields the routes already use.
+
+The repository overview pages through `viewer.repositories` by cursor and
+reads each repo's open pull request count in the same query. It is cached
+per user (keyed by a hash of their token) for REPOS_CACHE_TTL_SECONDS.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from github_bot.config import settings
+from github_bot import github_client
+
+_PR_FIELDS = """
+    number
+    title
+    state
+    url
+    createdAt
+    updatedAt
+    author { login }
+"""
+
+
+def _to_rest_shape(node: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "number": node["number"],
+        "title": node["title"],
+        # REST only distinguishes open/closed; merged PRs are closed
+        "state": "open" if node["state"] == "OPEN" else "closed",
+        "html_url": node["url"],
+        "user": {"login": (node.get("author") or {}).get("login", "ghost")},
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+    }
+
+
+async def graphql(query: str, variables: Dict[str, Any], token: str,
+                  priority: str = github_client.DASHBOARD) -> Dict[str, Any]:
+    """Run a GraphQL query; returns `data`. Partial results (e.g. a missing PR) are kept."""
+    response = await github_client.request(
+        "POST", f"{settings.GITHUB_API_URL}/graphql", token,
+        priority=priority,
+        resource="graphql",
+        json={"query": query, "variables": variables}
+    )
+    if response.status_code != 200:
+        raise Exception(f"GraphQL request failed: {response.status_code} {response.text}")
+    body = response.json()
+    if body.get("errors"):
+        print(f"[DEBUG] GraphQL errors: {body['errors']}")
+    if body.get("data") is None:
+        raise Exception(f"GraphQL request failed: {body.get('errors')}")
+    return body["data"]
+
+
+async def _fetch_batch(owner: str, name: str, numbers: List[int], token: str) -> Dict[int, Dict[str, Any]]:
+    aliases = "\n".join(
+        f"pr_{number}: pullRequest(number: {int(number)}) {{ {_PR_FIELDS} }}" for number in numbers
+    )
+    query = f"""
+    query($owner: String!, $name: String!) {{
+      repository(owner: $owner, name: $name) {{
+        {aliases}
+      }}
+    }}
+    """
+    data = await graphql(query, {"owner": owner, "name": name}, token)
+    repository = data.get("repository") or {}
+    return {
+        node["number"]: _to_rest_shape(node)
+        for node in repository.values() if node
+    }
+
+
+async def fetch_pull_requests(repo_full_name: str, numbers: List[int], token: str) -> Dict[int, Dict[str, Any]]:
+    """Fetch several PRs of one repo, PR_BATCH_MAX per query; missing PRs are left out"""
+    owner, name = repo_full_name.split("/", 1)
+    numbers = list(dict.fromkeys(numbers))
+    batches = [numbers[i:i + settings.PR_BATCH_MAX] for i in range(0, len(numbers), settings.PR_BATCH_MAX)]
+    results = await asyncio.gather(*(_fetch_batch(owner, name, batch, token) for batch in batches))
+    prs: Dict[int, Dict[str, Any]] = {}
+    for result in results:
+        prs.update(result)
+    return prs
+
+
+_REPOS_QUERY = """
+query($cursor: String, $pageSize: Int!) {
+  viewer {
+    repositories(
+      first: $pageSize, after: $cursor,
+      affiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+      ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+      orderBy: {field: UPDATED_AT, direction: DESC}
+    ) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        nameWithOwner
+        description
+        isPrivate
+        updatedAt
+        pullRequests(states: OPEN) { totalCount }
+      }
+    }
+  }
+}
+"""
+
+# sha256(token) -> (expires_at, repos)
+_repos_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+
+async def _fetch_user_repos(token: str) -> List[Dict[str, Any]]:
+    repos: List[Dict[str, Any]] = []
+    cursor = None
+    while True:
+        data = await graphql(_REPOS_QUERY, {"cursor": cursor, "pageSize": settings.REPOS_PAGE_SIZE}, token)
+        page = data["viewer"]["repositories"]
+        for repo in page["nodes"] or []:
+            if not repo:
+                continue
+            repos.append({
+                "name": repo["name"],
+                "full_name": repo["nameWithOwner"],
+                "open_prs": repo["pullRequests"]["totalCount"],
+                "last_updated": repo["updatedAt"],
+                "description": repo.get("description"),
+                "private": repo.get("isPrivate", False)
+            })
+        if not page["pageInfo"]["hasNextPage"]:
+            return repos
+        cursor = page["pageInfo"]["endCursor"]
+
+
+async def get_user_repos(token: str) -> List[Dict[str, Any]]:
+    """Every repo the token's user can see, with open PR counts; cached briefly per user"""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    cached = _repos_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        _repos_cache.move_to_end(key)
+        return cached[1]
+
+    repos = await _fetch_user_repos(token)
+    _repos_cache[key] = (time.monotonic() + settings.REPOS_CACHE_TTL_SECONDS, repos)
+    _repos_cache.move_to_end(key)
+    while len(_repos_cache) > settings.REPOS_CACHE_MAX_USERS:
+        _repos_cache.popitem(last=False)
+    return repos
@@ -0,0 +1,269 @@
+# github_bot/installations.py
+
+"""
+Owner -> installation id index for the GitHub App.
+
+Installations live in the github_installations table and are mirrored in
+memory, so resolving a repo's installation is a dict lookup instead of
+listing every installation from GitHub per request. The table is kept
+current from the `installation`, `installation_repositories` and
+`installation_target` webhooks. The worker that handles a webhook
+announces the change on a Postgres NOTIFY channel and the other workers
+reload that installation.
+
+Webhooks missed while the bot was down are reconciled by re-listing the
+app's installations from GitHub: before serving when the table is empty
+(or INSTALLATIONS_RESYNC_ON_STARTUP is set), otherwise in the background
+right after startup, and then every INSTALLATIONS_RESYNC_INTERVAL_SECONDS.
+One worker at a time resyncs (Postgres advisory lock) and the others
+reload the whole table when it announces the result. If the LISTEN
+connection drops, it is reconnected and the index reloaded, since
+notifications sent in between were missed.
+"""
+
+import asyncio
+import json
+import os
+import socket
+from typing import Any, Dict, List, Optional
+
+from github_bot.config import settings
+from github_bot import github_client
+from github_bot.github_auth import generate_jwt, get_installation_token
+from common import metrics
+from db.connection import Listener, try_advisory_lock
+from db.crud import (
+    delete_installation, get_installations, notify_channel,
+    update_installation_repositories, upsert_installation
+)
+
+CHANNEL = "github_installation_events"
+SYNC_LOCK_ID = 0x6768_696E_7374  # pg advisory lock key for sync_from_github
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+INSTALLATION_EVENTS = ("installation", "installation_repositories", "installation_target")
+
+
+class InstallationIndex:
+    def __init__(self):
+        self._by_owner: Dict[str, Dict[str, Any]] = {}  # lower(account_login) -> installation
+        self._owner_of: Dict[int, str] = {}  # installation_id -> lower(account_login)
+
+    def __len__(self) -> int:
+        return len(self._by_owner)
+
+    def put(self, row: Dict[str, Any]):
+        self.remove(row["installation_id"])
+        owner = row["account_login"].lower()
+        self._by_owner[owner] = {
+            "installation_id": row["installation_id"],
+            "repository_selection": row["repository_selection"],
+            "repositories": {repo.lower() for repo in row["repositories"] or []},
+            "suspended": row["suspended"],
+        }
+        self._owner_of[row["installation_id"]] = owner
+
+    def remove(self, installation_id: int):
+        owner = self._owner_of.pop(installation_id, None)
+        if owner is not None:
+            self._by_owner.pop(owner, None)
+
+    def replace_all(self, rows: List[Dict[str, Any]]):
+        self._by_owner.clear()
+        self._owner_of.clear()
+        for row in rows:
+            self.put(row)
+
+    def resolve(self, repo_full_name: str) -> Optional[int]:
+        """Installation id that can access `repo_full_name` ("owner/name"), or None"""
+        owner = repo_full_name.split("/", 1)[0].lower()
+        installation = self._by_owner.get(owner)
+        if (
+            installation is None
+            or installation["suspended"]
+            or (installation["repository_selection"] == "selected"
+                and repo_full_name.lower() not in installation["repositories"])
+        ):
+            metrics.inc("installation_lookups", result="miss")
+            return None
+        metrics.inc("installation_lookups", result="hit")
+        return installation["installation_id"]
+
+
+installation_index = InstallationIndex()
+_listener: Optional[Listener] = None
+_resync_task: Optional[asyncio.Task] = None
+
+
+async def reload_all():
+    installation_index.replace_all(await get_installations())
+
+
+async def reload_installation(installation_id: int):
+    rows = await get_installations(installation_id)
+    if rows:
+        installation_index.put(rows[0])
+    else:
+        installation_index.remove(installation_id)
+
+
+async def apply_event(event: str, payload: Dict[str, Any]):
+    """Record an installation webhook in the table, this worker's index and the other workers'"""
+    installation = payload["installation"]
+    installation_id = installation["id"]
+    action = payload.get("action")
+
+    if event == "installation" and action == "deleted":
+        await delete_installation(installation_id)
+    elif event == "installation":
+        account = installation["account"]
+        repositories = None
+        if action == "created":
+            repositories = [repo["full_name"] for repo in payload.get("repositories") or []]
+        await upsert_installation(
+            installation_id,
+            account["login"],
+            account_type=account.get("type"),
+            repository_selection=installation.get("repository_selection"),
+            repositories=repositories,
+            suspended={"suspend": True, "unsuspend": False}.get(action),
+        )
+    elif event == "installation_repositories":
+        account = installation["account"]
+        await upsert_installation(installation_id, account["login"], account_type=account.get("type"))
+        await update_installation_repositories(
+            installation_id,
+            payload["repository_selection"],
+            [repo["full_name"] for repo in payload.get("repositories_added") or []],
+            [repo["full_name"] for repo in payload.get("repositories_removed") or []],
+        )
+    elif event == "installation_target":
+        # The account was renamed
+        await upsert_installation(installation_id, payload["account"]["login"])
+
+    await reload_installation(installation_id)
+    print(f"[INFO] Installation {installation_id}: {event} {action or ''}".rstrip())
+    try:
+        await notify_channel(CHANNEL, [json.dumps({"installation_id": installation_id, "origin": WORKER_ID})])
+    except Exception as e:
+        print(f"[ERROR] Failed to publish installation {installation_id} change: {e}")
+
+
+def _on_notification(connection, pid, channel, payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return
+    if event.get("origin") == WORKER_ID:
+        return
+    if event.get("installation_id") is None:
+        asyncio.get_running_loop().create_task(reload_all())  # A full resync finished
+    else:
+        asyncio.get_running_loop().create_task(reload_installation(event["installation_id"]))
+
+
+async def _list_pages(url: str, token: str, key: Optional[str] = None, bucket: Optional[str] = None) -> List[Dict[str, Any]]:
+    """GET every page of a GitHub list endpoint; `key` names the list in an object response"""
+    items: List[Dict[str, Any]] = []
+    page = 1
+    while True:
+        response = await github_client.request(
+            "GET", url, token,
+            priority=github_client.WEBHOOK,
+            bucket=bucket,
+            params={"per_page": 100, "page": page}
+        )
+        if response.status_code != 200:
+            raise Exception(f"Failed to list {url}: {response.status_code} {response.text}")
+        batch = response.json()
+        batch = batch[key] if key else batch
+        items.extend(batch)
+        if len(batch) < 100:
+            return items
+        page += 1
+
+
+async def sync_from_github():
+    """Rebuild the table from GitHub's list of this app's installations"""
+    jwt_token = generate_jwt(settings.APP_ID, settings.PRIVATE_KEY_PATH)
+    installations = await _list_pages(f"{settings.GITHUB_API_URL}/app/installations", jwt_token, bucket="app")
+    for installation in installations:
+        repositories: List[str] = []
+        if installation.get("repository_selection") == "selected":
+            token = await get_installation_token(settings.APP_ID, settings.PRIVATE_KEY_PATH, installation["id"])
+            repos = await _list_pages(
+                f"{settings.GITHUB_API_URL}/installation/repositories", token, key="repositories"
+            )
+            repositories = [repo["full_name"] for repo in repos]
+        await upsert_installation(
+            installation["id"],
+            installation["account"]["login"],
+            account_type=installation["account"].get("type"),
+            repository_selection=installation.get("repository_selection"),
+            repositories=repositories,
+            suspended=installation.get("suspended_at") is not None,
+        )
+    known = {installation["id"] for installation in installations}
+    for row in await get_installations():
+        if row["installation_id"] not in known:
+            await delete_installation(row["installation_id"])
+    print(f"[INFO] Synced {len(installations)} GitHub App installations")
+
+
+async def resync():
+    """Reconcile the table with GitHub (one worker at a time) and reload every worker's index"""
+    async with try_advisory_lock(SYNC_LOCK_ID) as locked:
+        if not locked:
+            return  # Another worker is resyncing and will announce it
+        await sync_from_github()
+    await reload_all()
+    try:
+        await notify_channel(CHANNEL, [json.dumps({"installation_id": None, "origin": WORKER_ID})])
+    except Exception as e:
+        print(f"[ERROR] Failed to publish installation resync: {e}")
+
+
+async def _resync_loop(resync_now: bool):
+    interval = settings.INSTALLATIONS_RESYNC_INTERVAL_SECONDS
+    while True:
+        if resync_now:
+            try:
+                await resync()
+            except Exception as e:
+                print(f"[ERROR] Installation resync failed: {e}")
+        if interval <= 0:
+            return
+        await asyncio.sleep(interval)
+        resync_now = True
+
+
+async def start_installation_index():
+    global _listener, _resync_task
+    _listener = Listener(CHANNEL, _on_notification, on_connect=reload_all)
+    await _listener.start()
+    synced = False
+    try:
+        rows = await get_installations()
+        if not rows or settings.INSTALLATIONS_RESYNC_ON_STARTUP:
+            await sync_from_github()
+            rows = await get_installations()
+            synced = True
+        installation_index.replace_all(rows)
+        print(f"[INFO] Installation index loaded: {len(installation_index)} installations")
+    except Exception as e:
+        # Lookups miss and callers fall back to the user's token until a resync works
+        print(f"[ERROR] Installation index unavailable: {e}")
+    _resync_task = asyncio.create_task(_resync_loop(resync_now=not synced))
+
+
+async def stop_installation_index():
+    global _listener, _resync_task
+    if _resync_task is not None:
+        _resync_task.cancel()
+        try:
+            await _resync_task
+        except asyncio.CancelledError:
+            pass
+        _resync_task = None
+    if _listener is not None:
+        await _listener.close()
+        _listener = None
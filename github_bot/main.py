@@ -1,16 +1,27 @@
 # github_bot/main.py
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from github_bot.routes import webhook_router
+from github_bot.mcp_client import close_client
+from github_bot import github_client
+from github_bot.webhook_queue import webhook_queue
+from github_bot.installations import start_installation_index, stop_installation_index
 from db.connection import init_db_pool
 from fastapi.middleware.cors import CORSMiddleware
-from config import settings
+from github_bot.config import settings
+from common import metrics
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db_pool()
+    await start_installation_index()
     yield
+    await webhook_queue.drain(settings.WEBHOOK_DRAIN_SECONDS)
+    await stop_installation_index()
+    await close_client()
+    await github_client.close_client()
 
 app = FastAPI(
     title="GitHub Bot Webhook Server",
@@ -27,7 +38,26 @@ app.add_middleware(
 app.include_router(webhook_router)
 
 
+@app.exception_handler(github_client.GitHubRateLimited)
+async def github_rate_limited(request: Request, exc: github_client.GitHubRateLimited):
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
+
 # Optional root for health check
 @app.get("/health")
 def read_root():
     return {"status": "ok", "message": "GitHub Bot is running"}
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Per-worker counters, gauges and summaries, GitHub quota per bucket and webhook queues per installation"""
+    return {
+        **metrics.snapshot(),
+        "github_rate_limits": github_client.stats(),
+        "webhook_installations": webhook_queue.stats(),
+    }
@@ -1,10 +1,101 @@
 # github_bot/mcp_client.py
 
+import asyncio
+import gzip
+import json
+import time
+from typing import Dict, Optional, Tuple
+
 import httpx
 from github_bot.config import settings
 
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+# Remaining time budget in milliseconds, read by the MCP server
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+# MCP's LLM lane for this request (default: background)
+LANE_HEADER = "X-LLM-Lane"
+
+# Shared client so connections to MCP are kept alive between webhooks
+_client: Optional[httpx.AsyncClient] = None
+
+SUMMARY_TIMEOUT = "_Summary unavailable: the analysis service did not respond in time._"
+SUMMARY_ERROR = "_Summary unavailable: the analysis service returned an error._"
+SUMMARY_BUSY = "_Summary unavailable: the analysis service is over capacity._"
+# Returned when MCP could not be asked; its rule checks did not run either
+FAILED_SUMMARIES = (SUMMARY_TIMEOUT, SUMMARY_ERROR, SUMMARY_BUSY)
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        limits = httpx.Limits(
+            max_connections=settings.MCP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.MCP_MAX_CONNECTIONS,
+        )
+        # MCP_UDS_PATH routes requests over a Unix socket; MCP_URL still sets the Host
+        transport = httpx.AsyncHTTPTransport(uds=settings.MCP_UDS_PATH or None, limits=limits)
+        _client = httpx.AsyncClient(transport=transport)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _encoding() -> str:
+    if settings.MCP_ENCODING == "msgpack" and msgpack is None:
+        print("[ERROR] MCP_ENCODING=msgpack but msgpack is not installed; using json")
+        return "json"
+    return settings.MCP_ENCODING
+
+
+def _compression() -> str:
+    if settings.MCP_COMPRESSION == "zstd" and zstandard is None:
+        print("[ERROR] MCP_COMPRESSION=zstd but zstandard is not installed; using gzip")
+        return "gzip"
+    return settings.MCP_COMPRESSION
 
-def get_summary(pr_data: dict) -> dict:
+
+def _pack(pr_data: dict) -> Tuple[bytes, Dict[str, str]]:
+    """Encode and compress a request body for the /analyze_pr/packed endpoint"""
+    if _encoding() == "msgpack":
+        body = msgpack.packb(pr_data, use_bin_type=True)
+        headers = {"Content-Type": "application/msgpack"}
+    else:
+        body = json.dumps(pr_data, separators=(",", ":")).encode()
+        headers = {"Content-Type": "application/json"}
+
+    compression = _compression()
+    if len(body) < settings.MCP_COMPRESS_MIN_BYTES or compression == "none":
+        return body, headers
+    if compression == "zstd":
+        body = zstandard.ZstdCompressor(level=settings.MCP_ZSTD_LEVEL).compress(body)
+    else:
+        body = gzip.compress(body, compresslevel=settings.MCP_GZIP_LEVEL)
+    headers["Content-Encoding"] = compression
+    return body, headers
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "1")))
+    except ValueError:
+        return 1.0
+
+
+async def get_summary(pr_data: dict, deadline: Optional[float] = None, lane: Optional[str] = None) -> dict:
     """
     Send PR data to the MCP server and return the summary and rule violations.
 
@@ -12,23 +103,67 @@ def get_summary(pr_data: dict) -> dict:
         pr_data (dict): {
             title, description, diff, files[], repo_full_name, pr_number, user
         }
+        deadline (float): time.monotonic() value by which we need an answer;
+            defaults to WEBHOOK_DEADLINE_SECONDS from now
+        lane (str): MCP's LLM lane, e.g. "backfill" for bulk historical work
 
     Returns:
         dict: {
             "summary": str,
             "rule_violations": list
         }
+        On failure the summary is one of FAILED_SUMMARIES, explaining why,
+        and rule_violations is empty because no rules were checked.
+
+    When MCP sheds load (429/503) we wait out its Retry-After and try
+    again, as long as that still fits before the deadline.
+
+    With MCP_ENCODING/MCP_COMPRESSION set, the body is packed once and
+    sent to MCP_URL + "/packed" instead of the plain JSON endpoint.
     """
+    if deadline is None:
+        deadline = time.monotonic() + settings.WEBHOOK_DEADLINE_SECONDS
 
-    try:
-        response = httpx.post(settings.MCP_URL, json=pr_data, timeout=30)
+    base_headers: Dict[str, str] = {LANE_HEADER: lane} if lane else {}
+    if settings.MCP_ENCODING == "json" and settings.MCP_COMPRESSION == "none":
+        url, body_kwargs = settings.MCP_URL, {"json": pr_data}
+    else:
+        body, packed_headers = _pack(pr_data)
+        base_headers.update(packed_headers)
+        url, body_kwargs = settings.MCP_URL.rstrip("/") + "/packed", {"content": body}
+
+    client = get_client()
+    for attempt in range(settings.MCP_MAX_ATTEMPTS):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print("[MCP ERROR] Deadline passed before calling MCP")
+            return {"summary": SUMMARY_TIMEOUT, "rule_violations": []}
+        budget_ms = max(0, int(remaining * 1000) - settings.MCP_DEADLINE_MARGIN_MS)
+        headers = {**base_headers, DEADLINE_HEADER: str(budget_ms)}
+
+        try:
+            response = await client.post(url, headers=headers, timeout=remaining, **body_kwargs)
+        except httpx.TimeoutException:
+            print(f"[MCP ERROR] No response within {remaining:.1f}s")
+            return {"summary": SUMMARY_TIMEOUT, "rule_violations": []}
+        except Exception as e:
+            print("[MCP EXCEPTION]", str(e))
+            return {"summary": SUMMARY_ERROR, "rule_violations": []}
+
+        if response.status_code in (429, 503):
+            wait = _retry_after(response)
+            # Only worth retrying if there is time left for MCP to do the work
+            if time.monotonic() + wait + 1 < deadline and attempt + 1 < settings.MCP_MAX_ATTEMPTS:
+                print(f"[MCP] Over capacity ({response.status_code}), retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                continue
+            print("[MCP ERROR]", response.status_code, "over capacity, giving up")
+            return {"summary": SUMMARY_BUSY, "rule_violations": []}
 
         if response.status_code != 200:
             print("[MCP ERROR]", response.status_code, response.text)
-            return {"summary": "", "rule_violations": []}
+            return {"summary": SUMMARY_ERROR, "rule_violations": []}
 
         return response.json()
 
-    except Exception as e:
-        print("[MCP EXCEPTION]", str(e))
-        return {"summary": "", "rule_violations": []}
+    return {"summary": SUMMARY_BUSY, "rule_violations": []}
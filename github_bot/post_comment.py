@@ -1,16 +1,20 @@
 # github_bot/post_comment.py
 
-import httpx
+from github_bot.config import settings
+from github_bot import github_client
 
 
-def format_comment(summary: str, violations: list) -> str:
+def format_comment(summary: str, violations: list, checked: bool = True) -> str:
     """
     Formats the MCP results into a GitHub markdown comment.
+    checked=False means MCP could not be reached, so no rules were checked.
     """
     comment = f"## 🤖 GitHub Bot Review\n\n"
     comment += f"### ✅ PR Summary:\n\n{summary.strip()}\n\n"
 
-    if not violations:
+    if not checked:
+        comment += "### ⚠️ Rule checks did not run.\n"
+    elif not violations:
         comment += "### ✅ No rule violations found.\n"
     else:
         comment += "### ❌ Rule Violations:\n"
@@ -21,19 +25,14 @@ def format_comment(summary: str, violations: list) -> str:
     return comment
 
 
-def post_comment_to_pr(repo_full_name: str, pr_number: int, comment_body: str, token: str):
+async def post_comment_to_pr(repo_full_name: str, pr_number: int, comment_body: str, token: str):
     """
     Posts a comment to the specified PR using the GitHub API.
     """
-    url = f"https://api.github.com/repos/{repo_full_name}/issues/{pr_number}/comments"
-
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"{settings.GITHUB_API_URL}/repos/{repo_full_name}/issues/{pr_number}/comments"
 
     payload = {"body": comment_body}
-    response = httpx.post(url, headers=headers, json=payload)
+    response = await github_client.request("POST", url, token, priority=github_client.WEBHOOK, json=payload)
 
     if response.status_code not in (200, 201):
         raise Exception(f"Failed to post comment: {response.status_code}, {response.text}")
@@ -1,17 +1,24 @@
 # github_bot/router.py
 
-from fastapi import APIRouter, Request, Header, status, HTTPException
+from fastapi import APIRouter, Request, Header, Query, status, HTTPException
 from fastapi.responses import JSONResponse, RedirectResponse
-from github_bot.github_auth import get_installation_token, generate_jwt
-from github_bot.mcp_client import get_summary
-from github_bot.utils import fetch_pr_diff_and_files
+from github_bot.github_auth import get_installation_token
+from github_bot.mcp_client import FAILED_SUMMARIES, get_summary
+from github_bot.utils import diff_for_mcp, fetch_pr_diff_and_files
+from github_bot.installations import INSTALLATION_EVENTS, apply_event, installation_index
+from github_bot.webhook_queue import QueueFull, webhook_queue
+from github_bot.github_graphql import fetch_pull_requests, get_user_repos
 from github_bot.config import settings
+from github_bot import github_client
+from common import metrics
 from github_bot.post_comment import format_comment, post_comment_to_pr
 import hmac
-import httpx
 import base64
 import json
 import urllib.parse
+import asyncio
+import time
+from typing import List
 
 webhook_router = APIRouter()
 
@@ -19,7 +26,8 @@ webhook_router = APIRouter()
 @webhook_router.post("/webhook")
 async def handle_webhook(
     request: Request,
-    x_hub_signature_256: str = Header(None)
+    x_hub_signature_256: str = Header(None),
+    x_github_event: str = Header(None)
 ):
     body = await request.body()
     # print("Received webhook")
@@ -41,16 +49,38 @@ async def handle_webhook(
     except Exception:
         return {"error": "Invalid JSON"}
 
+    if x_github_event in INSTALLATION_EVENTS:
+        await apply_event(x_github_event, payload)
+        return {"msg": "Installation updated"}
+
     action = payload.get("action")
     if payload.get("pull_request") is None or action not in ["opened", "synchronize", "reopened"]:  # noqa
         return {"msg": "Ignored event"}
 
+    # --- Queue the analysis; installations share workers fairly ---
+    repo = payload["repository"]
+    try:
+        outcome = webhook_queue.submit(
+            payload["installation"]["id"],
+            repo["owner"]["login"],
+            (repo["full_name"], payload["number"]),
+            lambda: analyze_pull_request(payload)
+        )
+    except QueueFull as e:
+        print(f"[ERROR] Rejected webhook for {repo['full_name']}#{payload['number']}: {e}")
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"error": str(e)})
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"msg": f"Webhook {outcome}"})
+
+
+async def analyze_pull_request(payload: dict):
+    """Analyse a PR from its webhook payload and post the review comment"""
+    deadline = time.monotonic() + settings.WEBHOOK_DEADLINE_SECONDS
     pr = payload["pull_request"]
     repo = payload["repository"]
     installation_id = payload["installation"]["id"]
 
     # --- Get GitHub installation token ---
-    token = get_installation_token(
+    token = await get_installation_token(
         app_id=settings.APP_ID,
         private_key_path=settings.PRIVATE_KEY_PATH,
         installation_id=installation_id
@@ -59,8 +89,19 @@ async def handle_webhook(
     # --- Fetch PR diff and files ---
     pr_number = payload["number"]
     files_url = pr["url"] + "/files"
-    diff_url = f"https://api.github.com/repos/{repo['owner']['login']}/{repo['name']}/pulls/{pr_number}"  # noqa
-    files, diff_text = fetch_pr_diff_and_files(diff_url, files_url, token)
+    diff_url = f"{settings.GITHUB_API_URL}/repos/{repo['owner']['login']}/{repo['name']}/pulls/{pr_number}"  # noqa
+    rss_before = metrics.process_rss_bytes()
+    base_sha, head_sha = pr["base"]["sha"], pr["head"]["sha"]
+    files, diff = await fetch_pr_diff_and_files(
+        diff_url, files_url, token, diff_ref=(repo["full_name"], base_sha, head_sha)
+    )
+    try:
+        diff_text, diff_truncated = diff_for_mcp(diff)
+        diff_size, diff_spilled, download_capped = diff.size, diff.spilled, diff.truncated
+    finally:
+        diff.close()
+    _record_diff_memory(repo["full_name"], pr_number, diff_size, diff_spilled, len(diff_text), rss_before)
+
     # --- Prepare payload for MCP ---
     pr_data = {
         "pr_number": pr_number,
@@ -68,6 +109,10 @@ async def handle_webhook(
         "description": pr.get("body") or "",
         "repo_full_name": repo["full_name"],
         "diff": diff_text,
+        "diff_truncated": diff_truncated,
+        "diff_size": None if download_capped else diff_size,
+        "base_sha": base_sha,
+        "head_sha": head_sha,
         "files": [
             {
                 "filename": f["filename"],
@@ -84,8 +129,13 @@ async def handle_webhook(
         }
     }
 
+    del diff_text  # pr_data holds the only reference now
+
     # --- Call MCP ---
-    mcp_response = get_summary(pr_data)
+    mcp_response = await get_summary(pr_data, deadline)
+    pr_data.pop("diff")  # Not needed for the rest of the request
+    # The placeholder goes in the comment only; the stored summary is kept
+    analyzed = mcp_response["summary"] not in FAILED_SUMMARIES
 
     # Store analysis in database
     from db.crud import upsert_pr_summary
@@ -116,32 +166,44 @@ async def handle_webhook(
         approvals_count=0,  # You can calculate this from reviews
         violation_count=len(mcp_response["rule_violations"]),
         violations=mcp_response["rule_violations"],
-        summary_text=mcp_response["summary"],
-        summary_generated_at=parse_date(pr["updated_at"])
+        summary_text=mcp_response["summary"] if analyzed else None,
+        summary_generated_at=parse_date(pr["updated_at"]) if analyzed else None,
+        base_sha=base_sha,
+        head_sha=head_sha,
+        file_paths=[f["filename"] for f in files]
     )
 
-    comment_body = format_comment(
-        mcp_response["summary"], mcp_response["rule_violations"]
-    )
-    comment_body = format_comment(mcp_response["summary"], mcp_response["rule_violations"])
-    post_comment_to_pr(repo["full_name"], pr_number, comment_body, token)
+    comment_body = format_comment(mcp_response["summary"], mcp_response["rule_violations"], checked=analyzed)
+    await post_comment_to_pr(repo["full_name"], pr_number, comment_body, token)
+
 
-    return {"msg": "Webhook processed"}
+def _record_diff_memory(repo_full_name: str, pr_number: int, diff_size: int, spilled: bool,
+                        sent_chars: int, rss_before: int):
+    """Per-analysis memory accounting for the diff handling above"""
+    rss_delta = metrics.process_rss_bytes() - rss_before
+    metrics.observe("webhook_diff_bytes", diff_size)
+    metrics.observe("webhook_diff_sent_chars", sent_chars)
+    metrics.observe("webhook_rss_delta_bytes", rss_delta)
+    metrics.inc("webhook_diffs", spilled=str(spilled).lower())
+    print(f"[INFO] PR {repo_full_name}#{pr_number}: diff {diff_size} bytes "
+          f"({'spilled to disk' if spilled else 'in memory'}), sent {sent_chars} chars, "
+          f"rss delta {rss_delta} bytes")
 
 
 @webhook_router.get("/auth/github/callback")
 async def github_oauth_callback(code: str):
     # Exchange code for access token
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(
-            "https://github.com/login/oauth/access_token",
-            headers={"Accept": "application/json"},
-            data={
-                "client_id": settings.GITHUB_CLIENT_ID,
-                "client_secret": settings.GITHUB_CLIENT_SECRET,
-                "code": code,
-            },
-        )
+    token_resp = await github_client.request(
+        "POST",
+        "https://github.com/login/oauth/access_token",
+        bucket="oauth",
+        headers={"Accept": "application/json"},
+        data={
+            "client_id": settings.GITHUB_CLIENT_ID,
+            "client_secret": settings.GITHUB_CLIENT_SECRET,
+            "code": code,
+        },
+    )
     # print("GitHub token response:", token_resp.text)
     token_data = token_resp.json()
     access_token = token_data.get("access_token")
@@ -150,11 +212,7 @@ async def github_oauth_callback(code: str):
         return {"error": "Failed to get access token"}
 
     # Get user info
-    async with httpx.AsyncClient() as client:
-        user_resp = await client.get(
-            "https://api.github.com/user",
-            headers={"Authorization": f"Bearer {access_token}"}
-        )
+    user_resp = await github_client.request("GET", f"{settings.GITHUB_API_URL}/user", access_token)
     user_data = user_resp.json()
 
     # Encode user data
@@ -179,154 +237,130 @@ def login_github():
 
 @webhook_router.get("/repos")
 async def get_repos(token: str = Header(..., alias="Authorization")):
+    """All of the user's repos with real open PR counts, via paginated GraphQL"""
     # Remove "Bearer " prefix
     github_token = token.replace("Bearer ", "")
-    # Fetch repos from GitHub API
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            "https://api.github.com/user/repos",
-            headers={"Authorization": f"token {github_token}"}
-        )
-        repos_data = response.json()
-        # Transform to match your frontend interface
-        repos = []
-        for repo in repos_data:
-            repos.append({
-                "name": repo["name"],
-                "full_name": repo["full_name"],
-                "open_prs": repo.get("open_issues_count", 0),  # or fetch actual PR count
-                "last_updated": repo["updated_at"],
-                "description": repo.get("description"),
-                "private": repo.get("private", False)
-            })
-
-        return repos
+    try:
+        return await get_user_repos(github_token)
+    except Exception as e:
+        print(f"[ERROR] Failed to fetch repos: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error fetching repos: {str(e)}")
 
 
 @webhook_router.get("/repos/{repo:path}/pull-requests")
-async def get_repo_prs(repo: str, token: str = Header(..., alias="Authorization")):    
-    # Try to get installation token for this repository
-    try:
-        # First, get the installation ID for this repository
-        jwt_token = generate_jwt(settings.APP_ID, settings.PRIVATE_KEY_PATH)
-        
-        async with httpx.AsyncClient() as client:
-            # Get installations for the app
-            installations_response = await client.get(
-                "https://api.github.com/app/installations",
-                headers={
-                    "Authorization": f"Bearer {jwt_token}",
-                    "Accept": "application/vnd.github+json"
-                }
+async def get_repo_prs(
+    repo: str,
+    token: str = Header(..., alias="Authorization"),
+    include_summaries: bool = False
+):
+    """List a repo's PRs; with include_summaries, each PR carries its stored summary and violations"""
+    # Prefer the app's installation token for this repository
+    github_token = token.replace("Bearer ", "")
+    installation_id = installation_index.resolve(repo)
+    if installation_id:
+        try:
+            github_token = await get_installation_token(
+                settings.APP_ID,
+                settings.PRIVATE_KEY_PATH,
+                installation_id,
+                priority=github_client.DASHBOARD
             )
-            
-            if installations_response.status_code != 200:
-                print(f"Failed to get installations: {installations_response.status_code}")
-                # Fall back to personal access token
-                github_token = token.replace("Bearer ", "")
-            else:
-                installations = installations_response.json()
-                
-                # Find installation for this repository
-                installation_id = None
-                for installation in installations:
-                    if installation.get("account", {}).get("login") in repo:
-                        installation_id = installation["id"]
-                        break
-                
-                if installation_id:
-                    # Get installation token
-                    github_token = get_installation_token(
-                        settings.APP_ID, 
-                        settings.PRIVATE_KEY_PATH, 
-                        installation_id
-                    )
-                else:
-                    github_token = token.replace("Bearer ", "")
-    except Exception as e:
-        github_token = token.replace("Bearer ", "")
+        except Exception as e:
+            print(f"[ERROR] Installation token for {repo} failed, using user token: {e}")
+
+    github_url = f"{settings.GITHUB_API_URL}/repos/{repo}/pulls"
+    response = await github_client.request("GET", github_url, github_token)
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+
+    prs_data = response.json()
+
+    # Transform to match your frontend interface
+    prs = []
+    for pr in prs_data:
+        prs.append({
+            "number": pr["number"],
+            "title": pr["title"],
+            "author": pr["user"]["login"],
+            "status": pr["state"],  # "open", "closed"
+            "created_at": pr["created_at"],
+            "updated_at": pr["updated_at"]
+        })
+
+    if include_summaries:
+        from db.crud import get_pr_summaries
+        summaries = await get_pr_summaries(repo, [pr["number"] for pr in prs])
+        for pr in prs:
+            summary = summaries.get(pr["number"]) or {}
+            pr["summary"] = summary.get("summary_text") or ""
+            pr["violations"] = summary.get("violations") or []
+
+    return prs
+
+
+@webhook_router.get("/repos/{repo:path}/prs")
+async def get_prs_details(
+    repo: str,
+    numbers: List[int] = Query(...),
+    token: str = Header(..., alias="Authorization")
+):
+    """Details for several PRs at once: one GraphQL query and one pr_summary query.
 
-    async with httpx.AsyncClient() as client:
-        github_url = f"https://api.github.com/repos/{repo}/pulls"
+    Takes ?numbers=1&numbers=2...; PRs GitHub doesn't know are left out.
+    """
+    from db.crud import get_pr_summaries
 
-        response = await client.get(
-            github_url,
-            headers={"Authorization": f"Bearer {github_token}"}
+    github_token = token.replace("Bearer ", "")
+    try:
+        prs, summaries = await asyncio.gather(
+            fetch_pull_requests(repo, numbers, github_token),
+            get_pr_summaries(repo, numbers)
         )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-
-        prs_data = response.json()
-
-        # Transform to match your frontend interface
-        prs = []
-        for pr in prs_data:
-            prs.append({
-                "number": pr["number"],
-                "title": pr["title"],
-                "author": pr["user"]["login"],
-                "status": pr["state"],  # "open", "closed"
-                "created_at": pr["created_at"],
-                "updated_at": pr["updated_at"]
-            })
-
-        return prs
+    except Exception as e:
+        print(f"[ERROR] Batch PR lookup failed for {repo}: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Error fetching PRs: {str(e)}")
+
+    results = []
+    for number in dict.fromkeys(numbers):
+        pr_data = prs.get(number)
+        if pr_data is None:
+            continue
+        summary = summaries.get(number) or {}
+        results.append(_format_pr_details(pr_data, summary.get("summary_text") or "", summary.get("violations") or []))
+    return results
+
+
+def _format_pr_details(pr_data: dict, summary: str, violations: list) -> dict:
+    """Transform a GitHub PR plus its stored analysis to match the frontend interface"""
+    return {
+        "number": pr_data["number"],
+        "title": pr_data["title"],
+        "author": pr_data["user"]["login"],
+        "status": pr_data["state"],
+        "created_at": pr_data["created_at"],
+        "updated_at": pr_data["updated_at"],
+        "summary": summary,  # AI-generated summary
+        "violations": violations,  # AI-generated violations
+        "owner": pr_data["user"]["login"],
+        "last_updated": pr_data["updated_at"]
+    }
 
 
 @webhook_router.get("/repos/{repo:path}/prs/{pr_number}")
 async def get_pr_details(repo: str, pr_number: int, token: str = Header(..., alias="Authorization")):
-    github_token = token.replace("Bearer ", "")
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"https://api.github.com/repos/{repo}/pulls/{pr_number}",
-            headers={"Authorization": f"Bearer {github_token}"}
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail=response.text)
+    from db.crud import get_pr_summary
 
-        pr_data = response.json()
-
-        # Get analysis from database
-        from db.connection import get_db_pool
-        pool = get_db_pool()
+    github_token = token.replace("Bearer ", "")
 
-        db_row = await pool.fetchrow(
-            "SELECT summary_text, violations FROM pr_summary WHERE repo_full_name = $1 AND pr_number = $2",
-            repo, pr_number
-        )
+    # GitHub and the stored analysis are independent; wait for the slower one only
+    response, stored = await asyncio.gather(
+        github_client.request("GET", f"{settings.GITHUB_API_URL}/repos/{repo}/pulls/{pr_number}", github_token),
+        get_pr_summary(repo, pr_number)
+    )
 
-        summary = ""
-        violations: list = []
-
-        if db_row:
-            summary = db_row["summary_text"] or ""
-            violations_data = db_row["violations"]
-            if violations_data:
-                if isinstance(violations_data, str):
-                    import json
-                    violations = json.loads(violations_data)
-                elif isinstance(violations_data, list):
-                    violations = violations_data
-                else:
-                    violations = []
-            else:
-                violations = []
-        
-        # Transform to match your frontend interface
-        pr_details = {
-            "number": pr_data["number"],
-            "title": pr_data["title"],
-            "author": pr_data["user"]["login"],
-            "status": pr_data["state"],
-            "created_at": pr_data["created_at"],
-            "updated_at": pr_data["updated_at"],
-            "summary": summary,  # AI-generated summary
-            "violations": violations,  # AI-generated violations
-            "owner": pr_data["user"]["login"],
-            "last_updated": pr_data["updated_at"]
-        }
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=response.text)
 
-        return pr_details
+    stored = stored or {}
+    return _format_pr_details(response.json(), stored.get("summary_text") or "", stored.get("violations") or [])
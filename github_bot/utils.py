@@ -1,43 +1,106 @@
 # github_bot/utils.py
 
-import httpx
+from typing import Optional, Tuple
 
+from github_bot.config import settings
+from github_bot import github_client
+from github_bot.diff_buffer import DiffBuffer
+from common import metrics
+from db.diff_store import get_diff_store
 
-def fetch_pr_diff_and_files(diff_url: str, files_url: str, token: str):
+
+async def fetch_pr_diff_and_files(
+    diff_url: str,
+    files_url: str,
+    token: str,
+    diff_ref: Optional[Tuple[str, str, str]] = None,
+    priority: str = github_client.WEBHOOK
+):
     """
     Fetches:
-    - The raw diff from the GitHub Pull Request
+    - The raw diff from the GitHub Pull Request, streamed into a DiffBuffer
     - The structured list of changed files
 
+    With `diff_ref` = (repo_full_name, base_sha, head_sha) the diff is read
+    through the diff store: a stored diff skips the GitHub download, and a
+    freshly downloaded one is saved for later readers. Either way
+    `diff.stored` is set once the store holds the full diff.
+
     Returns:
-        (files: List[dict], diff_text: str)
+        (files: List[dict], diff: DiffBuffer)
+        The caller must close() the DiffBuffer.
+    """
+
+    # Fetch structured file list
+    file_resp = await github_client.request("GET", files_url, token, priority=priority)
+    if file_resp.status_code != 200:
+        raise Exception(
+            f"Failed to fetch files: {file_resp.status_code}, {file_resp.text}"  # noqa
+        )
+    files = file_resp.json()
+
+    # Stream the unified diff; it spills to disk past the spool threshold
+    diff = DiffBuffer(settings.DIFF_SPOOL_THRESHOLD_BYTES, settings.DIFF_MAX_BYTES)
+    if diff_ref and await _load_stored_diff(diff_ref, diff):
+        diff.stored = True
+        return files, diff
+    try:
+        async with github_client.stream(
+            "GET", diff_url, token,
+            priority=priority,
+            headers={"Accept": "application/vnd.github.v3.diff"}
+        ) as diff_resp:
+            if diff_resp.status_code != 200:
+                await diff_resp.aread()
+                raise Exception(
+                    f"Failed to fetch diff: {diff_resp.status_code}, {diff_resp.text}"  # noqa
+                )
+            async for chunk in diff_resp.aiter_bytes():
+                if not diff.write(chunk):
+                    print(f"[INFO] Diff exceeds {settings.DIFF_MAX_BYTES} bytes, truncating: {diff_url}")
+                    break
+    except Exception:
+        diff.close()
+        raise
+
+    if diff_ref and not diff.truncated:
+        diff.stored = await _save_diff(diff_ref, diff)
+    return files, diff
+
+
+def diff_for_mcp(diff: DiffBuffer) -> Tuple[str, bool]:
+    """(diff text, truncated) for the MCP payload.
+
+    When MCP reads the same diff store, a stored diff is sent as "" and MCP
+    loads it by base_sha/head_sha, so the diff text isn't built here.
     """
+    if diff.stored and settings.MCP_READS_DIFF_STORE:
+        return "", False
+    # Only a bounded prefix of the diff ever becomes a str
+    return diff.read_text(settings.DIFF_MAX_SEND_BYTES)
+
+
+async def _load_stored_diff(diff_ref: Tuple[str, str, str], diff: DiffBuffer) -> bool:
+    store = get_diff_store()
+    try:
+        found = await store.load(*diff_ref, diff.write)
+    except Exception as e:
+        print(f"[ERROR] Diff store read failed: {e}")
+        found = False
+    if not found and diff.size:
+        # Partial read from a failed load; start over from GitHub
+        diff.reset()
+    metrics.inc("diff_store_lookups", backend=store.backend, result="hit" if found else "miss")
+    return found
+
 
-    file_headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
-
-    diff_headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github.v3.diff"
-    }
-
-    with httpx.Client() as client:
-        # Fetch structured file list
-        file_resp = client.get(files_url, headers=file_headers)
-        if file_resp.status_code != 200:
-            raise Exception(
-                f"Failed to fetch files: {file_resp.status_code}, {file_resp.text}"  # noqa
-            )
-        files = file_resp.json()
-
-        # Fetch unified diff
-        diff_resp = client.get(diff_url, headers=diff_headers)
-        if diff_resp.status_code != 200:
-            raise Exception(
-                f"Failed to fetch diff: {diff_resp.status_code}, {diff_resp.text}"  # noqa
-            )
-        diff_text = diff_resp.text
-
-    return files, diff_text
+async def _save_diff(diff_ref: Tuple[str, str, str], diff: DiffBuffer) -> bool:
+    store = get_diff_store()
+    if store.backend == "none":
+        return False
+    try:
+        await store.save(*diff_ref, diff.iter_chunks())
+        return True
+    except Exception as e:
+        print(f"[ERROR] Diff store write failed: {e}")
+        return False
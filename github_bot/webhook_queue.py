@@ -0,0 +1,240 @@
+# github_bot/webhook_queue.py
+
+"""
+Fair scheduling of PR analyses across installations.
+
+Pull request webhooks are acknowledged with 202 and their analysis is
+queued per installation. Installations share WEBHOOK_MAX_CONCURRENCY
+analysis slots by weighted fair queuing (start-time fair queuing): each
+job is tagged with max(virtual time, its installation's previous tag) +
+1/weight and the smallest tag among eligible installations runs next, so
+an installation with weight 2 gets twice the slots of one with weight 1
+when both are busy, and an idle installation never builds up credit.
+
+Each installation is also capped at WEBHOOK_INSTALLATION_MAX_CONCURRENCY
+running analyses and WEBHOOK_INSTALLATION_RATE_PER_MINUTE started
+analyses (token bucket), which bounds its share of the LLM budget. An
+idle installation's state is only forgotten once its bucket has refilled,
+so submitting jobs one at a time doesn't reset the limit. A new push to a
+PR whose analysis is still queued replaces the queued job.
+
+Queued jobs live in memory: on shutdown the queue is drained for up to
+WEBHOOK_DRAIN_SECONDS, and jobs still waiting after that are lost (the
+next push re-analyses the PR).
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+from github_bot.config import settings
+from common import metrics
+
+
+class QueueFull(Exception):
+    """The installation already has WEBHOOK_INSTALLATION_MAX_QUEUE jobs waiting"""
+
+
+def parse_weights(raw: str) -> Dict[str, float]:
+    """Parse INSTALLATION_WEIGHTS ("123:4,big-org:0.5"); keys are installation ids or account logins"""
+    weights = {}
+    for item in raw.split(","):
+        key, _, value = item.strip().rpartition(":")
+        if not key:
+            continue
+        try:
+            weight = float(value)
+        except ValueError:
+            print(f"[ERROR] Ignoring invalid installation weight: {item}")
+            continue
+        if weight > 0:
+            weights[key.strip().lower()] = weight
+    return weights
+
+
+class _Job:
+    __slots__ = ("key", "run", "tag", "enqueued_at")
+
+    def __init__(self, key: Hashable, run: Callable[[], Awaitable[Any]], tag: float):
+        self.key = key
+        self.run = run
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+
+
+class _Tenant:
+    def __init__(self, installation_id: int, label: str, weight: float, burst: float):
+        self.installation_id = installation_id
+        self.label = label
+        self.weight = weight
+        self.queue: Deque[_Job] = deque()
+        self.active = 0
+        self.last_tag = 0.0
+        self.tokens = burst
+        self.refilled_at = time.monotonic()
+
+
+class WebhookQueue:
+    def __init__(self, max_concurrency: int, tenant_max_concurrency: int, rate_per_minute: float,
+                 burst: int, max_queue: int, weights: Dict[str, float]):
+        self.max_concurrency = max_concurrency
+        self.tenant_max_concurrency = tenant_max_concurrency
+        self.rate = rate_per_minute / 60
+        self.burst = float(burst)
+        self.max_queue = max_queue
+        self.weights = weights
+        self._tenants: Dict[int, _Tenant] = {}
+        self._vtime = 0.0
+        self._active = 0
+        self._tasks: Set[asyncio.Task] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        metrics.gauge_fn("webhook_queue_depth", lambda: sum(len(t.queue) for t in self._tenants.values()))
+        metrics.gauge_fn("webhook_active", lambda: self._active)
+
+    def _weight(self, installation_id: int, label: str) -> float:
+        return self.weights.get(str(installation_id)) or self.weights.get(label.lower()) or 1.0
+
+    def _tenant(self, installation_id: int, label: str) -> _Tenant:
+        tenant = self._tenants.get(installation_id)
+        if tenant is None:
+            tenant = _Tenant(installation_id, label, self._weight(installation_id, label), self.burst)
+            self._tenants[installation_id] = tenant
+        return tenant
+
+    def submit(self, installation_id: int, label: str, key: Hashable, run: Callable[[], Awaitable[Any]]) -> str:
+        """Queue `run` for an installation; returns "queued" or "coalesced" """
+        if self._closed:
+            raise QueueFull("Webhook queue is shutting down")
+        tenant = self._tenant(installation_id, label)
+        for job in tenant.queue:
+            if job.key == key:
+                job.run = run  # A newer push supersedes the queued analysis
+                metrics.inc("webhook_jobs_coalesced", installation=tenant.label)
+                return "coalesced"
+        if len(tenant.queue) >= self.max_queue:
+            metrics.inc("webhook_jobs_rejected", installation=tenant.label)
+            raise QueueFull(f"Installation {installation_id} has {len(tenant.queue)} analyses queued")
+
+        tag = max(self._vtime, tenant.last_tag) + 1 / tenant.weight
+        tenant.last_tag = tag
+        tenant.queue.append(_Job(key, run, tag))
+        metrics.inc("webhook_jobs_queued", installation=tenant.label)
+        self._idle.clear()
+        self._dispatch()
+        return "queued"
+
+    def _refill(self, tenant: _Tenant, now: float):
+        if self.rate:
+            tenant.tokens = min(self.burst, tenant.tokens + (now - tenant.refilled_at) * self.rate)
+        tenant.refilled_at = now
+
+    def _evict_idle(self, now: float):
+        """Forget installations that a fresh _Tenant would describe exactly"""
+        for tenant in list(self._tenants.values()):
+            if tenant.queue or tenant.active or tenant.last_tag > self._vtime:
+                continue
+            self._refill(tenant, now)
+            if not self.rate or tenant.tokens >= self.burst:
+                self._tenants.pop(tenant.installation_id, None)
+
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency:
+            now = time.monotonic()
+            best: Optional[_Tenant] = None
+            rate_wait: Optional[float] = None
+            for tenant in self._tenants.values():
+                if not tenant.queue or tenant.active >= self.tenant_max_concurrency:
+                    continue
+                self._refill(tenant, now)
+                if self.rate and tenant.tokens < 1:
+                    wait = (1 - tenant.tokens) / self.rate
+                    rate_wait = wait if rate_wait is None else min(rate_wait, wait)
+                    continue
+                if best is None or tenant.queue[0].tag < best.queue[0].tag:
+                    best = tenant
+            if best is None:
+                if rate_wait is not None:
+                    self._schedule(rate_wait)
+                return
+            job = best.queue.popleft()
+            self._vtime = max(self._vtime, job.tag)
+            best.active += 1
+            if self.rate:
+                best.tokens -= 1
+            self._active += 1
+            task = asyncio.get_running_loop().create_task(self._run(best, job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, tenant: _Tenant, job: _Job):
+        started = time.monotonic()
+        metrics.observe("webhook_queue_wait_ms", (started - job.enqueued_at) * 1000, installation=tenant.label)
+        result = "ok"
+        try:
+            await job.run()
+        except asyncio.CancelledError:
+            result = "cancelled"
+            raise
+        except Exception as e:
+            result = "error"
+            print(f"[ERROR] Webhook job {job.key} for {tenant.label} failed: {e}")
+        finally:
+            metrics.observe("webhook_job_ms", (time.monotonic() - started) * 1000, installation=tenant.label)
+            metrics.inc("webhook_jobs_completed", installation=tenant.label, result=result)
+            tenant.active -= 1
+            self._active -= 1
+            self._evict_idle(time.monotonic())
+            self._dispatch()
+            if self._active == 0 and not any(t.queue for t in self._tenants.values()):
+                self._idle.set()
+
+    async def drain(self, timeout: float):
+        """Stop accepting jobs and wait for queued ones; cancel what is left after `timeout`"""
+        self._closed = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            dropped = sum(len(t.queue) for t in self._tenants.values())
+            print(f"[ERROR] Webhook queue drain timed out: cancelling {self._active} running, dropping {dropped} queued")
+            for tenant in self._tenants.values():
+                tenant.queue.clear()
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            tenant.label: {
+                "installation_id": tenant.installation_id,
+                "weight": tenant.weight,
+                "queued": len(tenant.queue),
+                "active": tenant.active,
+            }
+            for tenant in self._tenants.values()
+        }
+
+
+webhook_queue = WebhookQueue(
+    max_concurrency=settings.WEBHOOK_MAX_CONCURRENCY,
+    tenant_max_concurrency=settings.WEBHOOK_INSTALLATION_MAX_CONCURRENCY,
+    rate_per_minute=settings.WEBHOOK_INSTALLATION_RATE_PER_MINUTE,
+    burst=settings.WEBHOOK_INSTALLATION_BURST,
+    max_queue=settings.WEBHOOK_INSTALLATION_MAX_QUEUE,
+    weights=parse_weights(settings.INSTALLATION_WEIGHTS),
+)
@@ -0,0 +1,119 @@
+# mcp_server/admission.py
+
+"""
+Admission control for LLM-backed endpoints.
+
+Each endpoint has a cap on requests in flight and a limit on how long the
+head of its LLM lane may have been queued. Over either limit we reject at
+once, so callers can back off instead of waiting until they time out:
+  - 429 when the endpoint is at its in-flight cap
+  - 503 when the LLM queue is too slow
+Both responses carry Retry-After. The queue check uses the age of the
+oldest waiter, not the p95 of completed waits, so it clears as soon as the
+backlog drains.
+
+Use as a route dependency: `dependencies=[Depends(admit_chat)]`.
+analyze_pr uses `admit_analysis`, which sends requests marked
+`X-LLM-Lane: backfill` through their own controller and LLM lane so bulk
+backfills can't take webhook capacity.
+"""
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Header, HTTPException
+
+from common import metrics
+from mcp_server.config import settings
+from mcp_server.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND, BACKFILL
+
+LANE_HEADER = "X-LLM-Lane"
+
+
+class AdmissionController:
+    def __init__(self, endpoint: str, lane: str, max_in_flight: int, max_queue_ms: int):
+        self.endpoint = endpoint
+        self.lane = lane
+        self.max_in_flight = max_in_flight
+        self.max_queue_ms = max_queue_ms
+        self.in_flight = 0
+        metrics.gauge_fn("admission_in_flight", lambda: self.in_flight, endpoint=endpoint)
+
+    def _retry_after(self) -> int:
+        """Seconds until a retry is likely to get in: roughly the current queue wait"""
+        wait_ms = max(llm_scheduler.oldest_wait_ms(self.lane), llm_scheduler.wait_p95_ms(self.lane))
+        return max(1, math.ceil(wait_ms / 1000))
+
+    def check(self) -> Optional[Tuple[int, str]]:
+        """Return (status_code, reason) if a new request should be rejected"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return 429, "too_many_requests"
+        if self.max_queue_ms and llm_scheduler.oldest_wait_ms(self.lane) > self.max_queue_ms:
+            return 503, "llm_queue_saturated"
+        return None
+
+    async def __call__(self):
+        rejection = self.check()
+        if rejection:
+            status_code, reason = rejection
+            metrics.inc("admission_rejected", endpoint=self.endpoint, reason=reason)
+            raise HTTPException(
+                status_code=status_code,
+                detail=f"Server over capacity ({reason}), retry later",
+                headers={"Retry-After": str(self._retry_after())},
+            )
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def status(self) -> Dict[str, Any]:
+        rejection = self.check()
+        return {
+            "ready": rejection is None,
+            "reason": rejection[1] if rejection else None,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_wait_ms": round(llm_scheduler.oldest_wait_ms(self.lane), 1),
+            "max_queue_ms": self.max_queue_ms,
+        }
+
+
+admit_chat = AdmissionController(
+    "chat", INTERACTIVE,
+    max_in_flight=settings.ADMISSION_CHAT_MAX_IN_FLIGHT,
+    max_queue_ms=settings.ADMISSION_CHAT_MAX_QUEUE_MS,
+)
+admit_analyze = AdmissionController(
+    "analyze_pr", BACKGROUND,
+    max_in_flight=settings.ADMISSION_ANALYZE_MAX_IN_FLIGHT,
+    max_queue_ms=settings.ADMISSION_ANALYZE_MAX_QUEUE_MS,
+)
+admit_backfill = AdmissionController(
+    "analyze_pr_backfill", BACKFILL,
+    max_in_flight=settings.ADMISSION_BACKFILL_MAX_IN_FLIGHT,
+    max_queue_ms=settings.ADMISSION_BACKFILL_MAX_QUEUE_MS,
+)
+# A backfill backlog shouldn't take the server out of rotation
+CONTROLLERS = (admit_chat, admit_analyze)
+
+
+def analysis_lane(x_llm_lane: Optional[str] = Header(None, alias=LANE_HEADER)) -> str:
+    return BACKFILL if (x_llm_lane or "").lower() == BACKFILL else BACKGROUND
+
+
+async def admit_analysis(x_llm_lane: Optional[str] = Header(None, alias=LANE_HEADER)):
+    """analyze_pr admission: backfill requests have their own caps"""
+    controller = admit_backfill if analysis_lane(x_llm_lane) == BACKFILL else admit_analyze
+    admission = controller()
+    await admission.__anext__()  # Raises the 429/503 if rejected
+    try:
+        yield
+    finally:
+        await admission.aclose()
+
+
+def readiness() -> Dict[str, Any]:
+    endpoints = {c.endpoint: c.status() for c in CONTROLLERS}
+    return {"ready": all(e["ready"] for e in endpoints.values()), "endpoints": endpoints}
@@ -8,11 +8,100 @@ load_dotenv()  # Loads variables from a .env file in dev
 
 class Settings:
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL", "")
 
     DEFAULT_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4")
+    SMALL_MODEL: str = os.getenv("OPENAI_SMALL_MODEL", "gpt-4o-mini")
+    LONG_CONTEXT_MODEL: str = os.getenv("OPENAI_LONG_CONTEXT_MODEL", "gpt-4o")
     RULES_PATH: str = os.getenv("RULES_PATH", "mcp_server/rules.yaml")
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "")
-    
+
+    # Chat history
+    CHAT_HISTORY_LIMIT: int = int(os.getenv("CHAT_HISTORY_LIMIT", "10"))
+    CHAT_MESSAGES_PAGE_SIZE: int = int(os.getenv("CHAT_MESSAGES_PAGE_SIZE", "50"))
+    CHAT_MESSAGES_MAX_PAGE_SIZE: int = int(os.getenv("CHAT_MESSAGES_MAX_PAGE_SIZE", "200"))
+    CHAT_SESSIONS_PAGE_SIZE: int = int(os.getenv("CHAT_SESSIONS_PAGE_SIZE", "50"))
+    CHAT_SESSIONS_MAX_PAGE_SIZE: int = int(os.getenv("CHAT_SESSIONS_MAX_PAGE_SIZE", "200"))
+
+    # Full-text search over PR summaries and chat history
+    SEARCH_PAGE_SIZE: int = int(os.getenv("SEARCH_PAGE_SIZE", "20"))
+    SEARCH_MAX_PAGE_SIZE: int = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "100"))
+
+    # Chat memory: recent turns are sent verbatim up to the token budget,
+    # older turns are folded into a rolling per-session summary
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+    CHAT_SUMMARY_MIN_BATCH: int = int(os.getenv("CHAT_SUMMARY_MIN_BATCH", "4"))
+    CHAT_SUMMARY_BATCH: int = int(os.getenv("CHAT_SUMMARY_BATCH", "50"))
+    CHAT_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+
+    # Per-worker session cache and write-behind batching of chat messages
+    CHAT_CACHE_SESSIONS: int = int(os.getenv("CHAT_CACHE_SESSIONS", "1024"))
+    CHAT_WRITE_FLUSH_MS: int = int(os.getenv("CHAT_WRITE_FLUSH_MS", "50"))
+    CHAT_WRITE_MAX_BATCH: int = int(os.getenv("CHAT_WRITE_MAX_BATCH", "500"))
+    # Failed flushes keep their messages and retry with exponential backoff up to this
+    CHAT_WRITE_RETRY_MAX_SECONDS: float = float(os.getenv("CHAT_WRITE_RETRY_MAX_SECONDS", "30"))
+
+    # LLM scheduling: global and per-lane concurrency, and the provider's
+    # tokens-per-minute budget (0 disables the budget)
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_INTERACTIVE_CONCURRENCY: int = int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", "6"))
+    LLM_BACKGROUND_CONCURRENCY: int = int(os.getenv("LLM_BACKGROUND_CONCURRENCY", "4"))
+    LLM_BACKFILL_CONCURRENCY: int = int(os.getenv("LLM_BACKFILL_CONCURRENCY", "1"))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_TOKENS_PER_MINUTE", "90000"))
+    LLM_DEFAULT_COMPLETION_TOKENS: int = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", "800"))
+
+    # LLM retries and hedging. Hedged requests fire once a call outlives the
+    # observed p95 for its model and task (needs LLM_HEDGE_MIN_SAMPLES first)
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BASE_MS: int = int(os.getenv("LLM_RETRY_BASE_MS", "250"))
+    LLM_RETRY_MAX_MS: int = int(os.getenv("LLM_RETRY_MAX_MS", "4000"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+    # Admission control: in-flight caps per endpoint (429 when reached) and
+    # the longest the LLM lane's oldest request may wait (503 beyond it)
+    ADMISSION_CHAT_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_CHAT_MAX_IN_FLIGHT", "64"))
+    ADMISSION_CHAT_MAX_QUEUE_MS: int = int(os.getenv("ADMISSION_CHAT_MAX_QUEUE_MS", "5000"))
+    ADMISSION_ANALYZE_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_ANALYZE_MAX_IN_FLIGHT", "32"))
+    ADMISSION_ANALYZE_MAX_QUEUE_MS: int = int(os.getenv("ADMISSION_ANALYZE_MAX_QUEUE_MS", "20000"))
+    # analyze_pr calls sent with X-LLM-Lane: backfill; not part of /readyz
+    ADMISSION_BACKFILL_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_BACKFILL_MAX_IN_FLIGHT", "8"))
+    ADMISSION_BACKFILL_MAX_QUEUE_MS: int = int(os.getenv("ADMISSION_BACKFILL_MAX_QUEUE_MS", "120000"))
+
+    # Most of a stored diff (read by base/head SHA) that goes into a prompt
+    PR_DIFF_MAX_PROMPT_BYTES: int = int(os.getenv("PR_DIFF_MAX_PROMPT_BYTES", str(400 * 1024)))
+
+    # PR-scoped chat: BM25 over diff hunks, top-k hunks per turn within a token budget
+    PR_CONTEXT_TOP_K: int = int(os.getenv("PR_CONTEXT_TOP_K", "5"))
+    PR_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("PR_CONTEXT_TOKEN_BUDGET", "2000"))
+    PR_INDEX_CACHE_SIZE: int = int(os.getenv("PR_INDEX_CACHE_SIZE", "32"))
+    PR_INDEX_HUNK_MAX_CHARS: int = int(os.getenv("PR_INDEX_HUNK_MAX_CHARS", "4000"))
+    PR_INDEX_MAX_DIFF_BYTES: int = int(os.getenv("PR_INDEX_MAX_DIFF_BYTES", str(20 * 1024 * 1024)))
+
+    # Largest packed analyze_pr body accepted, after decompression
+    MAX_PACKED_REQUEST_BYTES: int = int(os.getenv("MAX_PACKED_REQUEST_BYTES", str(64 * 1024 * 1024)))
+
+    # Time kept back from a caller's X-Request-Deadline-Ms to send the response
+    DEADLINE_RESPONSE_MARGIN_MS: int = int(os.getenv("DEADLINE_RESPONSE_MARGIN_MS", "250"))
+
+    # Model routing: PR prompts up to this size may use SMALL_MODEL, and
+    # per-task latency targets steer away from models predicted to be slow
+    ROUTING_SMALL_PROMPT_TOKENS: int = int(os.getenv("ROUTING_SMALL_PROMPT_TOKENS", "1500"))
+    ROUTING_CHAT_TARGET_MS: int = int(os.getenv("ROUTING_CHAT_TARGET_MS", "8000"))
+    ROUTING_RULE_INTERPRETATION_TARGET_MS: int = int(os.getenv("ROUTING_RULE_INTERPRETATION_TARGET_MS", "3000"))
+    ROUTING_PR_SUMMARY_TARGET_MS: int = int(os.getenv("ROUTING_PR_SUMMARY_TARGET_MS", "30000"))
+    ROUTING_CONVERSATION_SUMMARY_TARGET_MS: int = int(os.getenv("ROUTING_CONVERSATION_SUMMARY_TARGET_MS", "15000"))
+    # A model's learned slowdown halves its distance to 1.0 every this many
+    # seconds without traffic, so a model avoided after a slow spell is retried
+    ROUTING_SLOWDOWN_HALF_LIFE_SECONDS: float = float(os.getenv("ROUTING_SLOWDOWN_HALF_LIFE_SECONDS", "300"))
+
+    # Trivial PRs (docs, lockfiles, version bumps, dependency bots) get a
+    # templated summary instead of an LLM call; comma-separated lists
+    TRIVIAL_PR_CATEGORIES: str = os.getenv(
+        "TRIVIAL_PR_CATEGORIES", "docs_only,lockfile_only,version_bump,bot_authored"
+    )
+    TRIVIAL_PR_OPT_OUT_REPOS: str = os.getenv("TRIVIAL_PR_OPT_OUT_REPOS", "")
+    TRIVIAL_VERSION_BUMP_MAX_LINES: int = int(os.getenv("TRIVIAL_VERSION_BUMP_MAX_LINES", "20"))
 
 
 settings = Settings()
@@ -0,0 +1,57 @@
+# mcp_server/deadline.py
+
+"""
+Request deadlines propagated from callers.
+
+The github bot sends the time it has left as `X-Request-Deadline-Ms`.
+We turn that into an absolute `time.monotonic()` deadline and keep
+DEADLINE_RESPONSE_MARGIN_MS back, so a fallback response still reaches
+the caller before its own timeout fires. `None` means no deadline.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+from mcp_server.config import settings
+
+DEADLINE_HEADER = "X-Request-Deadline-Ms"
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before the work finished"""
+
+
+def deadline_from_header(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        budget_ms = float(value)
+    except ValueError:
+        print(f"[ERROR] Ignoring invalid {DEADLINE_HEADER} header: {value!r}")
+        return None
+    return time.monotonic() + (budget_ms - settings.DEADLINE_RESPONSE_MARGIN_MS) / 1000
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until `deadline`, or None when there is no deadline"""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+async def within(deadline: Optional[float], awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it and raising DeadlineExceeded once `deadline` passes"""
+    left = remaining(deadline)
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded()
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded() from None
@@ -1,59 +1,238 @@
-from mcp_server.prompts import pr_summary_prompt, chat_prompt
-from openai import OpenAI
+from mcp_server.prompt_builder import (
+    build_chat_prompt, build_conversation_summary_prompt, build_pr_summary_prompt,
+    build_rule_interpretation_prompt
+)
+from mcp_server.llm_scheduler import llm_scheduler, INTERACTIVE, BACKGROUND
+from mcp_server.model_router import (
+    choose_model, record_outcome, CHAT, CONVERSATION_SUMMARY, PR_SUMMARY, RULE_INTERPRETATION
+)
+from mcp_server.deadline import DeadlineExceeded, remaining, within
+from common import metrics
+from openai import (
+    AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
+)
 from mcp_server.config import settings
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import random
+import time
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Retries are done in complete() so they can respect the caller's deadline
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY,
+    base_url=settings.OPENAI_BASE_URL or None,
+    max_retries=0,
+)
 
+# Connection errors and timeouts, 429s and 5xx responses are worth retrying
+RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
 
-def summarize_diff(title: str, description: str, diff: str) -> str:
-    prompt = pr_summary_prompt(title, description, diff)
+SUMMARY_DEADLINE_FALLBACK = "Summary unavailable: the LLM did not respond within the request deadline."
 
+
+async def _call_once(lane: str, estimate: int, prompt: Dict[str, Any], params: Dict[str, Any], deadline):
+    """One request under a scheduler slot; returns (response, ticket, latency_ms)"""
+    async with llm_scheduler.slot(lane, estimate) as ticket:
+        left = remaining(deadline)
+        if left is not None:
+            if left <= 0:
+                raise DeadlineExceeded()
+            params = {**params, "timeout": left}
+        started = time.monotonic()
+        response = await client.chat.completions.create(messages=prompt["messages"], **params)
+        latency_ms = (time.monotonic() - started) * 1000
+        if response.usage is not None:
+            ticket["actual_tokens"] = response.usage.total_tokens
+    return response, ticket, latency_ms
+
+
+def _hedge_delay(decision: Dict[str, Any]) -> Optional[float]:
+    """Seconds to wait before hedging: the observed p95 for this model and task"""
+    if not settings.LLM_HEDGE_ENABLED:
+        return None
+    latencies = metrics.get_summary("llm_latency_ms", model=decision["model"], task=decision["task"])
+    if latencies.count < settings.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return latencies.percentile(95) / 1000
+
+
+async def _call_hedged(lane: str, estimate: int, prompt: Dict[str, Any], params: Dict[str, Any],
+                       deadline, decision: Dict[str, Any]):
+    """Send a second identical request if the first outlives the p95; first success wins"""
+    delay = _hedge_delay(decision)
+    if delay is None:
+        return await _call_once(lane, estimate, prompt, params, deadline)
+
+    primary = asyncio.create_task(_call_once(lane, estimate, prompt, params, deadline))
+    pending = {primary}
     try:
-        response = client.chat.completions.create(
-            model=settings.DEFAULT_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done:
+            metrics.inc("llm_hedged_requests", model=decision["model"], task=decision["task"])
+            pending.add(asyncio.create_task(_call_once(lane, estimate, prompt, params, deadline)))
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics.inc("llm_hedge_wins", model=decision["model"], task=decision["task"])
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()  # The slower request is wasted work; stop it
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, at least as long as any Retry-After"""
+    cap = min(settings.LLM_RETRY_MAX_MS, settings.LLM_RETRY_BASE_MS * 2 ** attempt) / 1000
+    delay = random.uniform(0, cap)
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+async def complete(
+    lane: str,
+    task: str,
+    prompt: Dict[str, Any],
+    usage: Dict[str, Any] | None = None,
+    deadline: Optional[float] = None,
+    **params
+):
+    """Run one chat completion under the LLM scheduler.
+
+    `prompt` comes from prompt_builder; its token count plus max_tokens is
+    reserved against the TPM budget. Unless `model` is passed explicitly,
+    the model router picks one for `task`. Retryable errors are retried
+    with jittered backoff, and slow requests may be hedged, all within
+    `deadline` (a time.monotonic() value; see mcp_server.deadline).
+    Raises DeadlineExceeded when it passes. Scheduling and routing details
+    are added to `usage` when given.
+    """
+    max_tokens = params.get("max_tokens", settings.LLM_DEFAULT_COMPLETION_TOKENS)
+    estimate = prompt["prompt_tokens"] + max_tokens
+    if "model" in params:
+        decision = {"task": task, "model": params["model"], "reason": "explicit",
+                    "prompt_tokens": prompt["prompt_tokens"]}
+    else:
+        decision = choose_model(task, prompt["prompt_tokens"], max_tokens)
+        params["model"] = decision["model"]
+
+    attempt = 0
+    while True:
+        try:
+            response, ticket, latency_ms = await within(
+                deadline, _call_hedged(lane, estimate, prompt, params, deadline, decision)
+            )
+            break
+        except DeadlineExceeded:
+            metrics.inc("llm_deadline_exceeded", model=decision["model"], task=task)
+            raise
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            delay = _retry_delay(attempt, e)
+            left = remaining(deadline)
+            if attempt > settings.LLM_MAX_RETRIES or (left is not None and left <= delay):
+                raise
+            metrics.inc("llm_retries", model=decision["model"], error=type(e).__name__)
+            print(f"[INFO] Retrying {task} on {decision['model']} in {delay:.2f}s after {type(e).__name__}")
+            await asyncio.sleep(delay)
+
+    if response.usage is not None:
+        record_outcome(decision, latency_ms, response.usage.prompt_tokens, response.usage.completion_tokens)
+    else:
+        record_outcome(decision, latency_ms, prompt["prompt_tokens"], 0)
+    if usage is not None:
+        usage["lane"] = lane
+        usage["queue_wait_ms"] = ticket["wait_ms"]
+        usage["routing"] = decision
+        usage["retries"] = attempt
+    return response
+
+
+async def summarize_diff(
+    title: str,
+    description: str,
+    diff: str,
+    usage: Dict[str, Any] | None = None,
+    deadline: Optional[float] = None,
+    truncated_from: Optional[int] = None,
+    lane: str = BACKGROUND
+) -> str:
+    """`truncated_from` is the full diff size when `diff` is only a prefix of it"""
+    prompt = build_pr_summary_prompt(title, description, diff, truncated_from)
+
+    try:
+        response = await complete(lane, PR_SUMMARY, prompt, usage, deadline, temperature=0.3)
         return response.choices[0].message.content.strip()
+    except DeadlineExceeded:
+        print("[LLM ERROR] PR summary missed its deadline")
+        return SUMMARY_DEADLINE_FALLBACK
     except Exception as e:
         print("[LLM ERROR]", e)
         return "Summary unavailable due to LLM error."
 
 
+async def summarize_conversation(previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+    """Fold chat messages into the rolling session summary; returns "" on failure"""
+    prompt = build_conversation_summary_prompt(previous_summary, messages)
+
+    try:
+        response = await complete(
+            BACKGROUND, CONVERSATION_SUMMARY, prompt,
+            temperature=0.2,
+            max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print("[LLM ERROR] Conversation summary failed:", e)
+        return ""
+
+
 async def chat_with_llm(
     user_message: str,
     chat_history: List[Dict[str, str]],
     rules: List[Dict[str, Any]],
-    context: Dict[str, Any] = None
-) -> str:
-    """Handle chat conversations with rule management capabilities"""
+    context: Dict[str, Any] = None,
+    summary: str = "",
+    rules_version: str | None = None,
+    pr_context: str = ""
+) -> Tuple[str, Dict[str, Any]]:
+    """Handle chat conversations with rule management capabilities.
+
+    `chat_history` is the already-windowed list of recent turns and
+    `summary` the rolling summary of everything before it. `pr_context`
+    scopes the turn to a PR (see mcp_server.pr_index). Returns the reply
+    and usage details for the turn (prompt token count etc.).
+    """
     
     print(f"[DEBUG] Starting chat_with_llm")
     print(f"[DEBUG] User message: {user_message[:100]}...")
     print(f"[DEBUG] Chat history length: {len(chat_history)}")
     print(f"[DEBUG] Rules count: {len(rules)}")
+    usage: Dict[str, Any] = {"history_messages": len(chat_history), "has_summary": bool(summary)}
     
     try:
-        # Build system prompt with rules context
-        system_prompt = chat_prompt(rules)
-        print(f"[DEBUG] System prompt length: {len(system_prompt)}")
-        
-        # Prepare messages for OpenAI
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add chat history (limit to last 10 messages to avoid token limits)
-        for msg in chat_history[-10:]:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
+        # Rules context comes from the per-version cache in prompt_builder
+        prompt = build_chat_prompt(
+            user_message, chat_history, rules,
+            rules_version=rules_version, summary=summary, pr_context=pr_context
+        )
+        usage["prompt_tokens"] = prompt["prompt_tokens"]
+        usage["prefix_tokens"] = prompt["prefix_tokens"]
         
-        print(f"[DEBUG] Calling OpenAI API...")
+        print(f"[DEBUG] Calling OpenAI API with {usage['prompt_tokens']} prompt tokens...")
         
-        response = client.chat.completions.create(
-            model=settings.DEFAULT_MODEL,
-            messages=messages,
+        response = await complete(
+            INTERACTIVE, CHAT, prompt, usage,
             temperature=0.7,
             max_tokens=1000
         )
@@ -62,26 +241,31 @@ async def chat_with_llm(
         print(f"[DEBUG] OpenAI response received: {result[:100]}...")
         
         # Check if the user's message contains rule management requests and execute them
-        result = await process_rule_requests(user_message, result, rules)
+        result = await process_rule_requests(user_message, result, rules, rules_version)
         
-        return result
+        return result, usage
         
     except Exception as e:
         print(f"[ERROR] LLM CHAT ERROR: {e}")
         print(f"[ERROR] Error type: {type(e)}")
         import traceback
         print(f"[ERROR] Full traceback: {traceback.format_exc()}")
-        return "I apologize, but I'm experiencing technical difficulties. Please try again later."
+        return "I apologize, but I'm experiencing technical difficulties. Please try again later.", usage
 
 
-async def process_rule_requests(user_message: str, ai_response: str, current_rules: List[Dict[str, Any]]) -> str:
+async def process_rule_requests(
+    user_message: str,
+    ai_response: str,
+    current_rules: List[Dict[str, Any]],
+    rules_version: str | None = None
+) -> str:
     """Process rule management requests using LLM to interpret natural language"""
     from mcp_server.rule_engine import create_rule, update_rule, delete_rule, get_rule_by_id
     
     print(f"[DEBUG] Processing rule requests using LLM interpretation")
     
     # Use LLM to interpret the user's message and determine what actions to take
-    interpretation = await interpret_rule_request(user_message, current_rules)
+    interpretation = await interpret_rule_request(user_message, current_rules, rules_version)
     
     if not interpretation:
         return ai_response
@@ -140,39 +324,18 @@ async def process_rule_requests(user_message: str, ai_response: str, current_rul
     return ai_response
 
 
-async def interpret_rule_request(user_message: str, current_rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+async def interpret_rule_request(
+    user_message: str,
+    current_rules: List[Dict[str, Any]],
+    rules_version: str | None = None
+) -> List[Dict[str, Any]]:
     """Use LLM to interpret natural language rule requests"""
     
-    # Create a prompt for the LLM to interpret the request
-    rules_text = "\n".join([f"- {rule['rule_id']}: {rule.get('type', 'unknown')} type, {rule.get('reason', 'no reason')}" for rule in current_rules])
-    
-    interpretation_prompt = f"""
-You are a rule management interpreter. Based on the user's request and current rules, determine what actions need to be taken.
-
-Current rules:
-{rules_text}
-
-User request: "{user_message}"
-
-Analyze the request and return a JSON array of actions to perform. Each action should have:
-- "action": "update", "create", or "delete"
-- "rule_id": the rule identifier
-- For updates: "field" and "value" 
-- For creates: "rule_data" object with all rule fields
-- For deletes: just "rule_id"
-
-Examples:
-- User: "change file limit to 30" → [{{"action": "update", "rule_id": "max_file_limit", "field": "threshold", "value": 30}}]
-- User: "update no_env_file reason" → [{{"action": "update", "rule_id": "no_env_file", "field": "reason", "value": "new reason"}}]
-- User: "create rule for .log files" → [{{"action": "create", "rule_id": "no_log_files", "rule_data": {{"rule_id": "no_log_files", "type": "endswith", "match": ".log", "reason": "Log files should not be committed"}}}}]
-
-Return only valid JSON array, no other text.
-"""
+    prompt = build_rule_interpretation_prompt(user_message, current_rules, rules_version)
     
     try:
-        response = client.chat.completions.create(
-            model=settings.DEFAULT_MODEL,
-            messages=[{"role": "user", "content": interpretation_prompt}],
+        response = await complete(
+            INTERACTIVE, RULE_INTERPRETATION, prompt,
             temperature=0.1,
             max_tokens=500
         )
@@ -0,0 +1,187 @@
+# mcp_server/llm_scheduler.py
+
+"""
+Priority scheduling of LLM calls.
+
+Every OpenAI request runs inside `llm_scheduler.slot(lane, tokens)`. Lanes
+are served in strict priority order: interactive (chat), then background
+(PR summaries, conversation summaries), then backfill (bulk historical
+work). Each lane has its own concurrency cap under a global one, so a
+webhook burst can't take every slot. A token bucket of
+LLM_TOKENS_PER_MINUTE keeps us under the provider's TPM limit instead of
+hitting 429s. When the bucket runs dry, nothing is dispatched until the
+highest-priority waiter can afford its call, so lower lanes can't spend
+budget ahead of it.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from common import metrics
+from mcp_server.config import settings
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BACKFILL = "backfill"
+LANES = (INTERACTIVE, BACKGROUND, BACKFILL)  # highest priority first
+
+
+class _Waiter:
+    __slots__ = ("lane", "cost", "future", "enqueued_at")
+
+    def __init__(self, lane: str, cost: int, future: asyncio.Future):
+        self.lane = lane
+        self.cost = cost
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int, lane_limits: Dict[str, int], tokens_per_minute: int):
+        self.max_concurrency = max_concurrency
+        self.lane_limits = lane_limits
+        self.tokens_per_minute = tokens_per_minute
+        self._queues: Dict[str, Deque[_Waiter]] = {lane: deque() for lane in LANES}
+        self._active: Dict[str, int] = {lane: 0 for lane in LANES}
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        for lane in LANES:
+            metrics.gauge_fn("llm_queue_depth", lambda lane=lane: self.queue_depth(lane), lane=lane)
+            metrics.gauge_fn("llm_active", lambda lane=lane: self._active[lane], lane=lane)
+        metrics.gauge_fn("llm_tokens_available", self.tokens_available)
+
+    # --- Introspection -------------------------------------------------
+
+    def queue_depth(self, lane: str) -> int:
+        return sum(1 for w in self._queues[lane] if not w.future.done())
+
+    def tokens_available(self) -> Optional[float]:
+        """Remaining token budget, or None when no TPM limit is configured"""
+        self._refill()
+        return round(self._tokens, 1) if self.tokens_per_minute else None
+
+    def oldest_wait_ms(self, lane: str) -> float:
+        """How long the head of `lane` has been waiting; current, unlike the p95"""
+        now = time.monotonic()
+        for waiter in self._queues[lane]:
+            if not waiter.future.done():
+                return (now - waiter.enqueued_at) * 1000
+        return 0.0
+
+    def wait_p95_ms(self, lane: str) -> float:
+        return metrics.get_summary("llm_queue_wait_ms", lane=lane).percentile(95)
+
+    # --- Token bucket --------------------------------------------------
+
+    def _refill(self):
+        if not self.tokens_per_minute:
+            return
+        now = time.monotonic()
+        rate = self.tokens_per_minute / 60
+        self._tokens = min(self.tokens_per_minute, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _retry_later(self, deficit: float):
+        if self._timer is not None:
+            return
+        delay = deficit / (self.tokens_per_minute / 60)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    # --- Dispatch ------------------------------------------------------
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and queue[0].future.done():
+                queue.popleft()  # Cancelled while waiting
+            if queue and self._active[lane] < self.lane_limits[lane]:
+                return queue[0]
+        return None
+
+    def _dispatch(self):
+        self._refill()
+        while sum(self._active.values()) < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            if self.tokens_per_minute and self._tokens < waiter.cost:
+                self._retry_later(waiter.cost - self._tokens)
+                return
+            self._queues[waiter.lane].popleft()
+            if self.tokens_per_minute:
+                self._tokens -= waiter.cost
+            self._active[waiter.lane] += 1
+            waiter.future.set_result(None)
+
+    async def acquire(self, lane: str, tokens: int) -> float:
+        """Wait for a slot in `lane` with `tokens` of budget; returns seconds waited"""
+        if lane not in self._queues:
+            raise ValueError(f"Unknown LLM lane: {lane}")
+        cost = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else tokens
+        waiter = _Waiter(lane, cost, asyncio.get_running_loop().create_future())
+        self._queues[lane].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled; hand the slot back
+                self.release(lane, cost, None)
+            raise
+        waited = time.monotonic() - waiter.enqueued_at
+        metrics.observe("llm_queue_wait_ms", waited * 1000, lane=lane)
+        metrics.inc("llm_requests_dispatched", lane=lane)
+        return waited
+
+    def release(self, lane: str, cost: int, actual_tokens: Optional[int]):
+        self._active[lane] -= 1
+        if self.tokens_per_minute and actual_tokens is not None:
+            # Settle the estimate against what the provider actually billed
+            self._refill()
+            self._tokens -= actual_tokens - cost
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str, tokens: int):
+        """Run a block under the scheduler; set ticket["actual_tokens"] from the response"""
+        cost = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else tokens
+        waited = await self.acquire(lane, tokens)
+        ticket: Dict[str, Any] = {"lane": lane, "wait_ms": round(waited * 1000, 1), "actual_tokens": None}
+        try:
+            yield ticket
+        finally:
+            self.release(lane, cost, ticket["actual_tokens"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokens_available": self.tokens_available(),
+            "lanes": {
+                lane: {
+                    "queued": self.queue_depth(lane),
+                    "active": self._active[lane],
+                    "limit": self.lane_limits[lane],
+                    "wait_ms": metrics.get_summary("llm_queue_wait_ms", lane=lane).snapshot(),
+                }
+                for lane in LANES
+            },
+        }
+
+
+llm_scheduler = LLMScheduler(
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    lane_limits={
+        INTERACTIVE: settings.LLM_INTERACTIVE_CONCURRENCY,
+        BACKGROUND: settings.LLM_BACKGROUND_CONCURRENCY,
+        BACKFILL: settings.LLM_BACKFILL_CONCURRENCY,
+    },
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+)
@@ -1,10 +1,15 @@
 # mcp_server/main.py
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from mcp_server.routes import mcp_router
-from db.connection import init_db_pool
-from config import settings
+from mcp_server.session_cache import start_session_cache, stop_session_cache
+from mcp_server.llm_scheduler import llm_scheduler
+from common import metrics
+from mcp_server.admission import readiness
+from db.connection import init_db_pool, get_db_pool
+from mcp_server.config import settings
 
 
 app = FastAPI(title="Model Context Protocol (MCP) Server")
@@ -16,6 +21,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.include_router(mcp_router)
@@ -27,8 +33,39 @@ async def startup_event():
     print("[INFO] Initializing database pool...")
     await init_db_pool()
     print("[INFO] Database pool initialized successfully")
+    await start_session_cache()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered chat messages before the worker exits"""
+    await stop_session_cache()
 
 
 @app.get("/")
 def health_check():
     return {"status": "ok", "message": "MCP server is running"}
+
+
+@app.get("/healthz")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readiness_check():
+    """503 while the database is unavailable or an endpoint is shedding load"""
+    status = readiness()
+    try:
+        get_db_pool()
+        status["database"] = True
+    except RuntimeError:
+        status["database"] = False
+        status["ready"] = False
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """Per-worker counters, gauges and latency summaries"""
+    return {**metrics.snapshot(), "llm_scheduler": llm_scheduler.stats()}
@@ -0,0 +1,120 @@
+# mcp_server/memory.py
+
+"""
+Chat memory: a rolling per-session summary plus a token-budgeted window of
+recent turns.
+
+Each turn sends the session summary and as many of the newest
+CHAT_HISTORY_LIMIT turns as fit in CHAT_HISTORY_TOKEN_BUDGET. Every message
+outside that window (older than CHAT_HISTORY_LIMIT, or dropped because
+the budget was full) is folded into `chat_sessions.summary` by a
+background task, off the request path, so no turn is both unsent and
+unsummarized and prompt size stays bounded however long the session gets.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Set
+
+from mcp_server.config import settings
+from mcp_server.llm_client import summarize_conversation
+from mcp_server.tokens import TOKENS_PER_MESSAGE, count_tokens
+from mcp_server.session_cache import history_cache, message_writer, publish
+from db.crud import (
+    get_chat_session_summary, get_recent_chat_messages,
+    get_unsummarized_chat_messages, update_chat_session_summary
+)
+
+# Sessions with a refresh in flight, and strong refs to the tasks
+_refreshing: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def fit_history(messages: List[Dict[str, Any]], budget: int) -> List[Dict[str, str]]:
+    """Keep the newest messages whose combined token cost fits in `budget`"""
+    selected = []
+    used = 0
+    for msg in reversed(messages):
+        cost = TOKENS_PER_MESSAGE + count_tokens(msg["content"])
+        if used + cost > budget:
+            break
+        selected.append({"role": msg["role"], "content": msg["content"]})
+        used += cost
+    selected.reverse()
+    return selected
+
+
+async def load_chat_context(session_id: int) -> Dict[str, Any]:
+    """Return the session summary and the budgeted window of recent turns.
+
+    Served from the worker's session cache; on a miss, pending writes are
+    flushed and the session is loaded from the database.
+    """
+    entry = history_cache.get(session_id)
+    if entry is None:
+        await message_writer.flush()
+        state, recent = await asyncio.gather(
+            get_chat_session_summary(session_id),
+            get_recent_chat_messages(session_id, settings.CHAT_HISTORY_LIMIT),
+        )
+        entry = history_cache.put(session_id, (state or {}).get("summary") or "", recent)
+    return {
+        "summary": entry["summary"],
+        "history": fit_history(list(entry["messages"]), settings.CHAT_HISTORY_TOKEN_BUDGET),
+    }
+
+
+async def refresh_summary(session_id: int):
+    """Fold messages that have left the sent window into the session summary"""
+    await message_writer.flush()
+    state, recent = await asyncio.gather(
+        get_chat_session_summary(session_id),
+        get_recent_chat_messages(session_id, settings.CHAT_HISTORY_LIMIT),
+    )
+    if state is None:
+        return  # Session was deleted
+
+    # Keep only the turns the next request will actually send
+    keep_recent = len(fit_history(recent, settings.CHAT_HISTORY_TOKEN_BUDGET))
+    pending = await get_unsummarized_chat_messages(
+        session_id,
+        after_id=state["summary_message_id"],
+        keep_recent=keep_recent,
+        limit=settings.CHAT_SUMMARY_BATCH,
+    )
+    if len(pending) < settings.CHAT_SUMMARY_MIN_BATCH:
+        return
+
+    summary = await summarize_conversation(state["summary"] or "", pending)
+    if not summary:
+        return
+
+    updated = await update_chat_session_summary(
+        session_id,
+        summary=summary,
+        summary_message_id=pending[-1]["id"],
+        expected_message_id=state["summary_message_id"],
+    )
+    if not updated:
+        return
+    history_cache.set_summary(session_id, summary)
+    await publish("summary", [session_id])
+    print(f"[DEBUG] Folded {len(pending)} messages into summary for session {session_id}")
+
+
+def schedule_summary_refresh(session_id: int):
+    """Refresh the session summary in the background; at most one task per session"""
+    if session_id in _refreshing:
+        return
+    _refreshing.add(session_id)
+
+    async def _run():
+        try:
+            await refresh_summary(session_id)
+        except Exception as e:
+            print(f"[ERROR] Summary refresh failed for session {session_id}: {e}")
+        finally:
+            _refreshing.discard(session_id)
+
+    task = asyncio.create_task(_run())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
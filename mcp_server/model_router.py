@@ -0,0 +1,153 @@
+# mcp_server/model_router.py
+
+"""
+Per-call model selection.
+
+Each LLM call names its task (chat, rule_interpretation, pr_summary,
+conversation_summary). The router walks that task's preference list and
+picks the first model that:
+  1. fits the prompt plus reserved completion in its context window, and
+  2. is predicted to answer within the task's latency target.
+If no preferred model meets the target, it picks the fastest model that
+fits. Predictions start from the static profile below. Each profile is
+scaled by a slowdown factor learned from observed latencies, so the
+router adapts when a model gets slow. Only the model that served a call
+learns from it, so the factor decays back toward 1.0 with a half-life of
+ROUTING_SLOWDOWN_HALF_LIFE_SECONDS; a model avoided after a slow spell is
+eventually predicted on target again and gets traffic to learn from.
+
+Every decision is returned as a dict. The caller attaches it to the
+request's usage metadata. Latency and estimated cost are recorded per
+model and task in metrics.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, List, Tuple
+
+from common import metrics
+from mcp_server.config import settings
+
+CHAT = "chat"
+RULE_INTERPRETATION = "rule_interpretation"
+PR_SUMMARY = "pr_summary"
+CONVERSATION_SUMMARY = "conversation_summary"
+
+# context_tokens, base_ms, ms_per_1k_prompt, usd_per_1k_prompt, usd_per_1k_completion
+DEFAULT_PROFILES: Dict[str, Dict[str, float]] = {
+    "gpt-4o-mini": {"context_tokens": 128000, "base_ms": 400, "ms_per_1k": 60,
+                    "usd_per_1k_prompt": 0.00015, "usd_per_1k_completion": 0.0006},
+    "gpt-4o": {"context_tokens": 128000, "base_ms": 700, "ms_per_1k": 120,
+               "usd_per_1k_prompt": 0.0025, "usd_per_1k_completion": 0.01},
+    "gpt-4": {"context_tokens": 8192, "base_ms": 1500, "ms_per_1k": 400,
+              "usd_per_1k_prompt": 0.03, "usd_per_1k_completion": 0.06},
+}
+UNKNOWN_PROFILE = {"context_tokens": 8192, "base_ms": 1000, "ms_per_1k": 300,
+                   "usd_per_1k_prompt": 0.0, "usd_per_1k_completion": 0.0}
+
+EWMA_ALPHA = 0.2
+
+
+def _load_profiles() -> Dict[str, Dict[str, float]]:
+    profiles = {name: dict(p) for name, p in DEFAULT_PROFILES.items()}
+    override = os.getenv("MODEL_PROFILES_JSON", "")
+    if override:
+        try:
+            for name, profile in json.loads(override).items():
+                profiles[name] = {**UNKNOWN_PROFILE, **profiles.get(name, {}), **profile}
+        except ValueError as e:
+            print(f"[ERROR] Ignoring invalid MODEL_PROFILES_JSON: {e}")
+    return profiles
+
+
+PROFILES = _load_profiles()
+_slowdown: Dict[str, Tuple[float, float]] = {}  # model -> (factor, monotonic time it was learned)
+
+
+def _preferences(task: str, prompt_tokens: int) -> List[str]:
+    small, default, long = settings.SMALL_MODEL, settings.DEFAULT_MODEL, settings.LONG_CONTEXT_MODEL
+    if task in (RULE_INTERPRETATION, CONVERSATION_SUMMARY):
+        return [small, default, long]
+    if task == PR_SUMMARY and prompt_tokens <= settings.ROUTING_SMALL_PROMPT_TOKENS:
+        return [small, default, long]
+    return [default, long]
+
+
+def _latency_target_ms(task: str) -> float:
+    return {
+        CHAT: settings.ROUTING_CHAT_TARGET_MS,
+        RULE_INTERPRETATION: settings.ROUTING_RULE_INTERPRETATION_TARGET_MS,
+        PR_SUMMARY: settings.ROUTING_PR_SUMMARY_TARGET_MS,
+        CONVERSATION_SUMMARY: settings.ROUTING_CONVERSATION_SUMMARY_TARGET_MS,
+    }.get(task, settings.ROUTING_CHAT_TARGET_MS)
+
+
+def profile(model: str) -> Dict[str, float]:
+    return PROFILES.get(model, UNKNOWN_PROFILE)
+
+
+def slowdown(model: str) -> float:
+    """Learned latency factor for `model`, decayed toward 1.0 since it was last updated"""
+    factor, learned_at = _slowdown.get(model, (1.0, 0.0))
+    half_life = settings.ROUTING_SLOWDOWN_HALF_LIFE_SECONDS
+    if factor == 1.0 or half_life <= 0:
+        return factor
+    return 1.0 + (factor - 1.0) * 0.5 ** ((time.monotonic() - learned_at) / half_life)
+
+
+def predict_latency_ms(model: str, prompt_tokens: int) -> float:
+    p = profile(model)
+    return slowdown(model) * (p["base_ms"] + p["ms_per_1k"] * prompt_tokens / 1000)
+
+
+def choose_model(task: str, prompt_tokens: int, max_output_tokens: int) -> Dict[str, Any]:
+    """Pick a model for one call and explain why"""
+    target = _latency_target_ms(task)
+    needed = prompt_tokens + max_output_tokens
+    candidates = list(dict.fromkeys(_preferences(task, prompt_tokens)))  # dedupe, keep order
+    fitting = [m for m in candidates if profile(m)["context_tokens"] >= needed]
+
+    if not fitting:
+        model, reason = settings.LONG_CONTEXT_MODEL, "context_overflow"
+    else:
+        on_target = [m for m in fitting if predict_latency_ms(m, prompt_tokens) <= target]
+        if on_target:
+            model = on_target[0]
+        else:
+            model = min(fitting, key=lambda m: predict_latency_ms(m, prompt_tokens))
+        if model == candidates[0]:
+            reason = "preferred"
+        elif candidates[0] not in fitting:
+            reason = "context_window"
+        else:
+            reason = "latency_target"
+
+    return {
+        "task": task,
+        "model": model,
+        "reason": reason,
+        "prompt_tokens": prompt_tokens,
+        "predicted_ms": round(predict_latency_ms(model, prompt_tokens)),
+        "target_ms": target,
+    }
+
+
+def record_outcome(decision: Dict[str, Any], latency_ms: float, prompt_tokens: int, completion_tokens: int):
+    """Learn from an observed call and record its latency and estimated cost"""
+    model, task = decision["model"], decision["task"]
+    p = profile(model)
+    baseline = p["base_ms"] + p["ms_per_1k"] * prompt_tokens / 1000
+    if baseline > 0:
+        ratio = latency_ms / baseline
+        _slowdown[model] = ((1 - EWMA_ALPHA) * slowdown(model) + EWMA_ALPHA * ratio, time.monotonic())
+
+    cost = (prompt_tokens * p["usd_per_1k_prompt"] + completion_tokens * p["usd_per_1k_completion"]) / 1000
+    decision["latency_ms"] = round(latency_ms)
+    decision["cost_usd"] = round(cost, 6)
+
+    metrics.observe("llm_latency_ms", latency_ms, model=model, task=task)
+    metrics.inc("llm_requests", model=model, task=task, reason=decision["reason"])
+    metrics.inc("llm_prompt_tokens", prompt_tokens, model=model)
+    metrics.inc("llm_completion_tokens", completion_tokens, model=model)
+    metrics.inc("llm_cost_usd", cost, model=model)
@@ -20,7 +20,12 @@ class UserInfo(BaseModel):
 class AnalyzeRequest(BaseModel):
     title: str
     description: Optional[str] = ""
-    diff: str
+    diff: str = ""  # May be empty when base_sha/head_sha point at a stored diff
+    diff_truncated: bool = False  # diff is a prefix of a larger one
+    diff_size: Optional[int] = None  # bytes in the full diff, when known
+    base_sha: Optional[str] = None
+    head_sha: Optional[str] = None
+    summarize: bool = True  # False: rule checks only, no LLM summary
     files: List[FileEntry]
     repo_full_name: str
     pr_number: int
@@ -36,6 +41,7 @@ class RuleViolation(BaseModel):
 class AnalyzeResponse(BaseModel):
     summary: str
     rule_violations: List[RuleViolation]
+    metadata: Optional[dict] = None
 
 
 # Chat models
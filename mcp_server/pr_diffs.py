@@ -0,0 +1,43 @@
+# mcp_server/pr_diffs.py
+
+"""
+Read access to stored PR diffs (db/diff_store.py) for the MCP server.
+
+The github bot sends only repo_full_name, base_sha and head_sha (with an
+empty diff) when the diff is already in the shared store; the diff is then
+read from there. Reads stop at `max_bytes`, cut at a hunk boundary.
+"""
+
+from typing import Optional, Tuple
+
+from db.diff_store import get_diff_store, hunk_boundary
+from common import metrics
+
+
+async def load_diff_text(repo_full_name: str, base_sha: str, head_sha: str,
+                         max_bytes: int) -> Optional[Tuple[str, bool]]:
+    """Return (diff text, truncated), or None when the diff isn't stored"""
+    buf = bytearray()
+    truncated = False
+
+    def write(chunk: bytes):
+        nonlocal truncated
+        room = max_bytes - len(buf)
+        if len(chunk) > room:
+            buf.extend(chunk[:room + 1])  # One byte over, so the cut below sees a full hunk
+            truncated = True
+            return False
+        buf.extend(chunk)
+
+    store = get_diff_store()
+    try:
+        found = await store.load(repo_full_name, base_sha, head_sha, write)
+    except Exception as e:
+        print(f"[ERROR] Diff store read failed: {e}")
+        found = False
+    metrics.inc("diff_store_lookups", backend=store.backend, result="hit" if found else "miss")
+    if not found:
+        return None
+
+    end = hunk_boundary(buf, max_bytes) if truncated else len(buf)
+    return buf[:end].decode("utf-8", errors="replace"), truncated
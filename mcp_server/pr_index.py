@@ -0,0 +1,206 @@
+# mcp_server/pr_index.py
+
+"""
+PR-scoped retrieval for chat.
+
+When a chat request's context names a PR ({"repo_full_name", "pr_number"}),
+its diff is split into hunks and indexed with BM25. The diff comes from the
+diff store, and the PR's stored summary and commit SHAs from pr_summary.
+Each chat turn then injects only the top-k hunks for the user's message,
+within PR_CONTEXT_TOKEN_BUDGET, so prompt size does not grow with the PR.
+
+Indexes are immutable for a given (repo, base_sha, head_sha). They are
+built once in a worker thread and kept in a per-worker LRU of
+PR_INDEX_CACHE_SIZE entries; concurrent requests share one build.
+"""
+
+import asyncio
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from db.crud import get_pr_summary
+from common import metrics
+from mcp_server.config import settings
+from mcp_server.pr_diffs import load_diff_text
+from mcp_server.prompts import pr_chat_context
+from mcp_server.tokens import count_tokens
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9]*|\d+")
+_CAMEL = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were "
+    "what when where which who why will with does do did how can i you we self none true false "
+    "return if else def class import".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words; snake_case is split into its parts, camelCase is kept whole and split"""
+    terms = []
+    for word in _WORD.findall(text.replace("_", " ")):
+        lower = word.lower()
+        if lower not in _STOPWORDS and len(lower) > 1:
+            terms.append(lower)
+        parts = _CAMEL.findall(word)
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts if len(p) > 1 and p.lower() not in _STOPWORDS)
+    return terms
+
+
+def split_hunks(diff: str, max_chars: int) -> List[Dict[str, str]]:
+    """Split a unified diff into {"file", "text"} hunks of at most `max_chars`"""
+    hunks: List[Dict[str, str]] = []
+    current_file = ""
+    lines: List[str] = []
+
+    def flush():
+        if not lines:
+            return
+        text = "\n".join(lines)
+        for start in range(0, len(text), max_chars):
+            hunks.append({"file": current_file, "text": text[start:start + max_chars]})
+        lines.clear()
+
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            flush()
+            current_file = line.rsplit(" b/", 1)[-1]
+        elif line.startswith("@@"):
+            flush()
+            lines.append(line)
+        elif lines:
+            lines.append(line)
+    flush()
+    return hunks
+
+
+class BM25Index:
+    def __init__(self, docs: List[Dict[str, str]]):
+        self.docs = docs
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: List[int] = []
+        for doc_id, doc in enumerate(docs):
+            terms = tokenize(doc["file"]) + tokenize(doc["text"])
+            self._lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self._postings.setdefault(term, []).append((doc_id, tf))
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int) -> List[Tuple[float, Dict[str, str]]]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_id, tf in postings:
+                norm = 1 - BM25_B + BM25_B * self._lengths[doc_id] / (self._avg_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(score, self.docs[doc_id]) for doc_id, score in ranked]
+
+
+# (repo, base_sha, head_sha) -> index, or a future while it is being built
+_indexes: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+
+
+async def _build_index(repo_full_name: str, base_sha: str, head_sha: str) -> Optional[BM25Index]:
+    stored = await load_diff_text(repo_full_name, base_sha, head_sha, settings.PR_INDEX_MAX_DIFF_BYTES)
+    if stored is None:
+        return None
+    diff, _ = stored
+    return await asyncio.to_thread(
+        lambda: BM25Index(split_hunks(diff, settings.PR_INDEX_HUNK_MAX_CHARS))
+    )
+
+
+async def get_pr_index(repo_full_name: str, base_sha: str, head_sha: str) -> Tuple[Optional[BM25Index], bool]:
+    """Return (index or None if the diff isn't stored, whether it was cached)"""
+    key = (repo_full_name, base_sha, head_sha)
+    entry = _indexes.get(key)
+    if isinstance(entry, BM25Index):
+        _indexes.move_to_end(key)
+        metrics.inc("pr_index_lookups", result="hit")
+        return entry, True
+    if entry is not None:
+        return await asyncio.shield(entry), True  # Another request is building it
+
+    metrics.inc("pr_index_lookups", result="miss")
+    future = asyncio.get_running_loop().create_future()
+    _indexes[key] = future
+    try:
+        index = await _build_index(repo_full_name, base_sha, head_sha)
+    except BaseException as e:
+        _indexes.pop(key, None)
+        if isinstance(e, asyncio.CancelledError):
+            # Our caller went away, not theirs: waiters carry on without PR context
+            future.set_result(None)
+        else:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved; waiters re-raise it themselves
+        raise
+    if index is None:
+        _indexes.pop(key, None)  # Not stored yet; try again next time
+    else:
+        _indexes[key] = index
+        while len(_indexes) > settings.PR_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    future.set_result(index)
+    return index, False
+
+
+def select_hunks(index: BM25Index, query: str) -> List[Dict[str, str]]:
+    """Top-k hunks for `query` that fit PR_CONTEXT_TOKEN_BUDGET"""
+    selected, used = [], 0
+    for _, hunk in index.search(query, settings.PR_CONTEXT_TOP_K):
+        tokens = count_tokens(hunk["text"])
+        if used + tokens > settings.PR_CONTEXT_TOKEN_BUDGET:
+            continue
+        selected.append(hunk)
+        used += tokens
+    return selected
+
+
+async def build_pr_context(context: Dict[str, Any], query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Render the PR block for a chat turn; returns (text, metadata) or None if no PR is referenced"""
+    repo_full_name = context.get("repo_full_name")
+    pr_number = context.get("pr_number")
+    if not repo_full_name or pr_number is None:
+        return None
+
+    pr = await get_pr_summary(repo_full_name, int(pr_number))
+    base_sha = context.get("base_sha") or (pr or {}).get("base_sha")
+    head_sha = context.get("head_sha") or (pr or {}).get("head_sha")
+
+    hunks: List[Dict[str, str]] = []
+    cached = False
+    diff_available = False
+    if base_sha and head_sha:
+        index, cached = await get_pr_index(repo_full_name, base_sha, head_sha)
+        if index is not None:
+            diff_available = True
+            hunks = select_hunks(index, query)
+
+    text = pr_chat_context(
+        repo_full_name, int(pr_number),
+        title=(pr or {}).get("title") or "",
+        summary=(pr or {}).get("summary_text") or "",
+        hunks=hunks,
+        diff_available=diff_available,
+    )
+    return text, {
+        "repo_full_name": repo_full_name,
+        "pr_number": int(pr_number),
+        "hunks": len(hunks),
+        "diff_available": diff_available,
+        "index_cached": cached,
+    }
@@ -0,0 +1,122 @@
+# mcp_server/prompt_builder.py
+
+"""
+Prompt assembly for every LLM call the server makes.
+
+Anything derived from the rules (the markdown block in the chat system
+prompt, the compact listing for rule interpretation, and their token
+counts) is rendered once per rules version and cached. Prompts are laid
+out so the leading system message is byte-identical for every call under
+the same rules version. Per-turn content (conversation summary, history,
+the user's message) always comes after it, so provider-side prefix
+caching can reuse the prefix.
+
+Every builder returns {"messages": [...], "prompt_tokens": int,
+"prefix_tokens": int}.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from mcp_server.prompts import (
+    PR_SUMMARY_INSTRUCTIONS, chat_prompt, conversation_summary_context,
+    conversation_summary_prompt, pr_summary_request, render_rules_compact, rule_interpreter_prompt,
+    rule_interpreter_request
+)
+from mcp_server.tokens import TOKENS_PER_MESSAGE, count_message_tokens, count_tokens
+
+# rules version -> {"chat": str, "chat_tokens": int, "interpreter": str, ...}
+_rendered: Dict[str, Dict[str, Any]] = {}
+_MAX_VERSIONS = 8
+
+
+def rules_fingerprint(rules: List[Dict[str, Any]]) -> str:
+    """Version for rules that did not come from rule_engine.get_rules_snapshot()"""
+    raw = json.dumps(rules, sort_keys=True, default=str).encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def rendered_rules(rules: List[Dict[str, Any]], rules_version: Optional[str] = None) -> Dict[str, Any]:
+    """Return the cached system prompts rendered from `rules`"""
+    version = rules_version or rules_fingerprint(rules)
+    entry = _rendered.get(version)
+    if entry is None:
+        chat_system = chat_prompt(rules)
+        interpreter_system = rule_interpreter_prompt(render_rules_compact(rules))
+        entry = {
+            "version": version,
+            "chat": chat_system,
+            "chat_tokens": _system_tokens(chat_system),
+            "interpreter": interpreter_system,
+            "interpreter_tokens": _system_tokens(interpreter_system),
+        }
+        if len(_rendered) >= _MAX_VERSIONS:
+            _rendered.pop(next(iter(_rendered)))
+        _rendered[version] = entry
+    return entry
+
+
+def _system_tokens(content: str) -> int:
+    return TOKENS_PER_MESSAGE + count_tokens(content)
+
+
+_PR_SUMMARY_PREFIX_TOKENS = _system_tokens(PR_SUMMARY_INSTRUCTIONS)
+
+
+def _prompt(messages: List[Dict[str, str]], prefix_tokens: int, **extra) -> Dict[str, Any]:
+    """Package messages; the leading system message's tokens are precomputed"""
+    rest = messages[1:] if prefix_tokens else messages
+    return {
+        "messages": messages,
+        "prompt_tokens": prefix_tokens + count_message_tokens(rest),
+        "prefix_tokens": prefix_tokens,
+        **extra,
+    }
+
+
+def build_chat_prompt(
+    user_message: str,
+    history: List[Dict[str, str]],
+    rules: List[Dict[str, Any]],
+    rules_version: Optional[str] = None,
+    summary: str = "",
+    pr_context: str = "",
+) -> Dict[str, Any]:
+    rendered = rendered_rules(rules, rules_version)
+    messages = [{"role": "system", "content": rendered["chat"]}]
+    if pr_context:
+        messages.append({"role": "system", "content": pr_context})
+    if summary:
+        messages.append({"role": "system", "content": conversation_summary_context(summary)})
+    messages.extend({"role": m["role"], "content": m["content"]} for m in history)
+    messages.append({"role": "user", "content": user_message})
+    return _prompt(messages, rendered["chat_tokens"], rules_version=rendered["version"])
+
+
+def build_rule_interpretation_prompt(
+    user_message: str,
+    rules: List[Dict[str, Any]],
+    rules_version: Optional[str] = None,
+) -> Dict[str, Any]:
+    rendered = rendered_rules(rules, rules_version)
+    messages = [
+        {"role": "system", "content": rendered["interpreter"]},
+        {"role": "user", "content": rule_interpreter_request(user_message)},
+    ]
+    return _prompt(messages, rendered["interpreter_tokens"], rules_version=rendered["version"])
+
+
+def build_pr_summary_prompt(
+    title: str, description: str, diff: str, truncated_from: Optional[int] = None
+) -> Dict[str, Any]:
+    messages = [
+        {"role": "system", "content": PR_SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": pr_summary_request(title, description, diff, truncated_from)},
+    ]
+    return _prompt(messages, _PR_SUMMARY_PREFIX_TOKENS)
+
+
+def build_conversation_summary_prompt(previous_summary: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    prompt = [{"role": "user", "content": conversation_summary_prompt(previous_summary, messages)}]
+    return _prompt(prompt, 0)
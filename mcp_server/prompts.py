@@ -1,13 +1,8 @@
 # mcp_server/prompts.py
 
-def pr_summary_prompt(title: str, description: str, diff: str) -> str:
-    return f"""
+PR_SUMMARY_INSTRUCTIONS = """
 Act as a Staff Engineer and write a **concise, point-wise** PR summary (5-7 bullets) that gives enough context without fluff:
 
-Title: {title}
-Description: {description}
-
-
 - **Goal:** One-line description of the problem or feature  
 - **Key Changes:** List the main modules/files and what was added or modified  
 - **Impact:** Note architecture, performance, or backward-compatibility effects  
@@ -15,30 +10,47 @@ Description: {description}
 - **Testing:** Briefly state what tests were added or need manual validation  
 
 Use clear, professional language and keep it short—just enough detail for reviewers to understand the scope and importance.  
+"""
 
 
---- BEGIN DIFF ---
+def pr_summary_request(title: str, description: str, diff: str, truncated_from: int | None = None) -> str:
+    """`truncated_from` is set when `diff` is only a prefix: the full size in bytes, or 0 if unknown"""
+    note = ""
+    if truncated_from is not None:
+        of_size = f" of about {truncated_from} bytes" if truncated_from else ""
+        note = (f"Note: the diff is truncated to its first {len(diff)} characters{of_size}. "
+                "Summarize what is shown and say the PR is larger.\n\n")
+    return f"""Title: {title}
+Description: {description}
+
+{note}--- BEGIN DIFF ---
 {diff}
 --- END DIFF ---
 """
 
 
+def render_rules_markdown(rules: list) -> str:
+    """Render rules as the markdown block embedded in the chat system prompt"""
+    if not rules:
+        return ""
+    lines = []
+    for rule in rules:
+        rule_type = rule.get("type", "unknown")
+        match = rule.get("match", "")
+        threshold = rule.get("threshold", "")
+        reason = rule.get("reason", "")
+
+        if rule_type == "global":
+            lines.append(f"• **{rule['rule_id']}**: {reason} (threshold: {threshold})\n")
+        else:
+            lines.append(f"• **{rule['rule_id']}**: {reason} (type: {rule_type}, match: {match})\n")
+    return "\n\n**Current Rules:**\n" + "".join(lines)
+
+
 def chat_prompt(rules: list) -> str:
     """Generate system prompt for chat with rule management capabilities"""
     
-    rules_text = ""
-    if rules:
-        rules_text = "\n\n**Current Rules:**\n"
-        for rule in rules:
-            rule_type = rule.get("type", "unknown")
-            match = rule.get("match", "")
-            threshold = rule.get("threshold", "")
-            reason = rule.get("reason", "")
-            
-            if rule_type == "global":
-                rules_text += f"• **{rule['rule_id']}**: {reason} (threshold: {threshold})\n"
-            else:
-                rules_text += f"• **{rule['rule_id']}**: {reason} (type: {rule_type}, match: {match})\n"
+    rules_text = render_rules_markdown(rules)
     
     return f"""You are an AI assistant for a GitHub bot that helps with code review and rule management. You have access to the current rules and can help users understand, create, update, and delete rules.
 
@@ -69,3 +81,83 @@ When helping with rule management:
 {rules_text}
 
 Please be helpful, professional, and concise in your responses. Format your responses nicely with markdown when showing rules or creating structured content."""
+
+
+def conversation_summary_prompt(previous_summary: str, messages: list) -> str:
+    """Prompt for folding older chat turns into the rolling session summary"""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    return f"""You maintain the running memory of a conversation between a user and a code review assistant.
+
+Update the summary below with the new messages. Keep decisions, rule changes (rule ids and values), open questions and user preferences. Drop greetings and filler. Write at most 250 words of plain bullet points.
+
+--- CURRENT SUMMARY ---
+{previous_summary or "(empty)"}
+--- END SUMMARY ---
+
+--- NEW MESSAGES ---
+{transcript}
+--- END MESSAGES ---
+
+Return only the updated summary."""
+
+
+def conversation_summary_context(summary: str) -> str:
+    """System message carrying the rolling summary into a chat turn"""
+    return f"Summary of the earlier conversation in this session:\n{summary}"
+
+
+def pr_chat_context(repo_full_name: str, pr_number: int, title: str, summary: str,
+                    hunks: list, diff_available: bool) -> str:
+    """System message scoping a chat turn to one PR: its summary and the retrieved hunks"""
+    parts = [f"This conversation is about pull request {repo_full_name}#{pr_number}"
+             + (f": {title}" if title else "") + "."]
+    if summary:
+        parts.append(f"Stored summary of the PR:\n{summary}")
+    if hunks:
+        rendered = "\n\n".join(f"File: {h['file']}\n```diff\n{h['text']}\n```" for h in hunks)
+        parts.append(
+            "Diff hunks most relevant to the user's latest message (an excerpt, not the full diff):\n"
+            + rendered
+        )
+    elif diff_available:
+        parts.append("No part of the diff matched the user's latest message; answer from the summary "
+                     "or ask which file or change they mean.")
+    else:
+        parts.append("The diff for this PR is not available, only the summary above.")
+    return "\n\n".join(parts)
+
+
+def render_rules_compact(rules: list) -> str:
+    """Render rules as the one-line-per-rule listing used for rule interpretation"""
+    return "\n".join(
+        f"- {rule['rule_id']}: {rule.get('type', 'unknown')} type, {rule.get('reason', 'no reason')}"
+        for rule in rules
+    )
+
+
+def rule_interpreter_prompt(rules_text: str) -> str:
+    """System prompt for turning a chat message into rule management actions"""
+    return f"""
+You are a rule management interpreter. Based on the user's request and current rules, determine what actions need to be taken.
+
+Current rules:
+{rules_text}
+
+Analyze the request and return a JSON array of actions to perform. Each action should have:
+- "action": "update", "create", or "delete"
+- "rule_id": the rule identifier
+- For updates: "field" and "value" 
+- For creates: "rule_data" object with all rule fields
+- For deletes: just "rule_id"
+
+Examples:
+- User: "change file limit to 30" → [{{"action": "update", "rule_id": "max_file_limit", "field": "threshold", "value": 30}}]
+- User: "update no_env_file reason" → [{{"action": "update", "rule_id": "no_env_file", "field": "reason", "value": "new reason"}}]
+- User: "create rule for .log files" → [{{"action": "create", "rule_id": "no_log_files", "rule_data": {{"rule_id": "no_log_files", "type": "endswith", "match": ".log", "reason": "Log files should not be committed"}}}}]
+
+Return only valid JSON array, no other text.
+"""
+
+
+def rule_interpreter_request(user_message: str) -> str:
+    return f'User request: "{user_message}"'
@@ -1,6 +1,6 @@
 # mcp_server/routes.py
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from mcp_server.models import (
     AnalyzeRequest, AnalyzeResponse, ChatRequest, ChatResponse, 
     ChatSession, Rule, RuleCreateRequest, RuleUpdateRequest, 
@@ -8,34 +8,112 @@ from mcp_server.models import (
 )
 from mcp_server.llm_client import summarize_diff, chat_with_llm
 from mcp_server.rule_engine import (
-    run_static_checks, get_all_rules, create_rule, 
+    run_static_checks, get_all_rules, get_rules_snapshot, create_rule, 
     update_rule, delete_rule
 )
+from mcp_server.admission import admit_analysis, admit_chat, analysis_lane
+from mcp_server.deadline import DEADLINE_HEADER, deadline_from_header
+from mcp_server.pr_diffs import load_diff_text
+from mcp_server.pr_index import build_pr_context
+from mcp_server.transport import decode_body, UnsupportedEncoding
+from mcp_server.triage import classify_pr, trivial_summary
+from mcp_server.config import settings
+from common import metrics
+from mcp_server.memory import load_chat_context, schedule_summary_refresh
+from mcp_server.session_cache import (
+    history_cache, message_writer, record_message, forget_session
+)
 from db.crud import (
-    create_chat_session, add_chat_message, get_chat_sessions, 
-    get_chat_messages, delete_chat_session
+    create_chat_session, get_chat_sessions_page,
+    get_chat_messages_page, delete_chat_session,
+    search_pr_summaries, search_chat_messages
 )
-from typing import List
+from typing import List, Optional
+import asyncio
 
 mcp_router = APIRouter()
 
 
-@mcp_router.post("/analyze_pr", response_model=AnalyzeResponse)
-async def analyze_pr(payload: AnalyzeRequest):
+@mcp_router.post("/analyze_pr", response_model=AnalyzeResponse, dependencies=[Depends(admit_analysis)])
+async def analyze_pr(
+    payload: AnalyzeRequest,
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+    lane: str = Depends(analysis_lane)
+):
+    return await _analyze(payload, deadline_from_header(deadline_ms), lane)
+
+
+@mcp_router.post("/analyze_pr/packed", response_model=AnalyzeResponse, dependencies=[Depends(admit_analysis)])
+async def analyze_pr_packed(
+    request: Request,
+    deadline_ms: Optional[str] = Header(None, alias=DEADLINE_HEADER),
+    lane: str = Depends(analysis_lane)
+):
+    """analyze_pr for gzip/zstd-compressed JSON or msgpack bodies (see mcp_server.transport)"""
+    body = await request.body()
+    try:
+        data = decode_body(body, request.headers.get("content-encoding"), request.headers.get("content-type"))
+    except UnsupportedEncoding as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid request body: {e}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Request body must be an object")
+
+    try:
+        payload = AnalyzeRequest(**data)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return await _analyze(payload, deadline_from_header(deadline_ms), lane)
+
+
+async def _analyze(payload: AnalyzeRequest, deadline: Optional[float], lane: str) -> AnalyzeResponse:
+    if not payload.diff and payload.base_sha and payload.head_sha:
+        stored = await load_diff_text(
+            payload.repo_full_name, payload.base_sha, payload.head_sha, settings.PR_DIFF_MAX_PROMPT_BYTES
+        )
+        if stored:
+            payload.diff, payload.diff_truncated = stored
+
     # Run static rule checks (e.g., .env, .sql, file limits)
     rule_violations = run_static_checks(payload.files)
+    if not payload.summarize:
+        return AnalyzeResponse(summary="", rule_violations=rule_violations, metadata={"summarized": False})
+
+    # Trivial PRs get a templated summary without an LLM call
+    category = classify_pr(
+        payload.files, payload.user.login, payload.repo_full_name, payload.diff, payload.diff_truncated
+    )
+    if category:
+        metrics.inc("llm_calls_skipped", category=category)
+        print(f"[INFO] PR {payload.repo_full_name}#{payload.pr_number} triaged as {category}")
+        return AnalyzeResponse(
+            summary=trivial_summary(category, payload.title, payload.files, payload.user.login),
+            rule_violations=rule_violations,
+            metadata={"triage": category}
+        )
 
     # Get summary from LLM based on title, description, diff
-    summary = summarize_diff(payload.title, payload.description, payload.diff)
+    usage = {}
+    metrics.observe("analyze_pr_diff_bytes", payload.diff_size or len(payload.diff))
+    truncated_from = (payload.diff_size or 0) if payload.diff_truncated else None
+    summary = await summarize_diff(
+        payload.title, payload.description, payload.diff, usage, deadline, truncated_from, lane
+    )
+    routing = usage.get("routing")
+    if routing:
+        print(f"[INFO] PR {payload.repo_full_name}#{payload.pr_number} summarized by "
+              f"{routing['model']} ({routing['reason']}, {routing.get('latency_ms')}ms)")
 
     return AnalyzeResponse(
         summary=summary,
-        rule_violations=rule_violations
+        rule_violations=rule_violations,
+        metadata=usage or None
     )
 
 
 # Chat routes
-@mcp_router.post("/chat", response_model=ChatResponse)
+@mcp_router.post("/chat", response_model=ChatResponse, dependencies=[Depends(admit_chat)])
 async def chat(request: ChatRequest):
     """Handle chat messages and return AI response"""
     print(f"[DEBUG] Chat request received: {request}")
@@ -44,6 +122,7 @@ async def chat(request: ChatRequest):
         if not request.session_id:
             print(f"[DEBUG] Creating new session for user: {request.user_id}")
             session_id = await create_chat_session(request.user_id)
+            history_cache.put(session_id, "", [])
             print(f"[DEBUG] Created session with ID: {session_id}")
         else:
             session_id = request.session_id
@@ -51,8 +130,9 @@ async def chat(request: ChatRequest):
 
         # Get current rules for context (needed for both new session and normal chat)
         print(f"[DEBUG] Fetching rules")
-        rules = get_all_rules()
+        rules_version, rules = get_rules_snapshot()
         print(f"[DEBUG] Found {len(rules)} rules")
+        response_metadata = {"rules_accessed": len(rules)}
 
         # Check if this is a new session creation request
         if request.context and request.context.get("action") == "new_session":
@@ -60,49 +140,53 @@ async def chat(request: ChatRequest):
             print(f"[DEBUG] New session creation - skipping initial message")
             ai_response = "Hello! I'm ready to help you with rule management and code review questions."
         else:
-            # Add user message to database for normal conversations
-            print(f"[DEBUG] Adding user message to database")
-            await add_chat_message(
+            # Load memory before storing the new message so it isn't sent twice;
+            # PR-scoped retrieval (if the context names a PR) runs alongside it
+            print(f"[DEBUG] Loading chat memory")
+            chat_context, pr_context = await asyncio.gather(
+                load_chat_context(session_id),
+                _load_pr_context(request.context, request.message)
+            )
+
+            record_message(
                 session_id=session_id,
                 role="user",
                 content=request.message,
                 metadata=request.context
             )
-            print(f"[DEBUG] User message added successfully")
-
-            # Get chat history for context
-            print(f"[DEBUG] Fetching chat history")
-            messages = await get_chat_messages(session_id)
-            chat_history = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in messages
-            ]
-            print(f"[DEBUG] Chat history length: {len(chat_history)}")
+            print(f"[DEBUG] Chat history length: {len(chat_context['history'])}")
             
             # Call LLM with context
             print(f"[DEBUG] Calling LLM with message: {request.message[:100]}...")
-            ai_response = await chat_with_llm(
+            ai_response, usage = await chat_with_llm(
                 user_message=request.message,
-                chat_history=chat_history,
+                chat_history=chat_context["history"],
                 rules=rules,
-                context=request.context or {}
+                context=request.context or {},
+                summary=chat_context["summary"],
+                rules_version=rules_version,
+                pr_context=pr_context[0] if pr_context else ""
             )
             print(f"[DEBUG] LLM response received: {ai_response[:100]}...")
+            response_metadata.update(usage)
+            if pr_context:
+                response_metadata["pr"] = pr_context[1]
 
-            # Add AI response to database
-            print(f"[DEBUG] Adding AI response to database")
-            await add_chat_message(
+            # Queue AI response for persistence
+            record_message(
                 session_id=session_id,
                 role="assistant",
                 content=ai_response,
-                metadata={"rules_accessed": len(rules)}
+                metadata=response_metadata
             )
-            print(f"[DEBUG] AI response added successfully")
+
+            # Fold older turns into the session summary off the request path
+            schedule_summary_refresh(session_id)
 
         return ChatResponse(
             message=ai_response,
             session_id=session_id,
-            metadata={"rules_accessed": len(rules)}
+            metadata=response_metadata
         )
 
     except Exception as e:
@@ -113,61 +197,96 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
 
 
+async def _load_pr_context(context: Optional[dict], message: str):
+    """PR block for the prompt, or None; a failure here shouldn't fail the chat turn"""
+    if not context:
+        return None
+    try:
+        return await build_pr_context(context, message)
+    except Exception as e:
+        print(f"[ERROR] Failed to build PR context: {e}")
+        return None
+
+
 @mcp_router.get("/chat/sessions/{user_id}", response_model=List[ChatSession])
-async def get_user_sessions(user_id: str):
-    """Get all chat sessions for a user"""
-    print(f"[DEBUG] get_user_sessions called with user_id: {user_id}")
+async def get_user_sessions(
+    user_id: str,
+    response: Response,
+    limit: int = Query(settings.CHAT_SESSIONS_PAGE_SIZE, ge=1, le=settings.CHAT_SESSIONS_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+):
+    """Get one page of chat sessions for a user, newest first.
+
+    Pass the `X-Next-Cursor` response header back as `before` to load the
+    next page.
+    """
     try:
-        print(f"[DEBUG] Calling get_chat_sessions from database")
-        sessions = await get_chat_sessions(user_id)
-        print(f"[DEBUG] Retrieved {len(sessions)} sessions from database")
-        
-        result = [
-            ChatSession(
-                id=session["id"],
-                session_name=session["session_name"],
-                created_at=session["created_at"].isoformat(),
-                message_count=session["message_count"],
-                last_message_at=session["last_message_at"].isoformat() if session["last_message_at"] else None
-            )
-            for session in sessions
-        ]
-        print(f"[DEBUG] Returning {len(result)} sessions")
-        return result
+        sessions, next_cursor = await get_chat_sessions_page(user_id, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"[ERROR] Error in get_user_sessions: {str(e)}")
-        print(f"[ERROR] Error type: {type(e)}")
-        import traceback
-        print(f"[ERROR] Full traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error fetching sessions: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        ChatSession(
+            id=session["id"],
+            session_name=session["session_name"],
+            created_at=session["created_at"].isoformat(),
+            message_count=session["message_count"],
+            last_message_at=session["last_message_at"].isoformat() if session["last_message_at"] else None
+        )
+        for session in sessions
+    ]
+
 
 @mcp_router.get("/chat/sessions/{session_id}/messages")
-async def get_session_messages(session_id: int):
-    """Get all messages in a chat session"""
+async def get_session_messages(
+    session_id: int,
+    response: Response,
+    limit: int = Query(settings.CHAT_MESSAGES_PAGE_SIZE, ge=1, le=settings.CHAT_MESSAGES_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+):
+    """Get one page of messages in a chat session, newest page first.
+
+    Pass the `X-Next-Cursor` response header back as `before` to load the
+    next older page; the header is absent on the oldest page.
+    """
     try:
-        messages = await get_chat_messages(session_id)
-        return [
-            {
-                "id": msg["id"],
-                "role": msg["role"],
-                "content": msg["content"],
-                "metadata": msg["metadata"],
-                "created_at": msg["created_at"].isoformat()
-            }
-            for msg in messages
-        ]
+        # Read-your-writes for messages still in the write-behind buffer
+        await message_writer.flush()
+        messages, next_cursor = await get_chat_messages_page(session_id, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching messages: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {
+            "id": msg["id"],
+            "role": msg["role"],
+            "content": msg["content"],
+            "metadata": msg["metadata"],
+            "created_at": msg["created_at"].isoformat()
+        }
+        for msg in messages
+    ]
+
 
 @mcp_router.delete("/chat/sessions/{session_id}")
 async def delete_session(session_id: int, user_id: str):
     """Delete a chat session"""
     print(f"[DEBUG] Delete session request: session_id={session_id}, user_id={user_id}")
     try:
+        await message_writer.flush()
         success = await delete_chat_session(session_id, user_id)
         print(f"[DEBUG] Delete session result: {success}")
+        if success:
+            await forget_session(session_id)
         if not success:
             raise HTTPException(status_code=404, detail="Session not found")
         return {"message": "Session deleted successfully"}
@@ -176,6 +295,67 @@ async def delete_session(session_id: int, user_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting session: {str(e)}")
 
 
+# Search routes
+@mcp_router.get("/search/prs")
+async def search_prs(
+    response: Response,
+    q: Optional[str] = None,
+    rule: Optional[str] = None,
+    path: Optional[str] = None,
+    repo: Optional[str] = None,
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+):
+    """Search PR summaries by text (`q`), violated rule, changed path or repo.
+
+    Results are ranked by relevance when `q` is given, else newest first.
+    Pass the `X-Next-Cursor` response header back as `before` for the next page.
+    """
+    try:
+        results, next_cursor = await search_pr_summaries(q, rule, path, repo, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] PR search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching PRs: {str(e)}")
+
+    metrics.inc("search_requests", index="prs")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {**result, "created_at": result["created_at"].isoformat() if result["created_at"] else None}
+        for result in results
+    ]
+
+
+@mcp_router.get("/search/chat")
+async def search_chat(
+    user_id: str,
+    q: str,
+    response: Response,
+    session_id: Optional[int] = None,
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+):
+    """Search one user's chat messages; paginated like /search/prs"""
+    try:
+        await message_writer.flush()
+        results, next_cursor = await search_chat_messages(user_id, q, session_id, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] Chat search failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error searching chat: {str(e)}")
+
+    metrics.inc("search_requests", index="chat")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [
+        {**result, "created_at": result["created_at"].isoformat()}
+        for result in results
+    ]
+
+
 # Rule management routes
 @mcp_router.get("/rules", response_model=RulesResponse)
 async def get_rules():
@@ -1,20 +1,40 @@
 # mcp_server/rule_engine.py
 
+import os
 import yaml  # type: ignore
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from mcp_server.models import FileEntry, RuleViolation
 from mcp_server.config import settings
 
 RULES_FILE = settings.RULES_PATH
 
+# Parsed rules keyed by (path, mtime, size) of the rules file
+_rules_cache: Dict[str, Any] = {"key": None, "version": None, "rules": []}
+
 
 def load_rules():
     with open(RULES_FILE, "r") as f:
         return yaml.safe_load(f)
 
 
+def get_rules_snapshot() -> Tuple[str, List[Dict[str, Any]]]:
+    """Return (version, rules), re-parsing rules.yaml only when it changes.
+
+    The version changes whenever the file does, so callers can cache
+    anything derived from the rules under it. The list is shared between
+    callers and must not be modified; use get_all_rules() for a copy.
+    """
+    stat = os.stat(RULES_FILE)
+    key = (RULES_FILE, stat.st_mtime_ns, stat.st_size)
+    if _rules_cache["key"] != key:
+        _rules_cache["rules"] = load_rules() or []
+        _rules_cache["version"] = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        _rules_cache["key"] = key
+    return _rules_cache["version"], _rules_cache["rules"]
+
+
 def run_static_checks(files: List[FileEntry]) -> List[RuleViolation]:
-    rules = load_rules()
+    _, rules = get_rules_snapshot()
     violations = []
 
     for rule in rules:
@@ -57,9 +77,8 @@ def run_static_checks(files: List[FileEntry]) -> List[RuleViolation]:
 def get_all_rules() -> List[Dict[str, Any]]:
     """Get all rules from the rules.yaml file"""
     try:
-        with open(RULES_FILE, "r") as f:
-            rules = yaml.safe_load(f)
-        return rules or []
+        _, rules = get_rules_snapshot()
+        return list(rules)
     except Exception as e:
         print(f"[ERROR] Error loading rules: {e}")
         return []
@@ -70,6 +89,7 @@ def save_rules(rules: List[Dict[str, Any]]) -> bool:
     try:
         with open(RULES_FILE, "w") as f:
             yaml.dump(rules, f, default_flow_style=False, indent=2)
+        _rules_cache["key"] = None
         print(f"[DEBUG] Successfully saved {len(rules)} rules to {RULES_FILE}")
         return True
     except Exception as e:
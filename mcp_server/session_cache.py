@@ -0,0 +1,273 @@
+# mcp_server/session_cache.py
+
+"""
+Per-worker cache of hot chat sessions with write-behind message persistence.
+
+Recent history is served from an in-memory LRU keyed by session id. New
+messages go into the cache immediately and into a buffer that is flushed
+to Postgres as one multi-row insert every CHAT_WRITE_FLUSH_MS (or when it
+reaches CHAT_WRITE_MAX_BATCH), and on shutdown. A flush that fails keeps
+its messages queued and is retried with exponential backoff (up to
+CHAT_WRITE_RETRY_MAX_SECONDS); only messages rejected outright, such as
+those of a session deleted mid-flush, are dropped.
+
+With several workers, each flush, summary update and session deletion is
+announced on a Postgres NOTIFY channel; the other workers drop their cached
+copy of that session and reload it from the database on next use. While
+the LISTEN connection is down those announcements are missed, so caching
+is switched off until it reconnects.
+"""
+
+import asyncio
+import json
+import os
+import socket
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from mcp_server.config import settings
+from db.connection import Listener, is_permanent_error
+from db.crud import add_chat_messages_bulk, notify_channel
+
+CHANNEL = "chat_session_events"
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SessionHistoryCache:
+    """LRU of session id -> {"summary": str, "messages": deque of recent turns}"""
+
+    def __init__(self, max_sessions: int, max_messages: int):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(session_id)
+        self.hits += 1
+        return entry
+
+    def put(self, session_id: int, summary: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        entry = {
+            "summary": summary,
+            "messages": deque(
+                ({"role": m["role"], "content": m["content"]} for m in messages),
+                maxlen=self.max_messages,
+            ),
+        }
+        self._entries[session_id] = entry
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+        return entry
+
+    def append(self, session_id: int, role: str, content: str):
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            entry["messages"].append({"role": role, "content": content})
+
+    def set_summary(self, session_id: int, summary: str):
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            entry["summary"] = summary
+
+    def invalidate(self, session_id: int):
+        self._entries.pop(session_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class MessageWriteBehind:
+    """Buffers chat message inserts and flushes them in batches"""
+
+    def __init__(self, flush_interval: float, max_batch: int, max_retry_delay: float):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_retry_delay = max_retry_delay
+        self.failures = 0  # Consecutive failed flushes
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._pending:
+            print(f"[ERROR] Shutting down with {len(self._pending)} chat messages unsaved")
+
+    def enqueue(self, session_id: int, role: str, content: str, metadata: Optional[dict]):
+        self._pending.append({
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "metadata": metadata,
+            # Taken now so ordering matches the order turns happened in
+            "created_at": datetime.now(timezone.utc),
+        })
+        self._wakeup.set()
+
+    def discard_session(self, session_id: int):
+        self._pending = [r for r in self._pending if r["session_id"] != session_id]
+
+    async def flush(self) -> bool:
+        """Write everything pending; False if a batch failed and was requeued"""
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                if not await self._write(batch):
+                    self.failures += 1
+                    return False
+            self.failures = 0
+            return True
+
+    def _requeue(self, records: List[Dict[str, Any]]):
+        # Back at the front, so turns keep their order
+        self._pending[:0] = records
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        try:
+            session_ids = await add_chat_messages_bulk(batch)
+        except Exception as e:
+            if not is_permanent_error(e):
+                print(f"[ERROR] Batched chat insert failed, will retry {len(batch)} messages: {e}")
+                self._requeue(batch)
+                return False
+            # Isolate the failing session (usually one deleted mid-flush)
+            print(f"[ERROR] Batched chat insert rejected, retrying per session: {e}")
+            session_ids = set()
+            by_session: Dict[int, List[Dict[str, Any]]] = {}
+            for record in batch:
+                by_session.setdefault(record["session_id"], []).append(record)
+            failed: List[Dict[str, Any]] = []
+            for session_id, records in by_session.items():
+                try:
+                    session_ids |= await add_chat_messages_bulk(records)
+                except Exception as e:
+                    if is_permanent_error(e):
+                        print(f"[ERROR] Dropping {len(records)} messages for session {session_id}: {e}")
+                    else:
+                        failed.extend(records)
+            if failed:
+                self._requeue(sorted(failed, key=lambda r: r["created_at"]))
+                await publish("messages", session_ids)
+                return False
+        await publish("messages", session_ids)
+        return True
+
+    def _retry_delay(self) -> float:
+        return min(self.flush_interval * 2 ** self.failures, self.max_retry_delay)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Coalesce everything that arrives within the flush window
+            if len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.flush_interval)
+            try:
+                # Shielded so stop() can't cancel a batch halfway through
+                flushed = await asyncio.shield(self.flush())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Chat message flush failed: {e}")
+                flushed = False
+            if not flushed:
+                await asyncio.sleep(self._retry_delay())
+                self._wakeup.set()
+
+
+history_cache = SessionHistoryCache(
+    max_sessions=settings.CHAT_CACHE_SESSIONS,
+    max_messages=settings.CHAT_HISTORY_LIMIT,
+)
+message_writer = MessageWriteBehind(
+    flush_interval=settings.CHAT_WRITE_FLUSH_MS / 1000,
+    max_batch=settings.CHAT_WRITE_MAX_BATCH,
+    max_retry_delay=settings.CHAT_WRITE_RETRY_MAX_SECONDS,
+)
+_listener: Optional[Listener] = None
+
+
+async def publish(event: str, session_ids):
+    """Tell other workers these sessions changed"""
+    if not session_ids:
+        return
+    payloads = [
+        json.dumps({"event": event, "session_id": sid, "origin": WORKER_ID})
+        for sid in session_ids
+    ]
+    try:
+        await notify_channel(CHANNEL, payloads)
+    except Exception as e:
+        print(f"[ERROR] Failed to publish {event} for sessions {list(session_ids)}: {e}")
+
+
+def _on_notification(connection, pid, channel, payload):
+    try:
+        event = json.loads(payload)
+    except ValueError:
+        return
+    if event.get("origin") != WORKER_ID:
+        history_cache.invalidate(event["session_id"])
+
+
+def record_message(session_id: int, role: str, content: str, metadata: Optional[dict] = None):
+    """Add a message to the cached history and queue it for persistence"""
+    history_cache.append(session_id, role, content)
+    message_writer.enqueue(session_id, role, content, metadata)
+
+
+async def forget_session(session_id: int):
+    """Drop a session everywhere before it is deleted"""
+    message_writer.discard_session(session_id)
+    history_cache.invalidate(session_id)
+    await publish("deleted", [session_id])
+
+
+def _enable_cache():
+    # Anything cached before was not kept current while disconnected
+    history_cache.clear()
+    history_cache.max_sessions = settings.CHAT_CACHE_SESSIONS
+
+
+def _disable_cache():
+    # Without notifications other workers' writes can't invalidate us
+    print("[ERROR] Session cache listener down, caching disabled until it reconnects")
+    history_cache.clear()
+    history_cache.max_sessions = 0
+
+
+async def start_session_cache():
+    global _listener
+    message_writer.start()
+    history_cache.max_sessions = 0  # Until the listener is connected
+    _listener = Listener(CHANNEL, _on_notification, on_connect=_enable_cache, on_disconnect=_disable_cache)
+    await _listener.start()
+
+
+async def stop_session_cache():
+    global _listener
+    await message_writer.stop()
+    if _listener is not None:
+        await _listener.close()
+        _listener = None
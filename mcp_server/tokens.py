@@ -0,0 +1,44 @@
+# mcp_server/tokens.py
+
+from typing import Dict, List, Optional
+from mcp_server.config import settings
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+_encoders: Dict[str, object] = {}
+
+# Per-message framing overhead and reply primer used by OpenAI chat models
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+def _get_encoder(model: str):
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding("cl100k_base")
+    return _encoders[model]
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens in `text`, estimating ~4 characters per token without tiktoken"""
+    if not text:
+        return 0
+    encoder = _get_encoder(model or settings.DEFAULT_MODEL)
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: Optional[str] = None) -> int:
+    """Count the prompt tokens a list of chat messages will cost"""
+    return sum(
+        TOKENS_PER_MESSAGE + count_tokens(m.get("content") or "", model)
+        for m in messages
+    ) + TOKENS_PER_REPLY
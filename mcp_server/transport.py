@@ -0,0 +1,69 @@
+# mcp_server/transport.py
+
+"""
+Decoding for the packed analyze_pr transport.
+
+The github bot can send AnalyzeRequest bodies as JSON or msgpack
+(Content-Type), optionally compressed with gzip or zstd
+(Content-Encoding). zstandard and msgpack are optional dependencies; a
+body that needs a missing one is rejected with 415. Decompression stops
+at MAX_PACKED_REQUEST_BYTES so a small body can't expand without bound.
+"""
+
+import io
+import json
+import zlib
+from typing import Any, Dict, Optional
+
+from mcp_server.config import settings
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+class UnsupportedEncoding(ValueError):
+    """The body uses an encoding or content type we can't decode"""
+
+
+def _decompress(body: bytes, encoding: str) -> bytes:
+    limit = settings.MAX_PACKED_REQUEST_BYTES
+    if encoding in ("", "identity"):
+        data = body
+    elif encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        data = decompressor.decompress(body, limit + 1)
+    elif encoding == "zstd":
+        if zstandard is None:
+            raise UnsupportedEncoding("zstd support is not installed")
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+            data = reader.read(limit + 1)
+    else:
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {encoding}")
+
+    if len(data) > limit:
+        raise ValueError(f"Request body exceeds {limit} bytes after decompression")
+    return data
+
+
+def decode_body(body: bytes, content_encoding: Optional[str], content_type: Optional[str]) -> Dict[str, Any]:
+    """Decompress and deserialize a packed request body into a dict"""
+    data = _decompress(body, (content_encoding or "").strip().lower())
+    media_type = (content_type or JSON).split(";")[0].strip().lower()
+
+    if media_type == MSGPACK:
+        if msgpack is None:
+            raise UnsupportedEncoding("msgpack support is not installed")
+        return msgpack.unpackb(data, raw=False)
+    if media_type == JSON:
+        return json.loads(data)
+    raise UnsupportedEncoding(f"Unsupported Content-Type: {media_type}")
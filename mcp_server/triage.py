@@ -0,0 +1,194 @@
+# mcp_server/triage.py
+
+"""
+LLM-free fast path for trivial PRs.
+
+`classify_pr` looks at the changed file list and the author login, and
+for version bumps at the diff. If a PR is docs-only, lockfile-only, a
+small version bump, or opened by a dependency bot, it returns a category.
+A version bump must change nothing in its manifests but version fields;
+without the complete diff a PR is never classified as one. `trivial_summary` then renders a
+templated summary in the same bullet format as the LLM one, so analyze_pr
+can skip summarize_diff. Static rule checks still run for these PRs.
+
+Enabled categories come from TRIVIAL_PR_CATEGORIES. Repositories listed in
+TRIVIAL_PR_OPT_OUT_REPOS always get a full LLM summary.
+"""
+
+import posixpath
+import re
+from typing import Dict, List, Optional
+
+from mcp_server.config import settings
+from mcp_server.models import FileEntry
+
+DOCS_ONLY = "docs_only"
+LOCKFILE_ONLY = "lockfile_only"
+VERSION_BUMP = "version_bump"
+BOT_AUTHORED = "bot_authored"
+CATEGORIES = (BOT_AUTHORED, LOCKFILE_ONLY, VERSION_BUMP, DOCS_ONLY)  # checked in this order
+
+DEPENDENCY_BOTS = ("dependabot", "renovate")
+
+# No ".txt": requirements.txt, CMakeLists.txt and friends are not docs
+DOC_EXTENSIONS = (".md", ".markdown", ".rst", ".adoc")
+DOC_DIRS = ("docs/", "doc/")
+DOC_FILES = {
+    "LICENSE", "LICENCE", "AUTHORS", "CODEOWNERS", "NOTICE", "CONTRIBUTORS",
+    "LICENSE.txt", "LICENCE.txt", "AUTHORS.txt", "NOTICE.txt", "CONTRIBUTORS.txt", "README.txt",
+}
+
+LOCKFILES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml",
+    "poetry.lock", "Pipfile.lock", "uv.lock", "pdm.lock",
+    "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "mix.lock",
+    "Podfile.lock", "pubspec.lock", "packages.lock.json",
+}
+
+VERSION_FILES = {
+    "package.json", "pyproject.toml", "setup.py", "setup.cfg", "Cargo.toml",
+    "VERSION", "version.txt", "version.py", "__version__.py", "_version.py",
+    "Chart.yaml", "build.gradle", "gradle.properties", "mix.exs",
+}
+# Files whose whole content is the version
+VERSION_ONLY_FILES = {"VERSION", "version.txt"}
+# A changed manifest line that sets the package version, e.g. `"version": "1.2.3",`,
+# `version = "1.2.3"`, `__version__ = "1.2.3"` or `appVersion: 1.2.3`
+VERSION_LINE = re.compile(r"""^\s*["']?(?:__version__|version|appVersion)["']?\s*[:=]""", re.IGNORECASE)
+CHANGELOG_FILES = {"CHANGELOG.md", "CHANGELOG", "CHANGES.md", "CHANGES.rst", "HISTORY.md"}
+
+
+def _csv(value: str) -> frozenset:
+    return frozenset(item.strip() for item in value.split(",") if item.strip())
+
+
+ENABLED_CATEGORIES = _csv(settings.TRIVIAL_PR_CATEGORIES)
+OPT_OUT_REPOS = frozenset(repo.lower() for repo in _csv(settings.TRIVIAL_PR_OPT_OUT_REPOS))
+
+
+def _basename(filename: str) -> str:
+    return posixpath.basename(filename)
+
+
+def _is_doc(filename: str) -> bool:
+    return (
+        filename.lower().endswith(DOC_EXTENSIONS)
+        or filename.startswith(DOC_DIRS)
+        or _basename(filename) in DOC_FILES
+    )
+
+
+def _is_lockfile(filename: str) -> bool:
+    return _basename(filename) in LOCKFILES
+
+
+def _is_bot(login: str) -> bool:
+    login = login.lower()
+    return login.startswith(DEPENDENCY_BOTS) and (login.endswith("[bot]") or login in DEPENDENCY_BOTS)
+
+
+def _changed_lines(diff: str) -> Dict[str, List[str]]:
+    """Added and removed lines of a unified diff, per file (new path)"""
+    changes: Dict[str, List[str]] = {}
+    current = None
+    in_hunk = False
+    for line in diff.splitlines():
+        if line.startswith("diff --git "):
+            current = line.rsplit(" b/", 1)[-1]
+            changes.setdefault(current, [])
+            in_hunk = False
+        elif line.startswith("@@"):
+            in_hunk = True
+        elif in_hunk and current is not None and line[:1] in ("+", "-"):
+            changes[current].append(line[1:])
+    return changes
+
+
+def _only_version_changed(manifests: List[FileEntry], diff: str) -> bool:
+    changes = _changed_lines(diff)
+    for f in manifests:
+        lines = changes.get(f.filename)
+        if lines is None:
+            return False
+        if _basename(f.filename) in VERSION_ONLY_FILES:
+            continue
+        if any(line.strip() and not VERSION_LINE.match(line) for line in lines):
+            return False
+    return True
+
+
+def _is_version_bump(files: List[FileEntry], diff: str, diff_truncated: bool) -> bool:
+    manifests = [f for f in files if _basename(f.filename) in VERSION_FILES]
+    if not manifests or not diff or diff_truncated:
+        return False
+    changed_lines = 0
+    for f in files:
+        name = _basename(f.filename)
+        if name in LOCKFILES:
+            continue  # Regenerated lockfiles can be large; they don't count
+        if name not in VERSION_FILES and name not in CHANGELOG_FILES:
+            return False
+        if name in VERSION_FILES:
+            changed_lines += (f.additions or 0) + (f.deletions or 0)
+    return changed_lines <= settings.TRIVIAL_VERSION_BUMP_MAX_LINES and _only_version_changed(manifests, diff)
+
+
+def classify_pr(files: List[FileEntry], author_login: str, repo_full_name: str,
+                diff: str = "", diff_truncated: bool = False) -> Optional[str]:
+    """Return the trivial-PR category for this change, or None if it needs an LLM summary"""
+    if not files or repo_full_name.lower() in OPT_OUT_REPOS:
+        return None
+
+    checks = {
+        BOT_AUTHORED: lambda: _is_bot(author_login),
+        LOCKFILE_ONLY: lambda: all(_is_lockfile(f.filename) for f in files),
+        VERSION_BUMP: lambda: _is_version_bump(files, diff, diff_truncated),
+        DOCS_ONLY: lambda: all(_is_doc(f.filename) for f in files),
+    }
+    for category in CATEGORIES:
+        if category in ENABLED_CATEGORIES and checks[category]():
+            return category
+    return None
+
+
+def _file_list(files: List[FileEntry], limit: int = 5) -> str:
+    names = [f"`{f.filename}`" for f in files[:limit]]
+    if len(files) > limit:
+        names.append(f"and {len(files) - limit} more")
+    return ", ".join(names)
+
+
+def trivial_summary(category: str, title: str, files: List[FileEntry], author_login: str) -> str:
+    """Templated summary in the same bullet format as the LLM summary"""
+    additions = sum(f.additions or 0 for f in files)
+    deletions = sum(f.deletions or 0 for f in files)
+    changes = f"{_file_list(files)} (+{additions}/-{deletions})"
+
+    if category == BOT_AUTHORED:
+        goal = f"Automated dependency update by `{author_login}`: {title}"
+        impact = "Dependency versions change; behaviour may change if the update includes breaking releases"
+        risks = "Check the upstream release notes for breaking changes"
+        testing = "Rely on CI; no code was changed by hand"
+    elif category == LOCKFILE_ONLY:
+        goal = f"Lockfile-only update: {title}"
+        impact = "Resolved dependency versions change; no source code changes"
+        risks = "Transitive dependency upgrades may change runtime behaviour"
+        testing = "Rely on CI with a clean install"
+    elif category == VERSION_BUMP:
+        goal = f"Version bump: {title}"
+        impact = "Release metadata only; no functional changes"
+        risks = "Make sure the new version matches the release tag and changelog"
+        testing = "None needed beyond CI"
+    else:
+        goal = f"Documentation update: {title}"
+        impact = "Docs only; no runtime impact"
+        risks = "None"
+        testing = "None needed; check rendered docs if formatting changed"
+
+    return (
+        f"- **Goal:** {goal}\n"
+        f"- **Key Changes:** {changes}\n"
+        f"- **Impact:** {impact}\n"
+        f"- **Risks/Edge Cases:** {risks}\n"
+        f"- **Testing:** {testing}"
+    )
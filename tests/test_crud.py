@@ -0,0 +1,22 @@
+# tests/test_crud.py
+
+from db.crud import _PR_SUMMARY_BULK_UPSERT_SET, _PR_SUMMARY_UPSERT_SET
+
+
+def test_bulk_upsert_keeps_stored_summary_and_review_count():
+    for column in ("review_comments_count", "summary_text", "summary_generated_at"):
+        assert f"COALESCE(EXCLUDED.{column}, pr_summary.{column})" in _PR_SUMMARY_BULK_UPSERT_SET
+
+
+def test_upsert_keeps_stored_summary():
+    # A webhook whose analysis failed writes NULL rather than a placeholder
+    for column in ("summary_text", "summary_generated_at"):
+        assert f"COALESCE(EXCLUDED.{column}, pr_summary.{column})" in _PR_SUMMARY_UPSERT_SET
+    assert "review_comments_count = EXCLUDED.review_comments_count" in _PR_SUMMARY_UPSERT_SET
+
+
+def test_upserts_update_every_column():
+    for clause in (_PR_SUMMARY_UPSERT_SET, _PR_SUMMARY_BULK_UPSERT_SET):
+        assert "EXCLUDED.review_comments_count" in clause
+        assert "EXCLUDED.violations" in clause
+        assert "metrics_updated_at    = now()" in clause
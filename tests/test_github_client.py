@@ -0,0 +1,25 @@
+# tests/test_github_client.py
+
+from github_bot import github_client
+from github_bot.config import settings
+
+
+def test_bucket_cap_keeps_new_bucket_when_all_are_busy(monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_MAX_BUCKETS", 2)
+    monkeypatch.setattr(github_client, "_buckets", type(github_client._buckets)())
+    for name in ("a", "b"):
+        github_client._bucket(name, None, "core").active = 1
+
+    bucket = github_client._bucket("c", None, "core")
+    assert github_client._buckets[("c", "core")] is bucket
+    assert len(github_client._buckets) == 3
+
+
+def test_bucket_cap_evicts_least_recent_idle_bucket(monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_MAX_BUCKETS", 2)
+    monkeypatch.setattr(github_client, "_buckets", type(github_client._buckets)())
+    github_client._bucket("a", None, "core").active = 1
+    github_client._bucket("b", None, "core")
+
+    github_client._bucket("c", None, "core")
+    assert list(github_client._buckets) == [("a", "core"), ("c", "core")]
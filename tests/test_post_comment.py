@@ -0,0 +1,13 @@
+# tests/test_post_comment.py
+
+from github_bot.post_comment import format_comment
+
+
+def test_no_violations():
+    assert "No rule violations found" in format_comment("Adds a flag.", [])
+
+
+def test_unchecked_is_not_reported_as_clean():
+    comment = format_comment("_Summary unavailable._", [], checked=False)
+    assert "did not run" in comment
+    assert "No rule violations found" not in comment
@@ -0,0 +1,134 @@
+# tests/test_webhook_queue.py
+
+import asyncio
+import time
+
+from github_bot.webhook_queue import QueueFull, WebhookQueue, parse_weights
+
+
+def make_queue(**overrides) -> WebhookQueue:
+    options = dict(
+        max_concurrency=1, tenant_max_concurrency=1, rate_per_minute=0,
+        burst=10, max_queue=100, weights={},
+    )
+    options.update(overrides)
+    return WebhookQueue(**options)
+
+
+def test_parse_weights():
+    assert parse_weights("123:4, Big-Org:0.5,bad:x,:2,zero:0") == {"123": 4.0, "big-org": 0.5}
+
+
+def test_weighted_fair_order():
+    async def scenario():
+        queue = make_queue(weights={"heavy": 2})
+        gate = asyncio.Event()
+        started = []
+
+        def job(label):
+            async def run():
+                started.append(label)
+                await gate.wait()
+            return run
+
+        # The first job holds the only slot while both installations queue up
+        queue.submit(1, "heavy", "blocker", job("blocker"))
+        for n in range(6):
+            queue.submit(1, "heavy", ("heavy", n), job("heavy"))
+            queue.submit(2, "light", ("light", n), job("light"))
+        gate.set()
+        await queue.drain(5)
+        return started[1:]
+
+    order = asyncio.run(scenario())
+    # Weight 2 gets two slots for every one of weight 1 while both are backlogged
+    assert order[:6].count("heavy") == 4
+    assert order[:6].count("light") == 2
+
+
+def test_queued_job_is_coalesced():
+    async def scenario():
+        queue = make_queue()
+        gate = asyncio.Event()
+        ran = []
+
+        async def blocker():
+            await gate.wait()
+
+        def job(label):
+            async def run():
+                ran.append(label)
+            return run
+
+        queue.submit(1, "org", "blocker", blocker)
+        assert queue.submit(1, "org", ("org/repo", 7), job("old")) == "queued"
+        assert queue.submit(1, "org", ("org/repo", 7), job("new")) == "coalesced"
+        gate.set()
+        await queue.drain(5)
+        return ran
+
+    assert asyncio.run(scenario()) == ["new"]
+
+
+def test_queue_full():
+    async def scenario():
+        queue = make_queue(max_queue=1)
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        async def noop():
+            pass
+
+        queue.submit(1, "org", "blocker", blocker)
+        queue.submit(1, "org", "a", noop)
+        try:
+            queue.submit(1, "org", "b", noop)
+        except QueueFull:
+            rejected = True
+        else:
+            rejected = False
+        gate.set()
+        await queue.drain(5)
+        return rejected
+
+    assert asyncio.run(scenario())
+
+
+def test_rate_limit_holds_across_idle_gaps():
+    # 600/min = one start per 0.1s after a burst of one
+    async def scenario():
+        queue = make_queue(max_concurrency=4, tenant_max_concurrency=4, rate_per_minute=600, burst=1)
+        starts = []
+
+        async def run():
+            starts.append(time.monotonic())
+
+        for n in range(5):
+            queue.submit(1, "org", n, run)
+            # Each job finishes before the next arrives, so the queue keeps emptying
+            await asyncio.sleep(0.01)
+        await queue.drain(5)
+        return starts
+
+    starts = asyncio.run(scenario())
+    assert len(starts) == 5
+    assert starts[-1] - starts[0] >= 0.35
+
+
+def test_idle_installation_is_forgotten_once_refilled():
+    async def scenario():
+        queue = make_queue(rate_per_minute=600, burst=1)
+
+        async def run():
+            pass
+
+        queue.submit(1, "org", "a", run)
+        await asyncio.sleep(0.01)
+        remembered = 1 in queue._tenants  # Bucket still empty
+        await asyncio.sleep(0.15)
+        queue._evict_idle(time.monotonic())
+        return remembered, 1 in queue._tenants
+
+    assert asyncio.run(scenario()) == (True, False)